@@ -2,12 +2,13 @@
 主程序文件
 整合所有功能，提供Web API
 """
+import atexit
 import logging
 import threading
 import webbrowser
 import time
 import secrets
-from flask import Flask, render_template, jsonify, request, make_response, send_file, g
+from flask import Flask, render_template, jsonify, request, make_response, send_file, g, Response
 from flask_limiter import Limiter
 from flask_limiter.util import get_remote_address
 from pathlib import Path
@@ -24,9 +25,16 @@ from core.price import (
     get_price_source_health,
 )
 from core.parser import parse_code, get_display_code
-from core.asset_type import infer_asset_type
-from core.snapshot import take_snapshot, calculate_portfolio_stats, is_market_closed, is_weekend
+from core.asset_type import infer_asset_type, asset_classifier
+from core.snapshot import take_snapshot, calculate_portfolio_stats, is_market_closed, is_weekend, snapshot_date
+from core.forex import get_forex_rates_on
 from core.news import news_fetcher
+from core.warmer import price_warmer
+from core.cache_snapshot import quote_cache_snapshot
+from core.symbols import symbol_master
+from core.negative_cache import negative_cache
+from core.codes import canonical_code
+from core.quote_stream import quote_hub
 from core.system import system_manager
 from core.auth import login_required, optional_auth, generate_token, get_or_create_user, get_user_profile
 from core.email import send_verification_email
@@ -166,6 +174,31 @@ def ratelimit_handler(e):
     return jsonify({"error": "Too many requests"}), 429
 
 
+def _start_background_tasks():
+    """启动进程内后台任务（幂等；gunicorn 每个 worker 进程各自启动）"""
+    if config.ENABLE_QUOTE_CACHE_SNAPSHOT:
+        quote_cache_snapshot.start()
+    if config.ENABLE_PRICE_WARMER:
+        price_warmer.start()
+    if config.ENABLE_SYMBOL_REFRESH:
+        symbol_master.start()
+    # 数据库初始化时回填为股票的美股持仓，在此提交后台分类确认
+    asset_classifier.start()
+
+
+@app.before_request
+def _ensure_background_tasks():
+    # 导入模块时不启动（测试、脚本、migrate 只导入 app 不应产生后台线程和外部请求），
+    # 每个 worker 进程在处理首个请求时启动；直接运行 app.py 时在 __main__ 中启动
+    _start_background_tasks()
+
+
+atexit.register(price_warmer.stop)
+atexit.register(quote_cache_snapshot.stop)
+atexit.register(symbol_master.stop)
+atexit.register(quote_hub.stop)
+
+
 def open_browser():
     """自动打开浏览器"""
     time.sleep(1.5)
@@ -222,13 +255,16 @@ def api_price():
     if not code:
         return jsonify({"error": "Missing code"}), 400
     
-    price, yclose, amt, chg = get_price(code)
+    meta = {}
+    price, yclose, amt, chg = get_price(code, meta=meta)
     
     return jsonify({
         "price": price,
         "yclose": yclose,
         "amt": amt,
-        "chg": chg
+        "chg": chg,
+        "age_ms": meta.get("age_ms"),
+        "stale": meta.get("stale", False),
     })
 
 
@@ -241,7 +277,8 @@ def api_prices_batch():
     if not codes:
         return jsonify({"error": "Missing codes"}), 400
     
-    results = batch_get_prices(codes)
+    freshness = {}
+    results = batch_get_prices(codes, deadline=config.PRICES_BATCH_DEADLINE_SECONDS, freshness=freshness)
     
     # 将元组转换为对象，便于前端使用
     formatted_results = {}
@@ -250,15 +287,53 @@ def api_prices_batch():
             "price": price,
             "yclose": yclose,
             "amt": amt,
-            "chg": chg
+            "chg": chg,
+            "freshness": freshness.get(code, "fresh" if price else "missing"),
         }
     
     return jsonify(formatted_results)
 
 
+@app.route('/api/prices/stream')
+def api_prices_stream():
+    """
+    实时行情推送（Server-Sent Events）
+
+    参数: codes=代码1,代码2,...
+    事件: quotes（连接时全量，之后只含变化的代码，格式同 /api/prices/batch），无变化时发送心跳注释
+    """
+    if not config.ENABLE_QUOTE_STREAM:
+        return jsonify({"error": "Quote stream disabled"}), 404
+    codes = [c for c in request.args.get('codes', '').split(',') if c.strip()]
+    if not codes:
+        return jsonify({"error": "Missing codes"}), 400
+
+    sub = quote_hub.subscribe(codes)
+    if sub is None:
+        response = jsonify({"error": "Too many stream connections"})
+        response.headers['Retry-After'] = str(int(config.QUOTE_STREAM_INTERVAL * 6))
+        return response, 503
+
+    response = Response(quote_hub.events(sub), mimetype='text/event-stream')
+    # 响应体未被迭代时（HEAD、客户端提前断开、中间件丢弃响应体）生成器的 finally 不会执行，
+    # 由 WSGI 服务器关闭响应时释放连接名额
+    response.call_on_close(lambda: quote_hub.unsubscribe(sub))
+    response.headers['Cache-Control'] = 'no-cache'
+    # 反向代理（nginx）不缓冲事件流
+    response.headers['X-Accel-Buffering'] = 'no'
+    return response
+
+
 @app.route('/api/rates')
 def api_rates():
-    """获取汇率"""
+    """获取汇率（?date=YYYY-MM-DD 返回该日或之前最近一天的历史汇率）"""
+    date = request.args.get('date', '').strip()
+    if date:
+        try:
+            datetime.strptime(date, '%Y-%m-%d')
+        except ValueError:
+            return jsonify({"error": "Invalid date"}), 400
+        return jsonify(get_forex_rates_on(date))
     rates = get_forex_rates()
     return jsonify(rates)
 
@@ -692,10 +767,11 @@ def update_liability():
 def _save_snapshot_for_user(user_id=None):
     """保存用户当日快照（更实时）"""
     try:
-        stats = calculate_portfolio_stats(user_id)
+        date = snapshot_date()
+        stats = calculate_portfolio_stats(user_id, date)
         if is_weekend():
             stats['day_pnl'] = 0.0
-        db.save_daily_snapshot(stats, user_id)
+        db.save_daily_snapshot(stats, user_id, date)
     except Exception as e:
         logger.warning(f"Snapshot save failed: {e}")
 
@@ -953,9 +1029,48 @@ def api_price_health():
         "server_time_utc": datetime.now(timezone.utc).isoformat(),
         "runtime": get_price_runtime_metrics(),
         "sources": get_price_source_health(),
+        "warmer": price_warmer.stats(),
+        "cache_snapshot": quote_cache_snapshot.stats(),
+        "quote_stream": quote_hub.stats(),
     })
 
 
+@app.route('/api/system/negative_cache', methods=['GET'])
+def api_negative_cache():
+    """负缓存中的代码（暂停请求的代码、连续失败次数与剩余暂停时间）。"""
+    if not _metrics_token_ok():
+        _auth_audit(
+            event='metrics_access',
+            outcome='blocked',
+            reason='invalid_or_missing_token',
+            level='warning',
+        )
+        return jsonify({"error": "Unauthorized"}), 401
+
+    return jsonify({
+        "stats": negative_cache.stats(),
+        "entries": negative_cache.entries(),
+    })
+
+
+@app.route('/api/system/negative_cache/clear', methods=['POST'])
+def api_negative_cache_clear():
+    """清除负缓存（body: {"code": "..."} 清除单个代码，不传清除全部）。"""
+    if not _metrics_token_ok():
+        _auth_audit(
+            event='metrics_access',
+            outcome='blocked',
+            reason='invalid_or_missing_token',
+            level='warning',
+        )
+        return jsonify({"error": "Unauthorized"}), 401
+
+    data = request.get_json(silent=True) or {}
+    # 负缓存以规范代码为 key（600519 / sh600519 清除同一条）
+    code = canonical_code(data.get('code') or '') or None
+    return jsonify({"status": "ok", "cleared": negative_cache.clear(code)})
+
+
 # ============================================================
 # 分析 API
 # ============================================================
@@ -1033,7 +1148,7 @@ def analysis_rank():
     
     # 获取实时价格
     codes = [item['code'] for item in portfolio_data]
-    prices = batch_get_prices(codes)
+    prices = batch_get_prices(codes, deadline=config.RANK_PRICE_DEADLINE_SECONDS)
     
     # 计算盈亏
     result_items = []
@@ -1088,6 +1203,8 @@ if __name__ == '__main__':
     logger.info(f"Database: {config.DATABASE_PATH}")
     logger.info(f"Server: http://{config.HOST}:{config.PORT}")
     
+    _start_background_tasks()
+
     # 启动后台快照任务（默认关闭，建议用 cron 固定时间触发）
     if config.ENABLE_BACKGROUND_SNAPSHOT:
         threading.Thread(target=background_scheduler, daemon=True).start()
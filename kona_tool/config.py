@@ -32,6 +32,58 @@ RETRY_TIMES = 3
 RETRY_DELAY = 2
 SOURCE_FAIL_THRESHOLD = int(os.getenv("SOURCE_FAIL_THRESHOLD", "3"))
 SOURCE_COOLDOWN_SECONDS = int(os.getenv("SOURCE_COOLDOWN_SECONDS", "45"))
+# 数据源路由：按近期成功率与延迟排序数据源（样本数不足时保持默认顺序）
+ENABLE_PROVIDER_ROUTING = os.getenv("ENABLE_PROVIDER_ROUTING", "true").lower() != "false"
+ROUTING_MIN_SAMPLES = int(os.getenv("ROUTING_MIN_SAMPLES", "5"))
+ROUTING_FAIL_PENALTY_MS = float(os.getenv("ROUTING_FAIL_PENALTY_MS", str(API_TIMEOUT * 1000)))
+# 健康统计变化后数据源排序最多每隔该秒数重算一次（统计不变时一直复用）
+ROUTING_CACHE_SECONDS = float(os.getenv("ROUTING_CACHE_SECONDS", "1"))
+# 数据源亲和：记录每个代码最近一次返回有效行情的数据源并优先尝试，超过 N 天未命中失效
+ENABLE_PROVIDER_AFFINITY = os.getenv("ENABLE_PROVIDER_AFFINITY", "true").lower() != "false"
+PROVIDER_AFFINITY_TTL_DAYS = float(os.getenv("PROVIDER_AFFINITY_TTL_DAYS", "7"))
+# 对冲请求：主数据源超过其 p90 延迟未返回时并发请求备用数据源，先返回的有效结果胜出
+ENABLE_QUOTE_HEDGING = os.getenv("ENABLE_QUOTE_HEDGING", "false").lower() == "true"
+HEDGE_DELAY_DEFAULT_MS = float(os.getenv("HEDGE_DELAY_DEFAULT_MS", "800"))
+HEDGE_DELAY_MIN_MS = float(os.getenv("HEDGE_DELAY_MIN_MS", "100"))
+HEDGE_DELAY_MAX_MS = float(os.getenv("HEDGE_DELAY_MAX_MS", "2000"))
+HEDGE_MIN_SAMPLES = int(os.getenv("HEDGE_MIN_SAMPLES", "10"))
+# 基金多数据源并发竞速：所有适用数据源同时请求，按优先级取结果，deadline 后不再等待
+ENABLE_FUND_SOURCE_RACE = os.getenv("ENABLE_FUND_SOURCE_RACE", "false").lower() == "true"
+FUND_RACE_DEADLINE_SECONDS = float(os.getenv("FUND_RACE_DEADLINE_SECONDS", str(API_TIMEOUT + 0.5)))
+# 共享抓取线程池：每个进程对上游的最大并发数（行情/基金/搜索/快照共用）
+FETCH_MAX_WORKERS = int(os.getenv("FETCH_MAX_WORKERS", "16"))
+# 对冲 / 竞速专用小线程池：调用方本身在共享线程池中时仍能并发请求多个数据源
+RACE_MAX_WORKERS = int(os.getenv("RACE_MAX_WORKERS", "8"))
+# 批量行情：单次请求拼接的最大代码数（腾讯 / 新浪均支持逗号分隔多代码）
+BATCH_QUOTE_CHUNK_SIZE = int(os.getenv("BATCH_QUOTE_CHUNK_SIZE", "40"))
+# 批量行情时间预算（秒，0 不限制）：到期后未完成的代码返回过期缓存，获取继续在后台完成并写入缓存
+PRICES_BATCH_DEADLINE_SECONDS = float(os.getenv("PRICES_BATCH_DEADLINE_SECONDS", "4"))
+RANK_PRICE_DEADLINE_SECONDS = float(os.getenv("RANK_PRICE_DEADLINE_SECONDS", "4"))
+
+# HTTP 连接池（按数据源复用 keep-alive 连接）
+# pool_connections: 缓存的主机连接池数；pool_maxsize: 单主机保持的最大连接数
+# idle_timeout: Session 空闲超过该秒数后关闭重建（避免复用已被服务端断开的连接）
+HTTP_POOL_DEFAULT = {
+    "pool_connections": 4,
+    "pool_maxsize": int(os.getenv("HTTP_POOL_MAXSIZE", "10")),
+    "idle_timeout": int(os.getenv("HTTP_POOL_IDLE_TIMEOUT", "60")),
+}
+HTTP_POOL_SOURCES = {
+    # 行情主链路，batch_get_prices 并发最高
+    "tencent_stock": {"pool_maxsize": 16, "idle_timeout": 90},
+    "sina_stock": {"pool_maxsize": 16, "idle_timeout": 90},
+    "sina_us_stock": {"pool_maxsize": 16, "idle_timeout": 90},
+    "tiantian_fund": {"pool_maxsize": 16, "idle_timeout": 90},
+    # 搜索: search_stocks 每次并发 3 个新浪请求
+    "sina_search": {"pool_maxsize": 8, "idle_timeout": 30},
+    "eastmoney_fund_search": {"pool_maxsize": 4, "idle_timeout": 30},
+    # 全量代码表刷新（每天一次）
+    "eastmoney_symbol_list": {"pool_maxsize": 2, "idle_timeout": 30},
+    # 低频数据源
+    "sina_forex": {"pool_maxsize": 2, "idle_timeout": 120},
+    "sina_news": {"pool_maxsize": 2, "idle_timeout": 120},
+    "nasdaq_quote": {"pool_maxsize": 4, "idle_timeout": 30},
+}
 
 # HTTP请求头配置
 HEADERS = {
@@ -76,6 +128,55 @@ API_HEADERS = {
 CACHE_ENABLED = True
 CACHE_TTL = 60
 CACHE_STALE_TTL = int(os.getenv("CACHE_STALE_TTL", "300"))
+# 负缓存：所有数据源都失败的代码连续失败 NEGATIVE_CACHE_MIN_FAILURES 次后暂停请求，
+# 暂停时长从 BASE 起按失败次数翻倍，最长 MAX（秒）
+ENABLE_NEGATIVE_CACHE = os.getenv("ENABLE_NEGATIVE_CACHE", "true").lower() != "false"
+NEGATIVE_CACHE_BASE_SECONDS = float(os.getenv("NEGATIVE_CACHE_BASE_SECONDS", "60"))
+NEGATIVE_CACHE_MAX_SECONDS = float(os.getenv("NEGATIVE_CACHE_MAX_SECONDS", "3600"))
+NEGATIVE_CACHE_MIN_FAILURES = int(os.getenv("NEGATIVE_CACHE_MIN_FAILURES", "2"))
+# 负缓存最多记录的代码数（超出按最近失败 LRU 淘汰）
+NEGATIVE_CACHE_MAX_ENTRIES = int(os.getenv("NEGATIVE_CACHE_MAX_ENTRIES", "5000"))
+# stale-while-revalidate：缓存过期但仍在 CACHE_STALE_TTL 内时立即返回旧值，并在后台刷新
+ENABLE_PRICE_SWR = os.getenv("ENABLE_PRICE_SWR", "true").lower() != "false"
+# 缓存容量上限（LRU 淘汰）与过期条目清理间隔（秒）
+CACHE_MAX_ENTRIES = int(os.getenv("CACHE_MAX_ENTRIES", "5000"))
+CACHE_SWEEP_INTERVAL = int(os.getenv("CACHE_SWEEP_INTERVAL", "60"))
+# 跨 worker 共享行情缓存（L2）：redis://... 使用 Redis，memory:// 为进程内替身，留空仅使用进程内缓存
+PRICE_CACHE_REDIS_URL = os.getenv("PRICE_CACHE_REDIS_URL", "")
+PRICE_CACHE_REDIS_PREFIX = os.getenv("PRICE_CACHE_REDIS_PREFIX", "kona:quote:")
+PRICE_CACHE_REDIS_TIMEOUT = float(os.getenv("PRICE_CACHE_REDIS_TIMEOUT", "0.2"))
+# 行情缓存落盘（定期及退出时保存，启动时加载，重启后缓存仍可命中；默认关闭，开启后由后台任务写入）
+ENABLE_QUOTE_CACHE_SNAPSHOT = os.getenv("ENABLE_QUOTE_CACHE_SNAPSHOT", "false").lower() == "true"
+QUOTE_CACHE_SNAPSHOT_PATH = Path(os.getenv("QUOTE_CACHE_SNAPSHOT_PATH", str(DATABASE_PATH.parent / "quote_cache.db")))
+QUOTE_CACHE_SNAPSHOT_INTERVAL = int(os.getenv("QUOTE_CACHE_SNAPSHOT_INTERVAL", "60"))
+# 按市场开闭市选择缓存有效期（A股/港股/美股/基金）
+# 开市使用 CACHE_TTL，休市缓存到下一次开盘；场外基金缓存到下一个净值公布窗口
+CACHE_MARKET_AWARE_TTL = os.getenv("CACHE_MARKET_AWARE_TTL", "true").lower() != "false"
+# 收盘后仍按 CACHE_TTL 刷新的时长（等待收盘价落定）
+CACHE_CLOSE_GRACE_SECONDS = int(os.getenv("CACHE_CLOSE_GRACE_SECONDS", "300"))
+# 场外基金净值公布窗口（北京时间，交易日）及窗口内的轮询间隔
+FUND_NAV_PUBLISH_START = os.getenv("FUND_NAV_PUBLISH_START", "18:00")
+FUND_NAV_PUBLISH_END = os.getenv("FUND_NAV_PUBLISH_END", "23:30")
+FUND_NAV_POLL_TTL = int(os.getenv("FUND_NAV_POLL_TTL", "600"))
+# 确认净值未更新（QDII 晚公布 / 数据源无净值日期）时公布窗口外的轮询间隔（秒）
+FUND_NAV_STALE_POLL_TTL = int(os.getenv("FUND_NAV_STALE_POLL_TTL", "3600"))
+
+# 行情预热：后台定时刷新所有用户持仓代码，使交互请求命中缓存
+# 多 worker 部署时每个进程各自预热本进程缓存
+ENABLE_PRICE_WARMER = os.getenv("ENABLE_PRICE_WARMER", "false").lower() == "true"
+PRICE_WARMER_INTERVAL = int(os.getenv("PRICE_WARMER_INTERVAL", "5"))
+# 缓存剩余有效期小于该秒数时提前刷新
+PRICE_WARMER_LEAD_SECONDS = int(os.getenv("PRICE_WARMER_LEAD_SECONDS", "10"))
+
+# 实时行情推送（/api/prices/stream，SSE）：每个进程一个刷新循环，只推送变化的报价
+ENABLE_QUOTE_STREAM = os.getenv("ENABLE_QUOTE_STREAM", "true").lower() != "false"
+QUOTE_STREAM_INTERVAL = float(os.getenv("QUOTE_STREAM_INTERVAL", "5"))
+# 每个连接占用一个 worker 线程（gthread），上限需小于 gunicorn --threads，为普通请求留出线程
+QUOTE_STREAM_MAX_CONNECTIONS = int(os.getenv("QUOTE_STREAM_MAX_CONNECTIONS", "2"))
+QUOTE_STREAM_HEARTBEAT_SECONDS = float(os.getenv("QUOTE_STREAM_HEARTBEAT_SECONDS", "15"))
+# 连接最长保持时间（秒），到期后客户端自动重连
+QUOTE_STREAM_MAX_SECONDS = float(os.getenv("QUOTE_STREAM_MAX_SECONDS", "600"))
+QUOTE_STREAM_MAX_CODES = int(os.getenv("QUOTE_STREAM_MAX_CODES", "200"))
 
 # 汇率配置
 DEFAULT_FOREX_RATES = {
@@ -83,6 +184,22 @@ DEFAULT_FOREX_RATES = {
     "HKD": 0.93,
     "CNY": 1.00
 }
+# 需要获取的币种（一次请求批量获取），缓存有效期（秒）
+FOREX_CURRENCIES = [c.strip().upper() for c in os.getenv("FOREX_CURRENCIES", "USD,HKD,EUR,GBP,JPY,SGD").split(",") if c.strip()]
+FOREX_TTL = int(os.getenv("FOREX_TTL", "300"))
+
+# 美股 ETF / 股票分类记录的有效期（天），过期后在后台重新向 Nasdaq 确认
+ASSET_CLASSIFICATION_TTL_DAYS = int(os.getenv("ASSET_CLASSIFICATION_TTL_DAYS", "30"))
+
+# 本地代码表（搜索优先查本地索引，命中不足 SYMBOL_SEARCH_MIN_HITS 条时再请求上游搜索接口）
+# 刷新会请求东方财富全量列表，默认关闭（与行情预热一致，按需开启）
+ENABLE_SYMBOL_REFRESH = os.getenv("ENABLE_SYMBOL_REFRESH", "false").lower() == "true"
+# 全量代码表（A股 + 场外基金）刷新间隔（秒）
+SYMBOL_REFRESH_INTERVAL = int(os.getenv("SYMBOL_REFRESH_INTERVAL", "86400"))
+SYMBOL_SEARCH_MIN_HITS = int(os.getenv("SYMBOL_SEARCH_MIN_HITS", "5"))
+# 搜索结果缓存（规范化查询词 -> 结果，TTL 秒 + LRU 容量）
+SEARCH_CACHE_TTL = int(os.getenv("SEARCH_CACHE_TTL", "300"))
+SEARCH_CACHE_MAX_ENTRIES = int(os.getenv("SEARCH_CACHE_MAX_ENTRIES", "500"))
 
 # 证券代码前缀映射
 CODE_PREFIX_MAPPING = {
@@ -100,9 +217,11 @@ API_ENDPOINTS = {
     "sinajs_stock": "http://hq.sinajs.cn/list",
     "sina_stock": "http://hq.sinajs.cn/list={code}",
     "tencent_stock": "http://qt.gtimg.cn/q={code}",
-    "sina_forex": "http://hq.sinajs.cn/list=hf_USDCNY,hf_HKDCNY",
+    "sina_forex": "http://hq.sinajs.cn/list={symbols}",
     "sina_search": "http://suggest3.sinajs.cn/suggest/type=11,12,13,14,15&key={query}&name=suggestdata_{timestamp}",
     "eastmoney_stock": "https://push2.eastmoney.com/api/qt/stock/get",
+    "eastmoney_stock_list": "https://push2.eastmoney.com/api/qt/clist/get",
+    "eastmoney_fund_list": "https://fund.eastmoney.com/js/fundcode_search.js",
     "eastmoney_fund10": "https://api.fund.10jqka.com/fund?apiversion=2.0",
     "eastmoney_fund_nav": "https://api.fund.10jqka.com/fund?apiversion=1.0",
     "eastmoney_fund_info": "https://fund.10jqka.com/fund?apiversion=1.0",
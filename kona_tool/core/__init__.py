@@ -4,6 +4,7 @@
 """
 from .db import DatabaseManager
 from .price import get_price, batch_get_prices, get_forex_rates, search_stocks
+from .forex import get_forex_rates_on
 from .parser import parse_code, get_display_code
 
 __all__ = [
@@ -11,6 +12,7 @@ __all__ = [
     'get_price',
     'batch_get_prices',
     'get_forex_rates',
+    'get_forex_rates_on',
     'search_stocks',
     'parse_code',
     'get_display_code'
@@ -0,0 +1,141 @@
+"""
+数据源亲和
+记录每个代码最近一次返回有效行情的数据源，后续请求优先尝试该数据源，避免每次刷新都走完整降级链
+"""
+import logging
+import threading
+import time
+from typing import Any, Dict, List, Optional, Sequence, Tuple, TypeVar
+
+import config
+
+logger = logging.getLogger(__name__)
+
+T = TypeVar("T")
+
+
+class ProviderAffinity:
+    """
+    代码 -> 数据源亲和表（内存 + portfolio.db 中的 provider_affinity 表）
+
+    - 首次使用时从数据库加载，并清理超过 ttl 的记录
+    - 数据源变化，或距上次写入超过 ttl 的一半时写库，其余只更新内存
+    - 超过 ttl 未再命中的亲和记录视为失效（数据源可能已恢复或代码已变化）
+    """
+
+    def __init__(self, ttl_seconds: float, enabled: bool = True, database=None):
+        self.ttl_seconds = max(60.0, float(ttl_seconds))
+        self.enabled = enabled
+        self._database = database
+        self._lock = threading.Lock()
+        self._loaded = False
+        self._entries: Dict[str, Tuple[str, float]] = {}
+        self._persisted: Dict[str, float] = {}
+        self._stats: Dict[str, int] = {"hits": 0, "misses": 0, "changes": 0, "writes": 0}
+
+    def _db(self):
+        if self._database is not None:
+            return self._database
+        from .db import db
+        return db
+
+    def _ensure_loaded(self) -> None:
+        if self._loaded:
+            return
+        with self._lock:
+            if self._loaded:
+                return
+            self._loaded = True
+        cutoff = time.time() - self.ttl_seconds
+        try:
+            database = self._db()
+            database.delete_provider_affinities_before(cutoff)
+            rows = database.get_provider_affinities(cutoff)
+        except Exception as e:
+            logger.warning(f"Failed to load provider affinities: {e}")
+            rows = {}
+        with self._lock:
+            for code, (provider, updated_at) in rows.items():
+                if code not in self._entries:
+                    self._entries[code] = (provider, updated_at)
+                    self._persisted[code] = updated_at
+
+    def get(self, code: str) -> Optional[str]:
+        """代码当前的亲和数据源，无记录或已失效返回 None"""
+        if not self.enabled:
+            return None
+        self._ensure_loaded()
+        with self._lock:
+            entry = self._entries.get(code)
+            if entry is None:
+                return None
+            if time.time() - entry[1] > self.ttl_seconds:
+                del self._entries[code]
+                self._persisted.pop(code, None)
+                return None
+            return entry[0]
+
+    def prefer(self, code: str, items: Sequence[T], key=lambda item: item) -> List[T]:
+        """
+        将亲和数据源移到最前，其余保持原顺序
+
+        Args:
+            items: 数据源列表（名称或 (名称, 函数) 等）
+            key: 从列表元素取数据源名称
+        """
+        items = list(items)
+        provider = self.get(code)
+        if provider is None:
+            return items
+        for i, item in enumerate(items):
+            if key(item) == provider:
+                return [item] + items[:i] + items[i + 1:]
+        return items
+
+    def record(self, code: str, provider: str) -> None:
+        """记录代码最近一次返回有效行情的数据源"""
+        if not self.enabled:
+            return
+        self._ensure_loaded()
+        now = time.time()
+        with self._lock:
+            previous = self._entries.get(code)
+            self._entries[code] = (provider, now)
+            if previous is not None and previous[0] == provider:
+                self._stats["hits"] += 1
+            else:
+                self._stats["changes"] += 1
+                if previous is not None:
+                    self._stats["misses"] += 1
+            persist = (
+                previous is None
+                or previous[0] != provider
+                or now - self._persisted.get(code, 0.0) > self.ttl_seconds / 2
+            )
+            if persist:
+                self._persisted[code] = now
+                self._stats["writes"] += 1
+        if persist:
+            self._db().save_provider_affinity(code, provider, now)
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            out: Dict[str, Any] = dict(self._stats)
+            out["size"] = len(self._entries)
+            out["ttl_seconds"] = self.ttl_seconds
+            return out
+
+    def reset(self) -> None:
+        """清空内存状态（下次使用时重新从数据库加载）"""
+        with self._lock:
+            self._entries.clear()
+            self._persisted.clear()
+            self._loaded = False
+            for key in self._stats:
+                self._stats[key] = 0
+
+
+provider_affinity = ProviderAffinity(
+    ttl_seconds=config.PROVIDER_AFFINITY_TTL_DAYS * 86400,
+    enabled=config.ENABLE_PROVIDER_AFFINITY,
+)
@@ -1,25 +1,38 @@
 """
 资产类型识别模块
 统一判断 A股 / 美股 / 港股 / 基金
+美股 ETF / 股票的区分需要请求 Nasdaq，结果持久化在 asset_classification 表
 """
 import re
 import logging
-from typing import Optional
+import threading
+import time
+from typing import Any, Dict, Iterable, List, Optional, Tuple
 
+import config
+from .executor import fetch_executor
 from .stock import get_us_asset_type
 
 logger = logging.getLogger(__name__)
 
+SOURCE_NASDAQ = "nasdaq"
+# Nasdaq 未能判断（请求失败 / 无数据）时按股票处理
+SOURCE_DEFAULT = "default"
+
 
 def _name_hint_is_fund(name: str) -> bool:
     n = (name or '').upper()
     return 'ETF' in n or '基金' in name or 'FUND' in n
 
 
-def infer_asset_type(code: str, name: str = '') -> str:
+def us_symbol_key(code: str) -> str:
+    """美股分类记录的 key（gb_aapl / us.AAPL / AAPL -> AAPL）"""
+    return (code or '').strip().upper().replace('GB_', '').replace('US.', '')
+
+
+def _rule_asset_type(code: str, name: str = '') -> Optional[str]:
     """
-    根据代码 + 名称推断资产类型
-    返回: a / us / hk / fund
+    仅凭代码 + 名称规则判断资产类型，美股代码（需要区分 ETF / 股票）返回 None
     """
     c = (code or '').strip()
     if not c:
@@ -39,15 +52,216 @@ def infer_asset_type(code: str, name: str = '') -> str:
 
     # 美股（gb_ 或 纯字母/点）
     if c.lower().startswith('gb_') or re.fullmatch(r'[A-Za-z\\.]+', c):
-        us_type = get_us_asset_type(c)
-        if us_type == 'fund':
-            return 'fund'
-        return 'us'
+        return None
 
     # 其他默认 A 股
     return 'a'
 
 
+class AssetClassifier:
+    """
+    美股资产类型分类缓存（内存 + portfolio.db 中的 asset_classification 表）
+
+    - 首次使用时从数据库加载全部分类记录
+    - 已有记录直接返回；超过 ttl（Nasdaq 未能判断的记录超过 UNRESOLVED_RETRY_SECONDS）
+      时在后台线程池重新判断，本次仍返回已有结果
+    - 无记录时 wait=True 同步请求 Nasdaq（添加资产），wait=False 先按股票返回并在后台判断（搜索）
+    - 同一代码同时只有一个后台判断任务
+    - 持仓批量回填中按股票处理的代码通过 queue() 排队确认；start() 之前排队的代码
+      在进程后台任务启动时才提交（初始化数据库 / 导入模块时不请求 Nasdaq）
+    """
+
+    UNRESOLVED_RETRY_SECONDS = 6 * 3600
+
+    def __init__(self, ttl_seconds: float, executor=None, database=None):
+        self.ttl_seconds = max(3600.0, float(ttl_seconds))
+        self._executor = executor or fetch_executor
+        self._database = database
+        self._lock = threading.Lock()
+        self._loaded = False
+        self._entries: Dict[str, Tuple[str, str, float]] = {}
+        self._pending: set = set()
+        self._queued: Dict[str, set] = {}
+        self._started = False
+        self._stats: Dict[str, int] = {"hits": 0, "misses": 0, "checks": 0, "background_checks": 0, "changes": 0}
+
+    def _db(self):
+        if self._database is not None:
+            return self._database
+        from .db import db
+        return db
+
+    def _ensure_loaded(self) -> None:
+        if self._loaded:
+            return
+        with self._lock:
+            if self._loaded:
+                return
+            self._loaded = True
+        try:
+            rows = self._db().get_asset_classifications()
+        except Exception as e:
+            logger.warning(f"Failed to load asset classifications: {e}")
+            rows = {}
+        with self._lock:
+            for key, entry in rows.items():
+                self._entries.setdefault(key, entry)
+
+    def _is_stale(self, entry: Tuple[str, str, float], now: float) -> bool:
+        ttl = self.ttl_seconds if entry[1] != SOURCE_DEFAULT else min(self.ttl_seconds, self.UNRESOLVED_RETRY_SECONDS)
+        return now - entry[2] >= ttl
+
+    def get(self, code: str) -> Optional[str]:
+        """已记录的分类（不触发请求）"""
+        self._ensure_loaded()
+        with self._lock:
+            entry = self._entries.get(us_symbol_key(code))
+        return entry[0] if entry else None
+
+    def check(self, code: str) -> str:
+        """请求 Nasdaq 判断并保存分类"""
+        self._ensure_loaded()
+        key = us_symbol_key(code)
+        us_type = get_us_asset_type(key)
+        asset_type = 'fund' if us_type == 'fund' else 'us'
+        source = SOURCE_NASDAQ if us_type else SOURCE_DEFAULT
+        now = time.time()
+        with self._lock:
+            self._stats["checks"] += 1
+            previous = self._entries.get(key)
+            if previous is not None and previous[0] != asset_type and us_type:
+                self._stats["changes"] += 1
+            # Nasdaq 本次未能判断时保留之前已确认的分类，只更新检查时间
+            if previous is not None and previous[1] == SOURCE_NASDAQ and not us_type:
+                asset_type, source = previous[0], previous[1]
+            self._entries[key] = (asset_type, source, now)
+        self._db().save_asset_classification(key, asset_type, source, now)
+        return asset_type
+
+    def _check_in_background(self, key: str, holdings: Optional[set] = None) -> None:
+        with self._lock:
+            if key in self._pending:
+                return
+            self._pending.add(key)
+            self._stats["background_checks"] += 1
+
+        def run():
+            try:
+                asset_type = self.check(key)
+                if holdings and asset_type != 'us':
+                    # 回填时按股票写入的持仓同步更新为确认后的类型
+                    self._db().update_portfolio_asset_type(holdings, asset_type, previous='us')
+            except Exception as e:
+                logger.debug(f"Asset classification check failed for {key}: {e}")
+            finally:
+                with self._lock:
+                    self._pending.discard(key)
+
+        try:
+            self._executor.submit(run)
+        except Exception as e:
+            with self._lock:
+                self._pending.discard(key)
+            logger.debug(f"Asset classification check not scheduled for {key}: {e}")
+
+    def classify(self, code: str, wait: bool = True) -> str:
+        """美股代码 -> 'us' / 'fund'"""
+        self._ensure_loaded()
+        key = us_symbol_key(code)
+        with self._lock:
+            entry = self._entries.get(key)
+            self._stats["hits" if entry else "misses"] += 1
+        if entry is not None:
+            if self._is_stale(entry, time.time()):
+                self._check_in_background(key)
+            return entry[0]
+        if wait:
+            return self.check(key)
+        self._check_in_background(key)
+        return 'us'
+
+    def queue(self, codes: Iterable[str]) -> int:
+        """
+        排队后台确认持仓中按股票回填的美股代码（确认为 ETF 时更新持仓的 asset_type）
+
+        Returns:
+            本次提交的后台判断数（start() 之前为 0，代码留在队列中）
+        """
+        with self._lock:
+            for code in codes:
+                self._queued.setdefault(us_symbol_key(code), set()).add(code)
+            if not self._started:
+                return 0
+            queued, self._queued = self._queued, {}
+        for key, holdings in queued.items():
+            self._check_in_background(key, holdings)
+        return len(queued)
+
+    def start(self) -> int:
+        """允许提交排队的后台判断并提交此前排队的代码（幂等，进程后台任务启动时调用）"""
+        with self._lock:
+            self._started = True
+        return self.queue(())
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            out: Dict[str, Any] = dict(self._stats)
+            out["size"] = len(self._entries)
+            out["pending"] = len(self._pending)
+            out["queued"] = len(self._queued)
+            return out
+
+    def reset(self) -> None:
+        """清空内存状态（下次使用时重新从数据库加载）"""
+        with self._lock:
+            self._entries.clear()
+            self._loaded = False
+            for key in self._stats:
+                self._stats[key] = 0
+
+
+asset_classifier = AssetClassifier(ttl_seconds=config.ASSET_CLASSIFICATION_TTL_DAYS * 86400)
+
+
+def infer_asset_type(code: str, name: str = '', wait: bool = True) -> str:
+    """
+    根据代码 + 名称推断资产类型
+    返回: a / us / hk / fund
+
+    Args:
+        wait: 美股代码尚无分类记录时是否同步请求 Nasdaq；False 时先按美股股票返回，后台判断
+    """
+    rule = _rule_asset_type(code, name)
+    if rule is not None:
+        return rule
+    return asset_classifier.classify(code, wait=wait)
+
+
+def bulk_infer_asset_types(rows: Iterable[Tuple[str, str]], known: Dict[str, str]) -> List[Tuple[str, str]]:
+    """
+    批量推断资产类型（不发请求）：美股代码使用 known 中的分类，无记录按股票处理并排队后台确认
+
+    Args:
+        rows: [(code, name), ...]
+        known: {us_symbol_key: asset_type}
+    Returns:
+        [(asset_type, code), ...]，可直接用于 UPDATE ... SET asset_type = ? WHERE code = ?
+    """
+    out = []
+    unknown = []
+    for code, name in rows:
+        rule = _rule_asset_type(code, name)
+        if rule is None:
+            key = us_symbol_key(code)
+            if key not in known:
+                unknown.append(code)
+            rule = known.get(key, 'us')
+        out.append((rule, code))
+    if unknown:
+        asset_classifier.queue(unknown)
+    return out
+
+
 def asset_type_label(asset_type: str) -> str:
     mapping = {
         'a': 'A股',
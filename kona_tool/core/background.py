@@ -0,0 +1,67 @@
+"""
+后台循环任务
+提供可启停、fork 安全的周期任务线程（用于行情预热等后台任务）
+"""
+import logging
+import os
+import threading
+from typing import Callable, Optional
+
+logger = logging.getLogger(__name__)
+
+
+class BackgroundLoop:
+    """
+    周期执行 target 的守护线程
+
+    - start() 幂等：同一进程内重复调用不会重复启动
+    - 记录启动时的 pid：gunicorn --preload 在 master 中启动的线程不会被 fork 到 worker，
+      worker 中再次调用 start() 会重新启动
+    - target 抛出的异常只记录日志，不会终止循环
+    """
+
+    def __init__(self, name: str, interval: float, target: Callable[[], None]):
+        self.name = name
+        self.interval = max(0.1, float(interval))
+        self._target = target
+        self._lock = threading.Lock()
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+        self._pid: Optional[int] = None
+
+    def is_running(self) -> bool:
+        return (
+            self._thread is not None
+            and self._pid == os.getpid()
+            and self._thread.is_alive()
+        )
+
+    def start(self) -> bool:
+        """启动后台线程，已在运行时返回 False"""
+        with self._lock:
+            if self.is_running():
+                return False
+            self._stop = threading.Event()
+            self._thread = threading.Thread(target=self._run, args=(self._stop,), name=self.name, daemon=True)
+            self._pid = os.getpid()
+            self._thread.start()
+            logger.info(f"Background loop started: {self.name} (interval={self.interval}s)")
+            return True
+
+    def stop(self, timeout: float = 5.0) -> None:
+        with self._lock:
+            thread = self._thread if self.is_running() else None
+            self._stop.set()
+            self._thread = None
+            self._pid = None
+        if thread is not None and thread is not threading.current_thread():
+            thread.join(timeout)
+            logger.info(f"Background loop stopped: {self.name}")
+
+    def _run(self, stop: threading.Event) -> None:
+        while not stop.is_set():
+            try:
+                self._target()
+            except Exception as e:
+                logger.error(f"Background loop {self.name} error: {e}")
+            stop.wait(self.interval)
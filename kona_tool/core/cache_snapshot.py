@@ -0,0 +1,150 @@
+"""
+行情缓存落盘
+定期（及进程退出时）将 PriceCache 写入 portfolio.db 旁的 SQLite 文件，启动时重新加载，
+部署/重启后缓存即可命中，回退值也立即可用
+"""
+import logging
+import sqlite3
+import threading
+import time
+from pathlib import Path
+from typing import Any, Dict
+
+import config
+from .background import BackgroundLoop
+from .shared_cache import decode_entry, encode_entry
+
+logger = logging.getLogger(__name__)
+
+
+class QuoteCacheSnapshot:
+    """
+    PriceCache 快照
+
+    - 每行：代码 + 40 字节紧凑编码（获取时间戳 + 行情），与共享缓存编码一致
+    - 写入按代码 upsert，仅当获取时间更新时覆盖，多个 worker 写同一文件时互不回退
+    - 加载时保留原获取时间戳，新鲜/回退判断与落盘前一致，超出回退窗口的条目直接丢弃
+    """
+
+    # 文件中保留的最长时间（休市期间缓存可能跨周末有效）
+    MAX_AGE_SECONDS = 7 * 86400
+
+    def __init__(self, path: Path, interval: float = 60):
+        self.path = Path(path)
+        self._loop = BackgroundLoop("kona-quote-snapshot", interval, self.save)
+        self._lock = threading.Lock()
+        self._loaded = False
+        self._stats: Dict[str, Any] = {
+            "saves": 0,
+            "saved_entries": 0,
+            "last_save_at": 0.0,
+            "last_save_ms": 0.0,
+            "loaded_entries": 0,
+            "errors": 0,
+            "last_error": "",
+        }
+
+    def _connect(self) -> sqlite3.Connection:
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        conn = sqlite3.connect(str(self.path), timeout=5)
+        conn.execute(
+            "CREATE TABLE IF NOT EXISTS quote_cache ("
+            "code TEXT PRIMARY KEY, entry BLOB NOT NULL, fetched_at REAL NOT NULL)"
+        )
+        return conn
+
+    def _record_error(self, action: str, e: Exception) -> None:
+        with self._lock:
+            self._stats["errors"] += 1
+            self._stats["last_error"] = f"{action}: {e}"[:160]
+        logger.warning(f"Quote cache snapshot {action} failed: {e}")
+
+    def save(self, cache=None) -> int:
+        """将缓存写入文件，返回写入条目数"""
+        if cache is None:
+            from .price import price_cache as cache
+        start = time.monotonic()
+        entries = cache.export_entries()
+        rows = [(code, encode_entry(data, ts), ts) for code, data, ts in entries]
+        try:
+            conn = self._connect()
+            try:
+                with conn:
+                    conn.executemany(
+                        "INSERT INTO quote_cache (code, entry, fetched_at) VALUES (?, ?, ?) "
+                        "ON CONFLICT(code) DO UPDATE SET entry = excluded.entry, fetched_at = excluded.fetched_at "
+                        "WHERE excluded.fetched_at > quote_cache.fetched_at",
+                        rows,
+                    )
+                    conn.execute(
+                        "DELETE FROM quote_cache WHERE fetched_at < ?",
+                        (time.time() - self.MAX_AGE_SECONDS,),
+                    )
+            finally:
+                conn.close()
+        except Exception as e:
+            self._record_error("save", e)
+            return 0
+
+        with self._lock:
+            self._stats["saves"] += 1
+            self._stats["saved_entries"] = len(rows)
+            self._stats["last_save_at"] = time.time()
+            self._stats["last_save_ms"] = round((time.monotonic() - start) * 1000, 1)
+        return len(rows)
+
+    def load(self, cache=None) -> int:
+        """从文件加载到缓存，返回加载条目数（仍在回退窗口内的条目）"""
+        if cache is None:
+            from .price import price_cache as cache
+        if not self.path.exists():
+            return 0
+        try:
+            conn = self._connect()
+            try:
+                rows = conn.execute("SELECT code, entry FROM quote_cache").fetchall()
+            finally:
+                conn.close()
+        except Exception as e:
+            self._record_error("load", e)
+            return 0
+
+        entries = []
+        for code, raw in rows:
+            decoded = decode_entry(raw)
+            if decoded is not None:
+                entries.append((code, decoded[0], decoded[1]))
+        loaded = cache.load_entries(entries)
+        with self._lock:
+            self._stats["loaded_entries"] = loaded
+        logger.info(f"Quote cache snapshot loaded {loaded}/{len(rows)} entries from {self.path}")
+        return loaded
+
+    def start(self) -> bool:
+        """首次调用时加载快照，并启动定期保存（幂等）"""
+        with self._lock:
+            first = not self._loaded
+            self._loaded = True
+        if first:
+            self.load()
+        return self._loop.start()
+
+    def stop(self) -> None:
+        """停止定期保存并写入最后一次快照"""
+        was_running = self._loop.is_running()
+        self._loop.stop()
+        if was_running:
+            self.save()
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            out = dict(self._stats)
+        out["running"] = self._loop.is_running()
+        out["path"] = str(self.path)
+        return out
+
+
+quote_cache_snapshot = QuoteCacheSnapshot(
+    path=config.QUOTE_CACHE_SNAPSHOT_PATH,
+    interval=config.QUOTE_CACHE_SNAPSHOT_INTERVAL,
+)
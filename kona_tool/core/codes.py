@@ -0,0 +1,101 @@
+"""
+证券代码规范化
+同一标的在不同来源中写法不同（00700.HK / hk00700 / rt_hk00700，600519 / sh600519，AAPL / gb_aapl），
+统一映射为一个规范代码，用作缓存、single-flight、数据源亲和等的 key，避免同一标的重复请求与缓存
+规范形式与 parse_code 写入持仓的格式一致：
+- A股: sh600519 / sz000001 / bj430047，指数 s_sh000001
+- 港股: 00700.HK（5 位补零），港股指数 hkHSTECH
+- 美股: gb_aapl（小写）
+- 基金: f_000001 / ft_<ISIN>（原样）
+"""
+import re
+from functools import lru_cache
+
+_A_SHARE_RE = re.compile(r'(sh|sz|bj)(\d{6})')
+_HK_PREFIXED_RE = re.compile(r'(?:rt_)?hk(\d{1,5})', re.I)
+_HK_SUFFIXED_RE = re.compile(r'(\d{1,5})\.hk', re.I)
+# 港股指数写作小写 hk + 大写名称（hkHSTECH），避免与 HKD 等美股代码混淆
+_HK_INDEX_RE = re.compile(r'(?:rt_)?hk([A-Z]+)')
+_US_RE = re.compile(r'[a-z.$]+')
+
+
+def _a_share_prefix(digits: str) -> str:
+    """6 位纯数字的交易所前缀（沪: 5/6/9，北: 4/8，其余深市）"""
+    if digits[0] in '569':
+        return 'sh'
+    if digits[0] in '48':
+        return 'bj'
+    return 'sz'
+
+
+@lru_cache(maxsize=4096)
+def canonical_code(code: str) -> str:
+    """
+    代码 -> 规范代码（无法识别的写法去除首尾空白后原样返回）
+
+    Args:
+        code: 任意来源的代码（持仓、搜索结果、接口原始输入）
+    """
+    c = (code or '').strip()
+    if not c:
+        return ''
+    lower = c.lower()
+
+    # 场外基金 / FT 基金：前缀统一小写，代码部分原样
+    if lower.startswith('f_'):
+        return 'f_' + c[2:]
+    if lower.startswith('ft_'):
+        return 'ft_' + c[3:]
+
+    # A股指数
+    if lower.startswith('s_'):
+        return lower
+
+    # 港股
+    match = _HK_PREFIXED_RE.fullmatch(c) or _HK_SUFFIXED_RE.fullmatch(c)
+    if match:
+        return match.group(1).zfill(5) + '.HK'
+    match = _HK_INDEX_RE.fullmatch(c)
+    if match:
+        return 'hk' + match.group(1)
+
+    # A股
+    if _A_SHARE_RE.fullmatch(lower):
+        return lower
+    if lower.isdigit() and len(lower) == 6:
+        return _a_share_prefix(lower) + lower
+
+    # 美股（gb_ / us. 前缀或纯字母）
+    if lower.startswith('gb_'):
+        return lower
+    if lower.startswith('us.'):
+        symbol = lower[3:].lstrip('.')
+        return 'gb_' + symbol if symbol else c
+    if _US_RE.fullmatch(lower):
+        symbol = lower.lstrip('.')
+        return 'gb_' + symbol if symbol else c
+
+    return c
+
+
+def market_of(code: str) -> str:
+    """
+    代码所属市场：a / hk / us / fund，其他（含 A股指数）为 other
+
+    按规范代码判断，迁移前的旧写法（hk00700、600519）与规范写法结果一致
+    """
+    c = canonical_code(code)
+    if _A_SHARE_RE.fullmatch(c):
+        return 'a'
+    if c.endswith('.HK') or c.startswith('hk'):
+        return 'hk'
+    if c.startswith('gb_'):
+        return 'us'
+    if c.startswith('f_') or c.startswith('ft_'):
+        return 'fund'
+    return 'other'
+
+
+def same_instrument(a: str, b: str) -> bool:
+    """两个代码是否指向同一标的"""
+    return canonical_code(a) == canonical_code(b)
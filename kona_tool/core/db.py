@@ -4,10 +4,11 @@
 """
 import sqlite3
 import logging
-from typing import List, Dict, Any, Optional
+from typing import List, Dict, Any, Optional, Tuple
 from datetime import datetime
 from pathlib import Path
 import config  # 添加导入
+from .codes import canonical_code, market_of
 
 logger = logging.getLogger(__name__)
 
@@ -152,6 +153,64 @@ class DatabaseManager:
             )
         ''')
 
+        # 代码 -> 最近一次返回有效行情的数据源（数据源亲和）
+        cursor.execute('''
+            CREATE TABLE IF NOT EXISTS provider_affinity (
+                code TEXT PRIMARY KEY,
+                provider TEXT NOT NULL,
+                updated_at REAL NOT NULL
+            )
+        ''')
+
+        # 场外基金确认净值（按基金代码 + 净值日期）
+        cursor.execute('''
+            CREATE TABLE IF NOT EXISTS fund_nav (
+                code TEXT NOT NULL,
+                nav_date TEXT NOT NULL,
+                nav REAL NOT NULL,
+                prev_nav REAL NOT NULL,
+                change_pct REAL NOT NULL,
+                source TEXT NOT NULL,
+                fetched_at REAL NOT NULL,
+                PRIMARY KEY (code, nav_date)
+            )
+        ''')
+
+        # 每日汇率历史（1 外币 = rate 人民币）
+        cursor.execute('''
+            CREATE TABLE IF NOT EXISTS forex_rates (
+                date TEXT NOT NULL,
+                currency TEXT NOT NULL,
+                rate REAL NOT NULL,
+                updated_at REAL NOT NULL,
+                PRIMARY KEY (date, currency)
+            )
+        ''')
+
+        # 代码表（本地搜索索引的持久化）
+        cursor.execute('''
+            CREATE TABLE IF NOT EXISTS symbol_master (
+                code TEXT PRIMARY KEY,
+                name TEXT NOT NULL,
+                pinyin TEXT NOT NULL DEFAULT '',
+                market TEXT NOT NULL,
+                currency TEXT NOT NULL,
+                asset_type TEXT NOT NULL,
+                source TEXT NOT NULL,
+                updated_at REAL NOT NULL
+            )
+        ''')
+
+        # 美股资产类型分类（key 为去前缀的大写代码，见 asset_type.us_symbol_key）
+        cursor.execute('''
+            CREATE TABLE IF NOT EXISTS asset_classification (
+                code TEXT PRIMARY KEY,
+                asset_type TEXT NOT NULL,
+                source TEXT NOT NULL,
+                checked_at REAL NOT NULL
+            )
+        ''')
+
         # Ensure user_id columns exist for older DBs
         def _ensure_column(table: str, column: str, col_def: str) -> None:
             cursor.execute(f'PRAGMA table_info({table})')
@@ -188,6 +247,9 @@ class DatabaseManager:
         cursor.execute('CREATE INDEX IF NOT EXISTS idx_daily_snapshots_user_id ON daily_snapshots(user_id)')
         cursor.execute('CREATE UNIQUE INDEX IF NOT EXISTS idx_daily_snapshots_date_user_unique ON daily_snapshots(date, user_id)')
 
+        # 旧写法代码改写为规范代码
+        self._ensure_canonical_codes(cursor)
+
         # 确保 asset_type 列存在并回填
         self._ensure_portfolio_asset_type(cursor)
 
@@ -208,8 +270,262 @@ class DatabaseManager:
             conn.close()
         logger.info("Database initialized successfully")
 
+    def get_held_codes(self) -> List[str]:
+        """获取所有用户持仓代码的并集（规范代码去重，用于后台行情预热）"""
+        conn = self.get_connection()
+        cursor = conn.cursor()
+        try:
+            cursor.execute('SELECT DISTINCT code FROM portfolio WHERE qty > 0')
+            codes = (canonical_code(row['code']) for row in cursor.fetchall() if row['code'])
+            return list(dict.fromkeys(code for code in codes if code))
+        except Exception as e:
+            logger.error(f"Failed to get held codes: {e}")
+            return []
+        finally:
+            conn.close()
+
+    def get_provider_affinities(self, since: float = 0.0) -> Dict[str, Tuple[str, float]]:
+        """获取数据源亲和记录 {code: (provider, updated_at)}，仅返回 since 之后更新的"""
+        conn = self.get_connection()
+        cursor = conn.cursor()
+        try:
+            cursor.execute(
+                'SELECT code, provider, updated_at FROM provider_affinity WHERE updated_at >= ?',
+                (since,)
+            )
+            return {row['code']: (row['provider'], row['updated_at']) for row in cursor.fetchall()}
+        except Exception as e:
+            logger.error(f"Failed to get provider affinities: {e}")
+            return {}
+        finally:
+            conn.close()
+
+    def save_provider_affinity(self, code: str, provider: str, updated_at: float) -> bool:
+        """写入（覆盖）代码的数据源亲和记录"""
+        conn = self.get_connection()
+        cursor = conn.cursor()
+        try:
+            cursor.execute(
+                '''
+                INSERT INTO provider_affinity (code, provider, updated_at) VALUES (?, ?, ?)
+                ON CONFLICT(code) DO UPDATE SET provider = excluded.provider, updated_at = excluded.updated_at
+                ''',
+                (code, provider, updated_at)
+            )
+            conn.commit()
+            return True
+        except Exception as e:
+            logger.error(f"Failed to save provider affinity for {code}: {e}")
+            return False
+        finally:
+            conn.close()
+
+    def delete_provider_affinities_before(self, before: float) -> int:
+        """删除 before 之前更新的数据源亲和记录，返回删除条数"""
+        conn = self.get_connection()
+        cursor = conn.cursor()
+        try:
+            cursor.execute('DELETE FROM provider_affinity WHERE updated_at < ?', (before,))
+            conn.commit()
+            return cursor.rowcount
+        except Exception as e:
+            logger.error(f"Failed to delete provider affinities: {e}")
+            return 0
+        finally:
+            conn.close()
+
+    def get_latest_fund_nav(self, code: str) -> Optional[Dict[str, Any]]:
+        """获取基金最新一条确认净值"""
+        conn = self.get_connection()
+        cursor = conn.cursor()
+        try:
+            cursor.execute(
+                '''
+                SELECT code, nav_date, nav, prev_nav, change_pct, source, fetched_at
+                FROM fund_nav WHERE code = ? ORDER BY nav_date DESC LIMIT 1
+                ''',
+                (code,)
+            )
+            row = cursor.fetchone()
+            return dict(row) if row else None
+        except Exception as e:
+            logger.error(f"Failed to get fund nav for {code}: {e}")
+            return None
+        finally:
+            conn.close()
+
+    def save_fund_nav(self, record: Dict[str, Any]) -> bool:
+        """写入（覆盖）基金某一净值日期的确认净值"""
+        conn = self.get_connection()
+        cursor = conn.cursor()
+        try:
+            cursor.execute(
+                '''
+                INSERT OR REPLACE INTO fund_nav (code, nav_date, nav, prev_nav, change_pct, source, fetched_at)
+                VALUES (?, ?, ?, ?, ?, ?, ?)
+                ''',
+                (
+                    record['code'], record['nav_date'], record['nav'], record['prev_nav'],
+                    record['change_pct'], record['source'], record['fetched_at'],
+                )
+            )
+            conn.commit()
+            return True
+        except Exception as e:
+            logger.error(f"Failed to save fund nav for {record.get('code')}: {e}")
+            return False
+        finally:
+            conn.close()
+
+    def save_forex_rates(self, date: str, rates: Dict[str, float], updated_at: float) -> bool:
+        """写入（覆盖）某日各币种汇率"""
+        conn = self.get_connection()
+        cursor = conn.cursor()
+        try:
+            cursor.executemany(
+                'INSERT OR REPLACE INTO forex_rates (date, currency, rate, updated_at) VALUES (?, ?, ?, ?)',
+                [(date, currency, rate, updated_at) for currency, rate in rates.items()]
+            )
+            conn.commit()
+            return True
+        except Exception as e:
+            logger.error(f"Failed to save forex rates for {date}: {e}")
+            return False
+        finally:
+            conn.close()
+
+    def get_forex_rates_on(self, date: str) -> Dict[str, float]:
+        """各币种在 date 当日或之前最近一次记录的汇率"""
+        conn = self.get_connection()
+        cursor = conn.cursor()
+        try:
+            cursor.execute(
+                '''
+                SELECT f.currency, f.rate FROM forex_rates f
+                WHERE f.date = (
+                    SELECT MAX(date) FROM forex_rates WHERE currency = f.currency AND date <= ?
+                )
+                ''',
+                (date,)
+            )
+            return {row['currency']: row['rate'] for row in cursor.fetchall()}
+        except Exception as e:
+            logger.error(f"Failed to get forex rates on {date}: {e}")
+            return {}
+        finally:
+            conn.close()
+
+    def get_symbols(self) -> List[Dict[str, Any]]:
+        """全部代码表记录"""
+        conn = self.get_connection()
+        cursor = conn.cursor()
+        try:
+            cursor.execute(
+                'SELECT code, name, pinyin, market, currency, asset_type, source, updated_at FROM symbol_master'
+            )
+            return [dict(row) for row in cursor.fetchall()]
+        except Exception as e:
+            logger.error(f"Failed to get symbols: {e}")
+            return []
+        finally:
+            conn.close()
+
+    def save_symbols(self, records: List[Dict[str, Any]]) -> bool:
+        """写入（覆盖）代码表记录；新记录拼音为空时保留已有拼音"""
+        conn = self.get_connection()
+        cursor = conn.cursor()
+        try:
+            cursor.executemany(
+                '''
+                INSERT INTO symbol_master (code, name, pinyin, market, currency, asset_type, source, updated_at)
+                VALUES (?, ?, ?, ?, ?, ?, ?, ?)
+                ON CONFLICT(code) DO UPDATE SET
+                    name = excluded.name,
+                    pinyin = CASE WHEN excluded.pinyin != '' THEN excluded.pinyin ELSE symbol_master.pinyin END,
+                    market = excluded.market,
+                    currency = excluded.currency,
+                    asset_type = excluded.asset_type,
+                    source = excluded.source,
+                    updated_at = excluded.updated_at
+                ''',
+                [
+                    (r['code'], r['name'], r.get('pinyin') or '', r['market'], r['currency'],
+                     r['asset_type'], r['source'], r['updated_at'])
+                    for r in records
+                ]
+            )
+            conn.commit()
+            return True
+        except Exception as e:
+            logger.error(f"Failed to save symbols: {e}")
+            return False
+        finally:
+            conn.close()
+
+    def get_symbol_refresh_time(self, source: str) -> float:
+        """某来源代码表最近一次写入时间（无记录返回 0）"""
+        conn = self.get_connection()
+        cursor = conn.cursor()
+        try:
+            cursor.execute('SELECT MAX(updated_at) FROM symbol_master WHERE source = ?', (source,))
+            row = cursor.fetchone()
+            return float(row[0] or 0.0) if row else 0.0
+        except Exception as e:
+            logger.error(f"Failed to get symbol refresh time for {source}: {e}")
+            return 0.0
+        finally:
+            conn.close()
+
+    def _ensure_canonical_codes(self, cursor) -> None:
+        """
+        一次性迁移：持仓 / 交易记录中的旧写法代码改写为规范代码（700.HK / hk00700 -> 00700.HK，BRK.B -> gb_brk.b）
+
+        parse_code 只生成规范代码，不迁移的话旧写法的行无法再按代码匹配；已是规范代码的行不做修改，
+        之后每次启动只有一次查询。纯数字代码（可能是基金）保持原样；同一用户已持有规范代码时保留旧行，
+        由 add_asset 按同一标的合并。
+        """
+        try:
+            renames: Dict[str, str] = {}
+            for table in ('portfolio', 'transactions'):
+                cursor.execute(f'SELECT DISTINCT code FROM {table}')
+                for row in cursor.fetchall():
+                    code = row[0] or ''
+                    canonical = canonical_code(code)
+                    if canonical and canonical != code and not code.isdigit():
+                        renames[code] = canonical
+            if not renames:
+                return
+
+            cursor.execute('SELECT id, code, user_id FROM portfolio')
+            rows = cursor.fetchall()
+            held = {(row[2] or '', row[1]) for row in rows}
+            moved = 0
+            for row_id, code, user_id in rows:
+                target = renames.get(code)
+                if not target:
+                    continue
+                if (user_id or '', target) in held:
+                    logger.warning(f"Keeping holding {code} for user {user_id}: {target} already held")
+                    continue
+                try:
+                    cursor.execute('UPDATE portfolio SET code = ? WHERE id = ?', (target, row_id))
+                except sqlite3.IntegrityError:
+                    logger.warning(f"Keeping holding {code}: {target} already exists")
+                    continue
+                held.discard((user_id or '', code))
+                held.add((user_id or '', target))
+                moved += 1
+
+            cursor.executemany(
+                'UPDATE transactions SET code = ? WHERE code = ?',
+                [(target, code) for code, target in renames.items()]
+            )
+            logger.info(f"Migrated {len(renames)} stored code spellings to canonical codes ({moved} holdings)")
+        except Exception as e:
+            logger.warning(f"Failed to migrate stored codes to canonical codes: {e}")
+
     def _ensure_portfolio_asset_type(self, cursor) -> None:
-        """确保 portfolio 表有 asset_type 字段，并回填默认值"""
+        """确保 portfolio 表有 asset_type 字段，并按已有分类批量回填（不请求 Nasdaq）"""
         try:
             cursor.execute("PRAGMA table_info(portfolio)")
             cols = [row[1] for row in cursor.fetchall()]
@@ -220,19 +536,67 @@ class DatabaseManager:
             cursor.execute("SELECT code, name FROM portfolio WHERE asset_type IS NULL OR asset_type = ''")
             rows = cursor.fetchall()
             if rows:
-                from .asset_type import infer_asset_type
-                for row in rows:
-                    code = row[0]
-                    name = row[1]
-                    asset_type = infer_asset_type(code, name)
-                    cursor.execute(
-                        "UPDATE portfolio SET asset_type = ? WHERE code = ?",
-                        (asset_type, code)
-                    )
+                from .asset_type import bulk_infer_asset_types
+                cursor.execute("SELECT code, asset_type FROM asset_classification")
+                known = {row[0]: row[1] for row in cursor.fetchall()}
+                cursor.executemany(
+                    "UPDATE portfolio SET asset_type = ? WHERE code = ?",
+                    bulk_infer_asset_types(((row[0], row[1]) for row in rows), known)
+                )
                 logger.info(f"Backfilled asset_type for {len(rows)} records")
         except Exception as e:
             logger.warning(f"Failed to ensure asset_type column: {e}")
 
+    def get_asset_classifications(self) -> Dict[str, Tuple[str, str, float]]:
+        """全部美股分类记录 {code: (asset_type, source, checked_at)}"""
+        conn = self.get_connection()
+        cursor = conn.cursor()
+        try:
+            cursor.execute('SELECT code, asset_type, source, checked_at FROM asset_classification')
+            return {
+                row['code']: (row['asset_type'], row['source'], row['checked_at'])
+                for row in cursor.fetchall()
+            }
+        except Exception as e:
+            logger.error(f"Failed to get asset classifications: {e}")
+            return {}
+        finally:
+            conn.close()
+
+    def update_portfolio_asset_type(self, codes, asset_type: str, previous: str) -> int:
+        """将持仓中这些代码仍为 previous 的 asset_type 更新为 asset_type（回填后的后台确认），返回更新行数"""
+        conn = self.get_connection()
+        cursor = conn.cursor()
+        try:
+            cursor.executemany(
+                'UPDATE portfolio SET asset_type = ? WHERE code = ? AND asset_type = ?',
+                [(asset_type, code, previous) for code in codes]
+            )
+            conn.commit()
+            return cursor.rowcount
+        except Exception as e:
+            logger.error(f"Failed to update portfolio asset_type: {e}")
+            return 0
+        finally:
+            conn.close()
+
+    def save_asset_classification(self, code: str, asset_type: str, source: str, checked_at: float) -> bool:
+        """写入（覆盖）美股分类记录"""
+        conn = self.get_connection()
+        cursor = conn.cursor()
+        try:
+            cursor.execute(
+                'INSERT OR REPLACE INTO asset_classification (code, asset_type, source, checked_at) VALUES (?, ?, ?, ?)',
+                (code, asset_type, source, checked_at)
+            )
+            conn.commit()
+            return True
+        except Exception as e:
+            logger.error(f"Failed to save asset classification for {code}: {e}")
+            return False
+        finally:
+            conn.close()
+
     def _ensure_daily_snapshots_schema(self, cursor) -> None:
         """
         统一 daily_snapshots 表结构到：
@@ -372,12 +736,28 @@ class DatabaseManager:
             }
         return None
     
+    def _stored_code(self, cursor, code: str, user_id: str = None) -> str:
+        """
+        已持有同一标的（任意写法）时返回持仓中保存的代码，否则返回规范代码
+        （避免 hk00700 / 00700.HK 等写法产生重复持仓）
+        """
+        canonical = canonical_code(code)
+        if user_id:
+            cursor.execute('SELECT code FROM portfolio WHERE user_id = ?', (user_id,))
+        else:
+            cursor.execute('SELECT code FROM portfolio WHERE user_id IS NULL OR user_id = ""')
+        for row in cursor.fetchall():
+            if row['code'] == code or canonical_code(row['code']) == canonical:
+                return row['code']
+        return canonical or code
+
     def add_asset(self, data: Dict[str, Any], user_id: str = None) -> bool:
-        """添加或更新资产"""
+        """添加或更新资产（同一标的的不同写法合并到已有持仓）"""
         conn = self.get_connection()
         cursor = conn.cursor()
         
         try:
+            data = dict(data, code=self._stored_code(cursor, data['code'], user_id))
             # 对于有 user_id 的情况，使用 code + user_id 作为唯一键
             if user_id:
                 # 先检查是否存在
@@ -1049,12 +1429,12 @@ class DatabaseManager:
         finally:
             conn.close()
 
-    def save_daily_snapshot(self, data: Dict[str, float], user_id: str = None) -> bool:
-        """保存每日资产快照（按 date + user_id upsert）"""
+    def save_daily_snapshot(self, data: Dict[str, float], user_id: str = None, date: str = None) -> bool:
+        """保存每日资产快照（按 date + user_id upsert，date 默认当天）"""
         conn = self.get_connection()
         cursor = conn.cursor()
         
-        today = datetime.now().strftime('%Y-%m-%d')
+        today = date or datetime.now().strftime('%Y-%m-%d')
         uid = user_id or ''
         
         try:
@@ -1392,34 +1772,17 @@ class DatabaseManager:
         user_param = (user_id,) if user_id else ()
         
         try:
-            if market == 'all':
-                cursor.execute(f'''
-                    SELECT code, name, qty, price, curr, adjustment FROM portfolio
-                    WHERE {user_condition}
-                ''', user_param)
-            elif market == 'a':
-                cursor.execute(f'''
-                    SELECT code, name, qty, price, curr, adjustment FROM portfolio
-                    WHERE (code LIKE 'sh%' OR code LIKE 'sz%' OR code LIKE 'bj%') AND {user_condition}
-                ''', user_param)
-            elif market == 'us':
-                cursor.execute(f'''
-                    SELECT code, name, qty, price, curr, adjustment FROM portfolio
-                    WHERE code LIKE 'gb_%' AND {user_condition}
-                ''', user_param)
-            elif market == 'hk':
-                cursor.execute(f'''
-                    SELECT code, name, qty, price, curr, adjustment FROM portfolio
-                    WHERE code LIKE 'hk%' AND {user_condition}
-                ''', user_param)
-            elif market == 'fund':
-                cursor.execute(f'''
-                    SELECT code, name, qty, price, curr, adjustment FROM portfolio
-                    WHERE (code LIKE 'f_%' OR code LIKE 'ft_%') AND {user_condition}
-                ''', user_param)
+            # 市场按规范代码判断（港股规范写法为 00700.HK，不能用 SQL 前缀匹配）
+            cursor.execute(f'''
+                SELECT code, name, qty, price, curr, adjustment FROM portfolio
+                WHERE {user_condition}
+            ''', user_param)
             
             data = []
             for row in cursor.fetchall():
+                row_market = self._detect_market(row['code'])
+                if market != 'all' and row_market != market:
+                    continue
                 data.append({
                     'code': row['code'],
                     'name': row['name'],
@@ -1427,7 +1790,7 @@ class DatabaseManager:
                     'cost_price': float(row['price']),
                     'curr': row['curr'],
                     'adjustment': float(row['adjustment']),
-                    'market': self._detect_market(row['code'])
+                    'market': row_market
                 })
             
             return data
@@ -1439,17 +1802,8 @@ class DatabaseManager:
             conn.close()
     
     def _detect_market(self, code: str) -> str:
-        """根据代码检测市场类型"""
-        if code.startswith('sh') or code.startswith('sz') or code.startswith('bj'):
-            return 'a'
-        elif code.startswith('hk'):
-            return 'hk'
-        elif code.startswith('gb_'):
-            return 'us'
-        elif code.startswith('f_') or code.startswith('ft_'):
-            return 'fund'
-        else:
-            return 'other'
+        """根据代码检测市场类型（按规范代码，见 codes.market_of）"""
+        return market_of(code)
     
     def fix_snapshot_day_pnl(self, dates: list, user_id: str = None) -> bool:
         """
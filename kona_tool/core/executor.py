@@ -0,0 +1,142 @@
+"""
+共享抓取线程池
+进程内唯一的外部数据抓取线程池（行情、基金、搜索、快照共用），统一限制上游并发
+"""
+import atexit
+import logging
+import os
+import threading
+from concurrent.futures import Future, ThreadPoolExecutor
+from typing import Any, Callable, Dict, Optional
+
+import config
+
+logger = logging.getLogger(__name__)
+
+
+class FetchExecutor:
+    """
+    进程级共享线程池
+
+    - max_workers 即全进程对上游的并发上限（gunicorn 每个 worker 进程一个实例）
+    - 懒加载并记录创建时的 pid，fork 后（gunicorn --preload）在子进程中自动重建
+    - 线程池内的任务再次提交且线程池已满时，直接在当前线程执行，避免互相等待导致死锁
+    """
+
+    def __init__(self, max_workers: int = 16, name: str = "kona-fetch"):
+        self._max_workers = max(1, max_workers)
+        self._name = name
+        self._lock = threading.Lock()
+        self._local = threading.local()
+        self._executor: Optional[ThreadPoolExecutor] = None
+        self._pid: Optional[int] = None
+        self._queued = 0
+        self._active = 0
+        self._stats: Dict[str, int] = {
+            "submitted": 0,
+            "completed": 0,
+            "failed": 0,
+            "inline": 0,
+            "max_queue_depth": 0,
+        }
+
+    @property
+    def max_workers(self) -> int:
+        return self._max_workers
+
+    def _ensure_executor(self) -> ThreadPoolExecutor:
+        pid = os.getpid()
+        if self._executor is None or self._pid != pid:
+            self._executor = ThreadPoolExecutor(
+                max_workers=self._max_workers,
+                thread_name_prefix=self._name,
+            )
+            self._pid = pid
+            self._queued = 0
+            self._active = 0
+        return self._executor
+
+    def in_worker(self) -> bool:
+        return bool(getattr(self._local, "in_worker", False))
+
+    def _run(self, fn: Callable, args: tuple, kwargs: dict) -> Any:
+        with self._lock:
+            self._queued = max(0, self._queued - 1)
+            self._active += 1
+        self._local.in_worker = True
+        try:
+            result = fn(*args, **kwargs)
+            with self._lock:
+                self._stats["completed"] += 1
+            return result
+        except Exception:
+            with self._lock:
+                self._stats["failed"] += 1
+            raise
+        finally:
+            self._local.in_worker = False
+            with self._lock:
+                self._active = max(0, self._active - 1)
+
+    def _run_inline(self, fn: Callable, args: tuple, kwargs: dict) -> Future:
+        future: Future = Future()
+        try:
+            future.set_result(fn(*args, **kwargs))
+        except Exception as e:
+            future.set_exception(e)
+        return future
+
+    def submit(self, fn: Callable, *args, **kwargs) -> Future:
+        """提交抓取任务，返回 Future"""
+        with self._lock:
+            nested = self.in_worker()
+            if nested and self._queued + self._active >= self._max_workers:
+                self._stats["inline"] += 1
+                run_inline = True
+            else:
+                run_inline = False
+                executor = self._ensure_executor()
+                self._queued += 1
+                self._stats["submitted"] += 1
+                self._stats["max_queue_depth"] = max(self._stats["max_queue_depth"], self._queued)
+
+        if run_inline:
+            return self._run_inline(fn, args, kwargs)
+
+        try:
+            return executor.submit(self._run, fn, args, kwargs)
+        except RuntimeError:
+            # 线程池已关闭（进程退出中），退化为同步执行
+            with self._lock:
+                self._queued = max(0, self._queued - 1)
+                self._stats["inline"] += 1
+            return self._run_inline(fn, args, kwargs)
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            out: Dict[str, Any] = dict(self._stats)
+            out["max_workers"] = self._max_workers
+            out["queue_depth"] = self._queued
+            out["active"] = self._active
+            return out
+
+    def shutdown(self, wait: bool = False) -> None:
+        with self._lock:
+            executor = self._executor
+            owned = self._pid == os.getpid()
+            self._executor = None
+            self._pid = None
+        if executor is not None and owned:
+            executor.shutdown(wait=wait, cancel_futures=True)
+            logger.info("Fetch executor shut down")
+
+
+fetch_executor = FetchExecutor(max_workers=config.FETCH_MAX_WORKERS)
+
+# 对冲 / 竞速请求专用：调用方通常已在 fetch_executor 的线程中（批量回退、预热），
+# 共享线程池已满时嵌套提交会退化为当前线程顺序执行，对冲与竞速随之失效
+race_executor = FetchExecutor(max_workers=config.RACE_MAX_WORKERS, name="kona-race")
+
+# gunicorn worker 退出（sys.exit）时会执行 atexit，取消排队任务并释放线程
+atexit.register(fetch_executor.shutdown)
+atexit.register(race_executor.shutdown)
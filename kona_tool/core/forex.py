@@ -0,0 +1,153 @@
+"""
+汇率服务
+一次批量请求获取所有配置币种对人民币的汇率，带 TTL 缓存与每日历史（forex_rates 表）；
+请求失败时使用最近一次已知汇率
+"""
+import logging
+import re
+import threading
+import time
+from datetime import datetime
+from typing import Any, Dict, List
+
+import config
+from .singleflight import SingleFlight
+from .utils import monitored_http_get, safe_float
+
+logger = logging.getLogger(__name__)
+
+# hf_USDCNY="7.2500,..." -> ("USD", "7.2500")
+_SINA_FOREX_RE = re.compile(r'hf_([A-Z]+)CNY[^=]*="?([0-9.]+)')
+
+
+class ForexService:
+    """
+    汇率服务（1 外币 = rate 人民币）
+
+    - rates(): TTL 内直接返回缓存；过期后一次请求获取全部币种，并发调用合并为一次请求；
+      请求失败后 FAILURE_RETRY_SECONDS 内不再重试
+    - 未取到的币种依次回退到：内存中最近一次汇率 -> 数据库最近一天的汇率 -> DEFAULT_FOREX_RATES
+    - 每次成功获取写入当日历史，rates_on(date) 返回指定日期（或之前最近一天）的汇率
+    """
+
+    FAILURE_RETRY_SECONDS = 30
+
+    def __init__(self, currencies: List[str], ttl: float, database=None):
+        self.currencies = [c.upper() for c in currencies if c and c.upper() != "CNY"]
+        self.ttl = ttl
+        self._database = database
+        self._lock = threading.Lock()
+        self._flights = SingleFlight()
+        self._rates: Dict[str, float] = {}
+        self._fetched_at = 0.0
+        self._next_refresh = 0.0
+        self._loaded = False
+        self._stats: Dict[str, Any] = {"fetches": 0, "failures": 0, "cache_hits": 0, "last_fetch_at": 0.0}
+
+    def _db(self):
+        if self._database is not None:
+            return self._database
+        from .db import db
+        return db
+
+    def _today(self) -> str:
+        return datetime.now().strftime('%Y-%m-%d')
+
+    def _ensure_loaded(self) -> None:
+        """首次使用时从数据库加载最近一次已知汇率"""
+        if self._loaded:
+            return
+        known = self._db().get_forex_rates_on(self._today())
+        with self._lock:
+            if not self._loaded:
+                for currency, rate in known.items():
+                    self._rates.setdefault(currency, rate)
+                self._loaded = True
+
+    def _fetch(self) -> Dict[str, float]:
+        symbols = ",".join(f"hf_{currency}CNY" for currency in self.currencies)
+        url = config.API_ENDPOINTS["sina_forex"].format(symbols=symbols)
+        r = monitored_http_get("sina_forex", url, headers=config.HEADERS, timeout=config.API_TIMEOUT)
+        fetched: Dict[str, float] = {}
+        if r.status_code == 200:
+            for currency, price_str in _SINA_FOREX_RE.findall(r.text):
+                rate = safe_float(price_str)
+                if rate > 0:
+                    fetched[currency] = rate
+        return fetched
+
+    def _refresh(self) -> Dict[str, float]:
+        self._ensure_loaded()
+        try:
+            fetched = self._fetch()
+        except Exception as e:
+            logger.warning(f"Failed to get forex rates: {e}, using last known rates")
+            fetched = {}
+
+        now = time.time()
+        with self._lock:
+            self._stats["fetches"] += 1
+            if fetched:
+                self._rates.update(fetched)
+                self._fetched_at = now
+                self._next_refresh = now + self.ttl
+                self._stats["last_fetch_at"] = now
+            else:
+                self._next_refresh = now + min(self.ttl, self.FAILURE_RETRY_SECONDS)
+                self._stats["failures"] += 1
+        if fetched:
+            self._db().save_forex_rates(self._today(), fetched, now)
+        return self._current()
+
+    def _current(self) -> Dict[str, float]:
+        with self._lock:
+            rates = dict(config.DEFAULT_FOREX_RATES)
+            rates.update(self._rates)
+        rates["CNY"] = 1.0
+        return rates
+
+    def rates(self) -> Dict[str, float]:
+        """当前汇率 {'USD': 7.25, 'HKD': 0.93, 'CNY': 1.0, ...}"""
+        with self._lock:
+            fresh = time.time() < self._next_refresh
+            if fresh:
+                self._stats["cache_hits"] += 1
+        if fresh:
+            return self._current()
+        return self._flights.do("rates", self._refresh)
+
+    def rates_on(self, date: str) -> Dict[str, float]:
+        """
+        指定日期的汇率（YYYY-MM-DD，当日无记录时取之前最近一天）
+
+        历史中没有的币种使用当前汇率
+        """
+        rates = self.rates() if date >= self._today() else self._current()
+        rates.update(self._db().get_forex_rates_on(date))
+        rates["CNY"] = 1.0
+        return rates
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            out = dict(self._stats)
+            out["currencies"] = list(self.currencies)
+            out["age_seconds"] = round(time.time() - self._fetched_at, 1) if self._fetched_at else None
+            return out
+
+    def reset(self) -> None:
+        with self._lock:
+            self._rates.clear()
+            self._fetched_at = 0.0
+            self._next_refresh = 0.0
+            self._loaded = False
+
+
+forex_service = ForexService(
+    currencies=config.FOREX_CURRENCIES,
+    ttl=config.FOREX_TTL,
+)
+
+
+def get_forex_rates_on(date: str) -> Dict[str, float]:
+    """指定日期的汇率（用于快照 / 补录）"""
+    return forex_service.rates_on(date)
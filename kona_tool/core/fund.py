@@ -4,11 +4,19 @@
 """
 import re
 import logging
+import threading
+import time
 import requests
-from typing import Tuple, Optional
+from concurrent.futures import FIRST_COMPLETED, wait
+from typing import Any, Callable, Dict, List, Tuple, Optional
 
 import config
 from .utils import safe_float, retry_on_failure, monitored_http_get
+from .hedging import hedger
+from .executor import race_executor
+from .affinity import provider_affinity
+from .nav_store import fund_nav_store
+from .html_extract import extract_overseas_quote, iter_response_text
 
 logger = logging.getLogger(__name__)
 
@@ -39,6 +47,9 @@ def get_fund_tiantian_price(fund_code: str) -> Tuple[float, float, float, float]
             price = safe_float(data.get('dwjz', 0))
             gsz = safe_float(data.get('gsz', 0))
             gszzl = safe_float(data.get('gszzl', 0))
+            fund_nav_store.save_estimate(
+                clean_code, gsz, gszzl, data.get('gztime', ''), price, data.get('jzrq', '')
+            )
             
             current_price = gsz if gsz > 0 else price
             
@@ -83,6 +94,9 @@ def get_fund_eastmoney_f10(clean_code: str) -> Tuple[float, float, float, float]
                     amt = curr - yclose
                     chg_api = safe_float(lsjz[0].get('JZZZL', ''))
                     chg = chg_api if chg_api != 0 else (amt/yclose*100 if yclose>0 else 0)
+                    fund_nav_store.save_confirmed(
+                        clean_code, lsjz[0].get('FSRQ', ''), curr, yclose, chg, "eastmoney_fund_f10"
+                    )
                     
                     return curr, yclose, amt, chg
                     
@@ -126,6 +140,9 @@ def get_fund_eastmoney_mobile(clean_code: str) -> Tuple[float, float, float, flo
                 if curr > 0:
                     amt = curr - yclose
                     chg = (amt/yclose*100) if yclose > 0 else 0
+                    fund_nav_store.save_confirmed(
+                        clean_code, datas[0].get('FSRQ', ''), curr, yclose, chg, "eastmoney_fund_mobile"
+                    )
                     
                     return curr, yclose, amt, chg
                     
@@ -153,56 +170,18 @@ def get_fund_overseas_html(clean_code: str) -> Tuple[float, float, float, float]
             "Referer": "https://overseas.1234567.com.cn/"
         }
         
-        r = monitored_http_get("overseas_fund_html", url, headers=headers, timeout=config.API_TIMEOUT)
-        
-        url = f"https://overseas.1234567.com.cn/{clean_code}.html"
-        headers = {
-            "User-Agent": "Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/120.0.0.0 Safari/537.36",
-            "Referer": "https://overseas.1234567.com.cn/"
-        }
-        
-        r = monitored_http_get("overseas_fund_html", url, headers=headers, timeout=config.API_TIMEOUT)
-        if r.status_code == 200:
-            html = r.text
-            
-            # Try to find price in multiple patterns (updated for actual HTML structure)
-            patterns = [
-                r'fix_dwjz[^>]*>([\d.]+)',  # Matches <span class="fix_dwjz ...">10.5000
-                r'class="dwjz"[^>]*>([\d.]+)',  # Alternative class name
-                r'>([\d.]+)元',  # Pattern for price with Chinese yuan symbol
-                r'([\d.]+)\(([-\d.]+)，',  # Price followed by change
-                r'单位净值[^>]*>([\d.]+)',  # Unit net value
-            ]
-            
-            for pattern in patterns:
-                match = re.search(pattern, html)
-                if match:
-                    curr = safe_float(match.group(1))
-                    if curr > 0:
-                        # Try to find yesterday close and change
-                        chg_patterns = [
-                            r'\(([-\d.]+)，([-\d.]+)%\)',  # Change format
-                            r'fix_zzl[^>]*>([-\d.]+)%',  # Change percentage class
-                            r'涨跌幅[^>]*>([-\d.]+)%',  # Change percentage text
-                        ]
-                        
-                        yclose = curr
-                        amt = 0.0
-                        chg = 0.0
-                        
-                        for chg_pattern in chg_patterns:
-                            chg_match = re.search(chg_pattern, html)
-                            if chg_match:
-                                if len(chg_match.groups()) == 2:
-                                    amt = safe_float(chg_match.group(1))
-                                    chg = safe_float(chg_match.group(2))
-                                else:
-                                    chg = safe_float(chg_match.group(1))
-                                    amt = curr * chg / 100 if chg != 0 else 0
-                                yclose = curr - amt
-                                break
-                        
-                        return curr, yclose, amt, chg
+        r = monitored_http_get("overseas_fund_html", url, headers=headers, timeout=config.API_TIMEOUT, stream=True)
+        try:
+            if r.status_code == 200:
+                # 预编译正则增量扫描（见 html_extract），净值与涨跌找到后即停止读取
+                quote = extract_overseas_quote(iter_response_text(r))
+                if quote:
+                    curr, yclose, amt, chg = quote
+                    # 网页不带净值日期，按无日期记录保存（轮询频率见 FundNavStore）
+                    fund_nav_store.save_confirmed(clean_code, '', curr, yclose, chg, "overseas_fund_html")
+                    return quote
+        finally:
+            r.close()
             
     except Exception as e:
         logger.warning(f"Overseas HTML error for {clean_code}: {e}")
@@ -210,6 +189,113 @@ def get_fund_overseas_html(clean_code: str) -> Tuple[float, float, float, float]
     return 0.0, 0.0, 0.0, 0.0
 
 
+def _valid_quote(quote) -> bool:
+    return bool(quote) and quote[0] > 0
+
+
+def _fund_sources(code: str, clean_code: str) -> List[Tuple[str, Callable[[], Tuple[float, float, float, float]]]]:
+    """
+    基金适用的数据源（按优先级），名称与 monitored_http_get 的 source 一致
+
+    1. 天天基金估值（仅 f_ 场外基金）
+    2. 东方财富 F10
+    3. 东方财富手机端（适合互认基金）
+    4. 海外基金网页（仅 968xxx 海外基金）
+    """
+    sources = []
+    if code.startswith('f_'):
+        sources.append(("tiantian_fund", lambda: get_fund_tiantian_price(code)))
+    sources.append(("eastmoney_fund_f10", lambda: get_fund_eastmoney_f10(clean_code)))
+    sources.append(("eastmoney_fund_mobile", lambda: get_fund_eastmoney_mobile(clean_code)))
+    if clean_code.startswith('968'):
+        sources.append(("overseas_fund_html", lambda: get_fund_overseas_html(clean_code)))
+    return sources
+
+
+_race_lock = threading.Lock()
+_race_stats: Dict[str, Any] = {
+    "races": 0,
+    "failed": 0,
+    "deadline_hits": 0,
+    "wins": {},
+    "last": {},
+}
+
+
+def _record_race(code: str, winner: Optional[str], elapsed_ms: float, deadline_hit: bool) -> None:
+    with _race_lock:
+        _race_stats["races"] += 1
+        if winner is None:
+            _race_stats["failed"] += 1
+        else:
+            _race_stats["wins"][winner] = _race_stats["wins"].get(winner, 0) + 1
+        if deadline_hit:
+            _race_stats["deadline_hits"] += 1
+        _race_stats["last"] = {"code": code, "winner": winner, "elapsed_ms": round(elapsed_ms, 1)}
+
+
+def get_fund_race_stats() -> Dict[str, Any]:
+    with _race_lock:
+        out = dict(_race_stats)
+        out["wins"] = dict(_race_stats["wins"])
+        out["last"] = dict(_race_stats["last"])
+        return out
+
+
+def _race_fund_sources(code: str, sources: list, deadline: float) -> Optional[Tuple[float, float, float, float]]:
+    """
+    并发请求所有适用数据源，按优先级取结果
+
+    优先级最高的数据源返回有效结果即采用；它失败时依次看下一个。
+    到达 deadline 时采用已返回的有效结果中优先级最高的，仍在进行的请求结果忽略。
+    各数据源在专用的 race_executor 中请求（调用方通常已在共享线程池中，嵌套提交可能退化为顺序执行）。
+    """
+    start = time.monotonic()
+    futures = [race_executor.submit(fetch) for _, fetch in sources]
+    results: List[Optional[Tuple[float, float, float, float]]] = [None] * len(sources)
+    finished = [False] * len(sources)
+    pending = set(futures)
+    winner: Optional[int] = None
+    deadline_hit = False
+
+    while winner is None:
+        # 按优先级检查：前面的数据源都已失败时，第一个有效结果胜出
+        for i in range(len(sources)):
+            if not finished[i]:
+                break
+            if results[i] is not None:
+                winner = i
+                break
+        if winner is not None or not pending:
+            break
+
+        remaining = deadline - (time.monotonic() - start)
+        if remaining <= 0:
+            deadline_hit = True
+            winner = next((i for i, r in enumerate(results) if r is not None), None)
+            break
+        done, pending = wait(pending, timeout=remaining, return_when=FIRST_COMPLETED)
+        for future in done:
+            i = futures.index(future)
+            finished[i] = True
+            try:
+                quote = future.result()
+            except Exception as e:
+                logger.debug(f"Fund source {sources[i][0]} error for {code}: {e}")
+                continue
+            if _valid_quote(quote):
+                results[i] = quote
+
+    for future in pending:
+        future.cancel()
+
+    name = sources[winner][0] if winner is not None else None
+    _record_race(code, name, (time.monotonic() - start) * 1000, deadline_hit)
+    if name is not None:
+        provider_affinity.record(code, name)
+    return results[winner] if winner is not None else None
+
+
 def get_fund_price(code: str) -> Tuple[float, float, float, float]:
     """
     获取基金价格（多数据源自动切换）
@@ -226,27 +312,40 @@ def get_fund_price(code: str) -> Tuple[float, float, float, float]:
         return 0.0, 0.0, 0.0, 0.0
     
     logger.debug(f"Fetching fund price for {code}")
-    
-    # 1. 优先使用天天基金（适合场外基金）
-    if code.startswith('f_'):
-        price, yclose, amt, chg = get_fund_tiantian_price(code)
-        if price > 0:
-            return price, yclose, amt, chg
-    
-    # 2. 尝试东方财富F10接口
-    price, yclose, amt, chg = get_fund_eastmoney_f10(clean_code)
-    if price > 0:
-        return price, yclose, amt, chg
-    
-    # 3. 尝试东方财富手机端接口（适合互认基金）
-    price, yclose, amt, chg = get_fund_eastmoney_mobile(clean_code)
-    if price > 0:
-        return price, yclose, amt, chg
-    
-    # 4. 尝试海外基金网页（适合968xxx等海外基金）
-    if clean_code.startswith('968'):
-        price, yclose, amt, chg = get_fund_overseas_html(clean_code)
+
+    # 确认净值在下一个公布窗口前有效，无需请求上游
+    has_estimate = code.startswith('f_')
+    quote = fund_nav_store.fresh_quote(clean_code, has_estimate)
+    if quote:
+        return quote
+    fund_nav_store.mark_polled(clean_code)
+
+    sources = _fund_sources(code, clean_code)
+    if has_estimate and fund_nav_store.estimate_superseded(clean_code):
+        # 当日净值已公布，估值已过时：改从确认净值数据源获取
+        sources = [source for source in sources if source[0] != "tiantian_fund"]
+    sources = provider_affinity.prefer(code, sources, key=lambda source: source[0])
+
+    # 并发竞速模式：最坏耗时约为一次数据源超时
+    if config.ENABLE_FUND_SOURCE_RACE and len(sources) >= 2:
+        quote = _race_fund_sources(code, sources, config.FUND_RACE_DEADLINE_SECONDS)
+        if quote:
+            return quote
+        logger.warning(f"Failed to get price for fund {code}")
+        return 0.0, 0.0, 0.0, 0.0
+
+    # 开启对冲时前两个数据源以主/备对冲方式请求
+    if hedger.enabled and len(sources) >= 2:
+        winner, quote = hedger.run_with_source(sources[0], sources[1], valid=_valid_quote)
+        if quote:
+            provider_affinity.record(code, winner)
+            return quote
+        sources = sources[2:]
+
+    for name, fetch in sources:
+        price, yclose, amt, chg = fetch()
         if price > 0:
+            provider_affinity.record(code, name)
             return price, yclose, amt, chg
     
     logger.warning(f"Failed to get price for fund {code}")
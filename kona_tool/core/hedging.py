@@ -0,0 +1,146 @@
+"""
+对冲请求（hedged requests）
+主数据源在其 p90 延迟内未返回时，向备用数据源发出同一请求，取先返回的有效结果，降低长尾延迟
+"""
+import logging
+import threading
+from concurrent.futures import FIRST_COMPLETED, wait
+from typing import Any, Callable, Dict, Optional, Tuple
+
+import config
+from .executor import race_executor
+from .source_health import source_health
+
+logger = logging.getLogger(__name__)
+
+# (数据源名称, 获取函数)
+Provider = Tuple[str, Callable[[], Any]]
+
+
+class Hedger:
+    """
+    主/备数据源对冲
+
+    - 对冲延迟 = 主数据源最近成功请求耗时的 p90（样本不足时用 default_delay_ms），限制在 [min, max] 内
+    - 主数据源在对冲延迟内返回有效结果：直接使用，不发备用请求
+    - 主数据源在对冲延迟内失败：立即改用备用数据源（failover）
+    - 否则发出备用请求（hedged），先返回的有效结果胜出；落败的请求尚未开始则取消，已开始则忽略其结果
+    - 主/备请求在专用的 race_executor 中执行，调用方在共享线程池内时同样能并发对冲
+    """
+
+    def __init__(self, executor=None, health=None, enabled: bool = False,
+                 default_delay_ms: float = 800, min_delay_ms: float = 100,
+                 max_delay_ms: float = 2000, min_samples: int = 10):
+        self._executor = executor or race_executor
+        self._health = health or source_health
+        self.enabled = enabled
+        self.default_delay_ms = default_delay_ms
+        self.min_delay_ms = min_delay_ms
+        self.max_delay_ms = max(min_delay_ms, max_delay_ms)
+        self.min_samples = min_samples
+        self._lock = threading.Lock()
+        self._pairs: Dict[str, Dict[str, int]] = {}
+
+    def hedge_delay_ms(self, source: str) -> float:
+        p90 = self._health.latency_percentile(source, 0.9, self.min_samples)
+        delay = self.default_delay_ms if p90 is None else p90
+        return min(self.max_delay_ms, max(self.min_delay_ms, delay))
+
+    def _record(self, pair: str, outcome: str, hedged: bool) -> None:
+        with self._lock:
+            stats = self._pairs.setdefault(pair, {
+                "requests": 0,
+                "hedged": 0,
+                "primary_wins": 0,
+                "secondary_wins": 0,
+                "failover": 0,
+                "both_failed": 0,
+            })
+            stats["requests"] += 1
+            if hedged:
+                stats["hedged"] += 1
+            stats[outcome] += 1
+
+    @staticmethod
+    def _result(future, valid: Callable[[Any], bool]) -> Optional[Any]:
+        try:
+            result = future.result()
+        except Exception as e:
+            logger.debug(f"Hedged request error: {e}")
+            return None
+        return result if valid(result) else None
+
+    def run(self, primary: Provider, secondary: Provider, valid: Callable[[Any], bool] = bool) -> Optional[Any]:
+        """
+        执行主/备对冲请求
+
+        Returns:
+            胜出的有效结果，两个数据源均失败返回 None
+        """
+        return self.run_with_source(primary, secondary, valid)[1]
+
+    def run_with_source(self, primary: Provider, secondary: Provider,
+                        valid: Callable[[Any], bool] = bool) -> Tuple[Optional[str], Optional[Any]]:
+        """
+        执行主/备对冲请求
+
+        Returns:
+            (胜出的数据源名称, 有效结果)，两个数据源均失败返回 (None, None)
+        """
+        primary_name, primary_fn = primary
+        secondary_name, secondary_fn = secondary
+        pair = f"{primary_name}>{secondary_name}"
+
+        primary_future = self._executor.submit(primary_fn)
+        done, _ = wait([primary_future], timeout=self.hedge_delay_ms(primary_name) / 1000)
+        if done:
+            result = self._result(primary_future, valid)
+            if result is not None:
+                self._record(pair, "primary_wins", hedged=False)
+                return primary_name, result
+            result = self._result(self._executor.submit(secondary_fn), valid)
+            if result is None:
+                self._record(pair, "both_failed", hedged=False)
+                return None, None
+            self._record(pair, "failover", hedged=False)
+            return secondary_name, result
+
+        secondary_future = self._executor.submit(secondary_fn)
+        pending = {primary_future, secondary_future}
+        while pending:
+            done, pending = wait(pending, return_when=FIRST_COMPLETED)
+            for future in done:
+                result = self._result(future, valid)
+                if result is None:
+                    continue
+                for loser in pending:
+                    loser.cancel()
+                if future is primary_future:
+                    self._record(pair, "primary_wins", hedged=True)
+                    return primary_name, result
+                self._record(pair, "secondary_wins", hedged=True)
+                return secondary_name, result
+
+        self._record(pair, "both_failed", hedged=True)
+        return None, None
+
+    def stats(self) -> Dict[str, Dict[str, Any]]:
+        with self._lock:
+            out: Dict[str, Dict[str, Any]] = {}
+            for pair, stats in self._pairs.items():
+                out[pair] = dict(stats)
+                out[pair]["hedge_rate"] = round(stats["hedged"] / stats["requests"], 4) if stats["requests"] else 0.0
+            return out
+
+    def reset(self) -> None:
+        with self._lock:
+            self._pairs.clear()
+
+
+hedger = Hedger(
+    enabled=config.ENABLE_QUOTE_HEDGING,
+    default_delay_ms=config.HEDGE_DELAY_DEFAULT_MS,
+    min_delay_ms=config.HEDGE_DELAY_MIN_MS,
+    max_delay_ms=config.HEDGE_DELAY_MAX_MS,
+    min_samples=config.HEDGE_MIN_SAMPLES,
+)
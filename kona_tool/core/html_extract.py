@@ -0,0 +1,197 @@
+"""
+网页行情字段提取
+预编译正则 + 增量扫描：按块读取响应，只扫描新到达的内容，所需字段都找到后即停止读取，
+不构建 DOM 树（FT 基金页、天天基金海外基金页）
+"""
+import re
+from typing import Dict, Iterable, List, Match, Optional, Pattern, Sequence, Tuple
+
+from .utils import safe_float
+
+# 每次读取的块大小（字符）
+CHUNK_SIZE = 16 * 1024
+# 新块到达后从上一块末尾往回重扫的长度，保证跨块的匹配不会漏掉
+_OVERLAP = 2048
+# 距缓冲区末尾不足该长度的匹配可能被截断（如 "10.5" + "000"），等下一块到达后再确认
+_TAIL_GUARD = 64
+
+_TAG_RE = re.compile(r'<[^>]+>')
+
+
+def _span_pattern(css_class: str) -> Pattern:
+    """<span class="... css_class ...">文本</span>（与 BeautifulSoup 的 class_ 匹配一致：任一 class 命中）"""
+    return re.compile(
+        r'<span\b[^>]*\bclass="(?:[^"]*\s)?' + re.escape(css_class) + r'(?:\s[^"]*)?"[^>]*>(.*?)</span>',
+        re.S,
+    )
+
+
+class FieldScanner:
+    """
+    增量字段扫描
+
+    fields: {字段名: [按优先级排列的正则]}，每个正则取第一处匹配，已匹配更高优先级正则后
+    不再扫描更低优先级的正则；各字段最高优先级的正则都已匹配时 done 为 True，调用方可停止读取。
+    any_match 中的字段任一正则匹配即视为已找到（同一页面只会出现其中一种格式时使用）。
+    valid 可过滤无效匹配（如价格为 0），无效匹配不计入，继续向后查找。
+    """
+
+    def __init__(self, fields: Dict[str, Sequence[Pattern]], valid=None, any_match: Sequence[str] = ()):
+        self._fields = {name: list(patterns) for name, patterns in fields.items()}
+        self._valid = valid or (lambda name, match: True)
+        self._any_match = set(any_match)
+        self._buffer = ''
+        self._scanned = 0
+        self._matches: Dict[str, List[Optional[Match]]] = {name: [None] * len(p) for name, p in self._fields.items()}
+        self.chunks = 0
+        self.finished = False
+
+    def feed(self, chunk: str, final: bool = False) -> bool:
+        """追加一块内容并扫描，返回是否已找到全部最高优先级字段"""
+        if chunk:
+            self._buffer += chunk
+            self.chunks += 1
+        start = max(0, self._scanned - _OVERLAP)
+        limit = len(self._buffer) if final else len(self._buffer) - _TAIL_GUARD
+        for name, patterns in self._fields.items():
+            found = self._matches[name]
+            for i, pattern in enumerate(patterns):
+                if any(m is not None for m in found[:i + 1]):
+                    break
+                pos = start
+                while found[i] is None:
+                    match = pattern.search(self._buffer, pos)
+                    if match is None or match.end() > limit:
+                        break
+                    if self._valid(name, match):
+                        found[i] = match
+                    else:
+                        pos = match.end()
+        self._scanned = max(self._scanned, limit)
+        self.finished = self.finished or final
+        return self.done
+
+    @property
+    def done(self) -> bool:
+        return all(
+            any(m is not None for m in found) if name in self._any_match else found[0] is not None
+            for name, found in self._matches.items()
+        )
+
+    def match(self, name: str) -> Optional[Match]:
+        """字段最高优先级的有效匹配"""
+        for found in self._matches[name]:
+            if found is not None:
+                return found
+        return None
+
+
+def scan(chunks: Iterable[str], scanner: FieldScanner) -> FieldScanner:
+    """依次读取内容块直到字段齐全或内容结束"""
+    for chunk in chunks:
+        if chunk and scanner.feed(chunk):
+            return scanner
+    scanner.feed('', final=True)
+    return scanner
+
+
+def iter_response_text(resp, chunk_size: int = CHUNK_SIZE) -> Iterable[str]:
+    """
+    按块读取 requests 响应文本（需以 stream=True 请求）
+
+    响应头未声明 charset 时按 utf-8 解码（requests 对 text/* 默认的 ISO-8859-1 会使中文字段无法匹配）
+    """
+    content_type = (resp.headers.get('Content-Type') or '').lower()
+    if not resp.encoding or 'charset' not in content_type:
+        resp.encoding = 'utf-8'
+    for chunk in resp.iter_content(chunk_size=chunk_size, decode_unicode=True):
+        if isinstance(chunk, bytes):
+            chunk = chunk.decode(resp.encoding, errors='replace')
+        yield chunk
+
+
+def _span_text(match: Match) -> str:
+    return _TAG_RE.sub('', match.group(1))
+
+
+# FT tearsheet：价格 span（不存在时使用第一个数据列表值）与涨跌幅 span
+_FT_PRICE = [
+    _span_pattern('mod-tearsheet-overview__quote__value'),
+    _span_pattern('mod-ui-data-list__value'),
+]
+_FT_CHANGE = [_span_pattern('mod-tearsheet-overview__quote__chg')]
+
+
+def ft_scanner() -> FieldScanner:
+    return FieldScanner({"price": _FT_PRICE, "change": _FT_CHANGE})
+
+
+def parse_ft_quote(scanner: FieldScanner) -> Optional[Tuple[float, float, float, float]]:
+    """FT 页面扫描结果 -> (当前价格, 昨收, 涨跌额, 涨跌幅%)"""
+    price = scanner.match("price")
+    if price is None:
+        return None
+    curr = safe_float(_span_text(price))
+    if curr <= 0:
+        return None
+    change = scanner.match("change")
+    chg = safe_float(_span_text(change)) if change else 0.0
+    yclose = curr / (1 + chg / 100) if (1 + chg / 100) != 0 else curr
+    return curr, yclose, curr - yclose, chg
+
+
+def extract_ft_quote(chunks: Iterable[str]) -> Optional[Tuple[float, float, float, float]]:
+    return parse_ft_quote(scan(chunks, ft_scanner()))
+
+
+# 天天基金海外基金页：单位净值（按优先级）与涨跌
+_OVERSEAS_PRICE = [
+    re.compile(r'fix_dwjz[^>]*>([\d.]+)'),  # <span class="fix_dwjz ...">10.5000
+    re.compile(r'class="dwjz"[^>]*>([\d.]+)'),
+    re.compile(r'>([\d.]+)元'),
+    re.compile(r'([\d.]+)\(([-\d.]+)，'),  # 净值后跟涨跌
+    re.compile(r'单位净值[^>]*>([\d.]+)'),
+]
+_OVERSEAS_CHANGE = [
+    re.compile(r'\(([-\d.]+)，([-\d.]+)%\)'),  # (涨跌额，涨跌幅%)
+    re.compile(r'fix_zzl[^>]*>([-\d.]+)%'),
+    re.compile(r'涨跌幅[^>]*>([-\d.]+)%'),
+]
+
+
+def _overseas_valid(name: str, match: Match) -> bool:
+    # 净值为 0 / 非数字的匹配跳过（旧逻辑遇到时改用下一个正则）
+    return name != "price" or safe_float(match.group(1)) > 0
+
+
+def overseas_scanner() -> FieldScanner:
+    # 涨跌只会以其中一种格式出现，找到即可；净值仍按优先级
+    return FieldScanner(
+        {"price": _OVERSEAS_PRICE, "change": _OVERSEAS_CHANGE},
+        valid=_overseas_valid,
+        any_match=("change",),
+    )
+
+
+def parse_overseas_quote(scanner: FieldScanner) -> Optional[Tuple[float, float, float, float]]:
+    """海外基金页扫描结果 -> (当前价格, 昨收, 涨跌额, 涨跌幅%)"""
+    price = scanner.match("price")
+    if price is None:
+        return None
+    curr = safe_float(price.group(1))
+
+    yclose, amt, chg = curr, 0.0, 0.0
+    change = scanner.match("change")
+    if change is not None:
+        if len(change.groups()) == 2:
+            amt = safe_float(change.group(1))
+            chg = safe_float(change.group(2))
+        else:
+            chg = safe_float(change.group(1))
+            amt = curr * chg / 100 if chg != 0 else 0
+        yclose = curr - amt
+    return curr, yclose, amt, chg
+
+
+def extract_overseas_quote(chunks: Iterable[str]) -> Optional[Tuple[float, float, float, float]]:
+    return parse_overseas_quote(scan(chunks, overseas_scanner()))
@@ -0,0 +1,203 @@
+"""
+市场识别与交易时段
+根据代码前缀判断所属市场（A股 / 港股 / 美股 / 基金），并判断该市场当前是否开市
+"""
+import re
+import time
+from datetime import datetime, time as dtime, timedelta, timezone, tzinfo
+from typing import Dict, List, Optional, Tuple
+
+import config
+
+try:
+    from zoneinfo import ZoneInfo
+except ImportError:  # pragma: no cover
+    ZoneInfo = None
+
+
+def _zone(name: str, fallback_hours: int) -> tzinfo:
+    if ZoneInfo is not None:
+        try:
+            return ZoneInfo(name)
+        except Exception:
+            pass
+    return timezone(timedelta(hours=fallback_hours))
+
+
+MARKET_A = 'a'
+MARKET_HK = 'hk'
+MARKET_US = 'us'
+MARKET_FUND = 'fund'
+
+# 各市场时区与连续交易时段（当地时间，周一至周五；暂不处理节假日）
+MARKET_SESSIONS: Dict[str, Tuple[tzinfo, List[Tuple[dtime, dtime]]]] = {
+    MARKET_A: (_zone("Asia/Shanghai", 8), [(dtime(9, 30), dtime(11, 30)), (dtime(13, 0), dtime(15, 0))]),
+    MARKET_HK: (_zone("Asia/Hong_Kong", 8), [(dtime(9, 30), dtime(12, 0)), (dtime(13, 0), dtime(16, 10))]),
+    MARKET_US: (_zone("America/New_York", -5), [(dtime(9, 30), dtime(16, 0))]),
+    # 场外基金估值跟随 A 股交易时段变动
+    MARKET_FUND: (_zone("Asia/Shanghai", 8), [(dtime(9, 30), dtime(11, 30)), (dtime(13, 0), dtime(15, 0))]),
+}
+
+
+def market_of(code: str) -> str:
+    """
+    根据代码前缀（config.CODE_PREFIX_MAPPING）判断市场
+
+    Returns:
+        a / hk / us / fund
+    """
+    c = (code or '').strip()
+    lower = c.lower()
+    prefixes = config.CODE_PREFIX_MAPPING
+
+    if lower.startswith((prefixes["fund"], prefixes["fund_ft"])):
+        return MARKET_FUND
+    if lower.startswith((prefixes["stock_hk"], 'rt_hk')) or c.upper().endswith('.HK') or 'HSTECH' in c.upper():
+        return MARKET_HK
+    if lower.startswith((prefixes["stock_us"], 'us.')) or 'ixic' in lower:
+        return MARKET_US
+    if lower.startswith((prefixes["stock_sh"], prefixes["stock_sz"], prefixes["stock_bj"], 's_')):
+        return MARKET_A
+    if re.fullmatch(r'[A-Za-z.]+', c):
+        return MARKET_US
+    return MARKET_A
+
+
+def is_market_open(market: str, now: Optional[float] = None) -> bool:
+    """判断市场在给定时间（时间戳，默认当前）是否处于交易时段"""
+    tz, sessions = MARKET_SESSIONS.get(market, MARKET_SESSIONS[MARKET_A])
+    local = datetime.fromtimestamp(time.time() if now is None else now, tz)
+    if local.weekday() >= 5:
+        return False
+    t = local.time()
+    return any(start <= t < end for start, end in sessions)
+
+
+def is_code_trading(code: str, now: Optional[float] = None) -> bool:
+    """代码所属市场当前是否开市"""
+    return is_market_open(market_of(code), now)
+
+
+def _parse_hhmm(value: str) -> dtime:
+    hour, minute = value.split(':', 1)
+    return dtime(int(hour), int(minute))
+
+
+def next_session_open(market: str, now: Optional[float] = None) -> float:
+    """下一次开盘（含午间休市后的开盘）时间戳"""
+    tz, sessions = MARKET_SESSIONS.get(market, MARKET_SESSIONS[MARKET_A])
+    local = datetime.fromtimestamp(time.time() if now is None else now, tz)
+    for day_offset in range(8):
+        day = (local + timedelta(days=day_offset)).date()
+        if day.weekday() >= 5:
+            continue
+        for start, _ in sessions:
+            open_at = datetime.combine(day, start, tzinfo=tz)
+            if open_at > local:
+                return open_at.timestamp()
+    return local.timestamp() + 86400
+
+
+def last_trading_date(market: str, at: dtime, now: Optional[float] = None) -> str:
+    """
+    最近一个已到达当地时间 at 的交易日（YYYY-MM-DD）
+
+    如 at=09:30 为最近一个已开盘的交易日；at=FUND_NAV_PUBLISH_START 为最近一个应已公布净值的交易日
+    """
+    tz, _ = MARKET_SESSIONS.get(market, MARKET_SESSIONS[MARKET_A])
+    local = datetime.fromtimestamp(time.time() if now is None else now, tz)
+    for day_offset in range(8):
+        day = (local - timedelta(days=day_offset)).date()
+        if day.weekday() >= 5:
+            continue
+        if day_offset > 0 or local.time() >= at:
+            return day.isoformat()
+    return local.date().isoformat()
+
+
+def last_session_date(market: str, now: Optional[float] = None) -> str:
+    """最近一个已开盘的交易日（YYYY-MM-DD）"""
+    _, sessions = MARKET_SESSIONS.get(market, MARKET_SESSIONS[MARKET_A])
+    return last_trading_date(market, sessions[0][0], now)
+
+
+def expected_fund_nav_date(now: Optional[float] = None) -> str:
+    """最近一个应已开始公布净值的交易日（YYYY-MM-DD）"""
+    return last_trading_date(MARKET_FUND, _parse_hhmm(config.FUND_NAV_PUBLISH_START), now)
+
+
+def in_fund_nav_window(now: Optional[float] = None) -> bool:
+    """是否处于交易日净值公布窗口（FUND_NAV_PUBLISH_START ~ FUND_NAV_PUBLISH_END）"""
+    tz, _ = MARKET_SESSIONS[MARKET_FUND]
+    local = datetime.fromtimestamp(time.time() if now is None else now, tz)
+    if local.weekday() >= 5:
+        return False
+    return _parse_hhmm(config.FUND_NAV_PUBLISH_START) <= local.time() < _parse_hhmm(config.FUND_NAV_PUBLISH_END)
+
+
+def _seconds_since_session_end(market: str, ts: float) -> Optional[float]:
+    """距离当日最近一次收盘（含午间收盘）的秒数，当日尚未收盘过返回 None"""
+    tz, sessions = MARKET_SESSIONS.get(market, MARKET_SESSIONS[MARKET_A])
+    local = datetime.fromtimestamp(ts, tz)
+    if local.weekday() >= 5:
+        return None
+    best = None
+    for _, end in sessions:
+        end_at = datetime.combine(local.date(), end, tzinfo=tz)
+        if end_at <= local:
+            delta = (local - end_at).total_seconds()
+            best = delta if best is None else min(best, delta)
+    return best
+
+
+def _fund_publication_expiry(fetched_at: float, base_ttl: float) -> float:
+    """
+    场外基金缓存到期时间
+
+    - A 股交易时段：估值实时变动，使用 base_ttl
+    - 净值公布窗口内（交易日 FUND_NAV_PUBLISH_START ~ FUND_NAV_PUBLISH_END）：按 FUND_NAV_POLL_TTL 轮询
+    - 其他时间：缓存到下一个公布窗口或下一次开盘（取较早者）
+    """
+    if is_market_open(MARKET_FUND, fetched_at):
+        return fetched_at + base_ttl
+
+    tz, _ = MARKET_SESSIONS[MARKET_FUND]
+    local = datetime.fromtimestamp(fetched_at, tz)
+    window_start = _parse_hhmm(config.FUND_NAV_PUBLISH_START)
+    window_end = _parse_hhmm(config.FUND_NAV_PUBLISH_END)
+    if local.weekday() < 5 and window_start <= local.time() < window_end:
+        return fetched_at + max(base_ttl, config.FUND_NAV_POLL_TTL)
+
+    candidates = [next_session_open(MARKET_FUND, fetched_at)]
+    for day_offset in range(8):
+        day = (local + timedelta(days=day_offset)).date()
+        if day.weekday() >= 5:
+            continue
+        window_at = datetime.combine(day, window_start, tzinfo=tz)
+        if window_at > local:
+            candidates.append(window_at.timestamp())
+            break
+    return min(candidates)
+
+
+def cache_expiry(code: str, fetched_at: float, base_ttl: float) -> float:
+    """
+    根据代码所属市场与开闭市状态计算缓存到期时间戳
+
+    - 开市中：fetched_at + base_ttl
+    - 收盘后 CACHE_CLOSE_GRACE_SECONDS 内：仍按 base_ttl 刷新，等待收盘价落定
+    - 休市：缓存到下一次开盘
+    - 场外基金：见 _fund_publication_expiry
+    """
+    market = market_of(code)
+    if market == MARKET_FUND:
+        return _fund_publication_expiry(fetched_at, base_ttl)
+
+    if is_market_open(market, fetched_at):
+        return fetched_at + base_ttl
+
+    since_close = _seconds_since_session_end(market, fetched_at)
+    if since_close is not None and since_close < config.CACHE_CLOSE_GRACE_SECONDS:
+        return fetched_at + base_ttl
+
+    return max(fetched_at + base_ttl, next_session_open(market, fetched_at))
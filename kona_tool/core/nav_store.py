@@ -0,0 +1,187 @@
+"""
+场外基金净值存储
+确认净值（dwjz，按基金代码 + 净值日期落库）与天天基金盘中估值（gsz，仅内存）分开保存，
+确认净值在下一个公布窗口前不再重复请求
+"""
+import logging
+import threading
+import time
+from typing import Any, Dict, Optional, Tuple
+
+import config
+from .market import MARKET_FUND, expected_fund_nav_date, in_fund_nav_window, is_market_open, last_session_date
+
+logger = logging.getLogger(__name__)
+
+
+def nav_quote(record: Dict[str, Any]) -> Tuple[float, float, float, float]:
+    """确认净值记录 -> (净值, 上一净值, 涨跌额, 涨跌幅%)"""
+    nav = record["nav"]
+    prev_nav = record["prev_nav"]
+    return nav, prev_nav, nav - prev_nav, record["change_pct"]
+
+
+class FundNavStore:
+    """
+    基金净值存储（key 为不含前缀的基金代码）
+
+    确认净值是否需要重新请求（needs_poll）：
+    - 已有记录且净值日期 >= 最近一个应已公布净值的交易日：不请求
+    - 否则在公布窗口内每 FUND_NAV_POLL_TTL 秒请求一次，窗口外每 FUND_NAV_STALE_POLL_TTL 秒一次
+      （QDII 等基金净值晚一到两天公布，或网页数据源不带净值日期）
+    """
+
+    def __init__(self, poll_ttl: float, stale_poll_ttl: float, database=None):
+        self.poll_ttl = poll_ttl
+        self.stale_poll_ttl = max(poll_ttl, stale_poll_ttl)
+        self._database = database
+        self._lock = threading.Lock()
+        self._confirmed: Dict[str, Optional[Dict[str, Any]]] = {}
+        self._estimates: Dict[str, Dict[str, Any]] = {}
+        self._last_poll: Dict[str, float] = {}
+        self._stats: Dict[str, int] = {"confirmed_hits": 0, "polls": 0, "saves": 0}
+
+    def _db(self):
+        if self._database is not None:
+            return self._database
+        from .db import db
+        return db
+
+    def confirmed(self, code: str) -> Optional[Dict[str, Any]]:
+        """最新确认净值记录（内存未命中时读库）"""
+        with self._lock:
+            if code in self._confirmed:
+                return self._confirmed[code]
+        record = self._db().get_latest_fund_nav(code)
+        with self._lock:
+            self._confirmed.setdefault(code, record)
+            return self._confirmed[code]
+
+    def estimate(self, code: str) -> Optional[Dict[str, Any]]:
+        """最近一次天天基金盘中估值（gsz / gszzl / gztime，以及同一响应中的 dwjz / jzrq）"""
+        with self._lock:
+            return self._estimates.get(code)
+
+    def is_current(self, record: Optional[Dict[str, Any]], now: Optional[float] = None) -> bool:
+        """确认净值是否已是最近一个应公布净值交易日的净值"""
+        if not record or not record.get("nav_date"):
+            return False
+        return record["nav_date"] >= expected_fund_nav_date(now)
+
+    def needs_poll(self, code: str, now: Optional[float] = None) -> bool:
+        now = time.time() if now is None else now
+        record = self.confirmed(code)
+        if record is None:
+            return True
+        if self.is_current(record, now):
+            return False
+        with self._lock:
+            last = max(self._last_poll.get(code, 0.0), float(record.get("fetched_at") or 0.0))
+        ttl = self.poll_ttl if in_fund_nav_window(now) else self.stale_poll_ttl
+        return now - last >= ttl
+
+    def fresh_quote(self, code: str, has_estimate: bool, now: Optional[float] = None) -> Optional[Tuple[float, float, float, float]]:
+        """
+        无需请求上游即可返回的确认净值行情，需要请求时返回 None
+
+        Args:
+            code: 基金代码（不含前缀）
+            has_estimate: 是否有盘中估值数据源（f_ 场外基金）。有估值时，交易时段内及
+                当日确认净值公布前使用估值，此处返回 None
+        """
+        now = time.time() if now is None else now
+        if has_estimate:
+            if is_market_open(MARKET_FUND, now):
+                return None
+            record = self.confirmed(code)
+            if not record or not record.get("nav_date") or record["nav_date"] < last_session_date(MARKET_FUND, now):
+                return None
+        elif self.needs_poll(code, now):
+            return None
+        else:
+            record = self.confirmed(code)
+
+        with self._lock:
+            self._stats["confirmed_hits"] += 1
+        return nav_quote(record)
+
+    def estimate_superseded(self, code: str, now: Optional[float] = None) -> bool:
+        """
+        休市后天天基金显示当日净值已公布（jzrq >= 最近交易日），而确认净值尚未入库：
+        此时估值已过时，应改从确认净值数据源获取
+        """
+        now = time.time() if now is None else now
+        if is_market_open(MARKET_FUND, now):
+            return False
+        estimate = self.estimate(code)
+        if not estimate or not estimate.get("jzrq") or estimate["jzrq"] < last_session_date(MARKET_FUND, now):
+            return False
+        record = self.confirmed(code)
+        return not record or (record.get("nav_date") or "") < estimate["jzrq"]
+
+    def mark_polled(self, code: str) -> None:
+        with self._lock:
+            self._last_poll[code] = time.time()
+            self._stats["polls"] += 1
+
+    def save_confirmed(self, code: str, nav_date: str, nav: float, prev_nav: float, change_pct: float, source: str) -> None:
+        """保存确认净值（净值日期不早于已有记录时覆盖内存中的最新记录）"""
+        record = {
+            "code": code,
+            "nav_date": nav_date or "",
+            "nav": nav,
+            "prev_nav": prev_nav,
+            "change_pct": change_pct,
+            "source": source,
+            "fetched_at": time.time(),
+        }
+        current = self.confirmed(code)
+        with self._lock:
+            if current is None or record["nav_date"] >= (current.get("nav_date") or ""):
+                self._confirmed[code] = record
+            self._stats["saves"] += 1
+        self._db().save_fund_nav(record)
+
+    def save_estimate(self, code: str, gsz: float, gszzl: float, gztime: str, dwjz: float, jzrq: str) -> None:
+        """保存天天基金估值（仅内存；dwjz 无上一净值，不写入确认净值）"""
+        with self._lock:
+            self._estimates[code] = {
+                "code": code,
+                "gsz": gsz,
+                "gszzl": gszzl,
+                "gztime": gztime,
+                "dwjz": dwjz,
+                "jzrq": jzrq,
+                "fetched_at": time.time(),
+            }
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            out: Dict[str, Any] = dict(self._stats)
+            out["confirmed"] = sum(1 for r in self._confirmed.values() if r)
+            out["estimates"] = len(self._estimates)
+            return out
+
+    def reset(self) -> None:
+        with self._lock:
+            self._confirmed.clear()
+            self._estimates.clear()
+            self._last_poll.clear()
+            for key in self._stats:
+                self._stats[key] = 0
+
+
+fund_nav_store = FundNavStore(
+    poll_ttl=config.FUND_NAV_POLL_TTL,
+    stale_poll_ttl=config.FUND_NAV_STALE_POLL_TTL,
+)
+
+
+def get_fund_nav(code: str) -> Optional[Dict[str, Any]]:
+    """基金最新确认净值（不触发请求）"""
+    return fund_nav_store.confirmed(code)
+
+
+def get_fund_estimate(code: str) -> Optional[Dict[str, Any]]:
+    """基金最近一次盘中估值（不触发请求）"""
+    return fund_nav_store.estimate(code)
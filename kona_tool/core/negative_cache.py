@@ -0,0 +1,147 @@
+"""
+行情负缓存
+所有数据源都无法返回有效行情的代码（已退市、持仓中录错的代码、各数据源都拒绝的基金）按指数退避暂停请求，
+避免每次轮询 / 快照都走完整降级链并拖累健康数据源的熔断统计
+"""
+import logging
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Dict, List, Optional, Tuple
+
+import config
+
+logger = logging.getLogger(__name__)
+
+
+class NegativeCache:
+    """
+    代码 -> (连续失败次数, 暂停到期时间, 最近失败时间)
+
+    - 连续失败达到 min_failures 次后开始暂停，暂停时长从 base_seconds 起每次失败翻倍，最长 max_seconds
+    - 暂停期间 blocked() 返回 True，调用方不发请求；到期后放行一次，再失败则以更长时长继续暂停
+    - 获取成功或手动清除后恢复正常
+    - 条目数不超过 max_entries（按最近失败 LRU 淘汰）；暂停到期（或最近失败）超过 max_seconds 的条目
+      视为不再被请求，最多每 base_seconds 清理一次，避免任意无效代码让记录无限增长
+    """
+
+    def __init__(self, base_seconds: float, max_seconds: float, min_failures: int = 2, enabled: bool = True,
+                 max_entries: int = 5000):
+        self.base_seconds = max(1.0, float(base_seconds))
+        self.max_seconds = max(self.base_seconds, float(max_seconds))
+        self.min_failures = max(1, int(min_failures))
+        self.enabled = enabled
+        self.max_entries = max(1, int(max_entries))
+        self._lock = threading.Lock()
+        self._entries: "OrderedDict[str, Tuple[int, float, float]]" = OrderedDict()
+        self._last_prune = 0.0
+        self._stats: Dict[str, int] = {
+            "suppressed": 0, "failures": 0, "recovered": 0, "cleared": 0, "pruned": 0, "evicted": 0,
+        }
+
+    def _backoff(self, failures: int) -> float:
+        exponent = failures - self.min_failures
+        return min(self.max_seconds, self.base_seconds * (2 ** min(exponent, 32)))
+
+    def _prune(self, now: float) -> None:
+        """清理暂停到期（未暂停的按最近失败时间）超过 max_seconds 的条目（调用方持锁）"""
+        if now - self._last_prune < self.base_seconds:
+            return
+        self._last_prune = now
+        expired = [
+            code for code, (_, until, last_failure) in self._entries.items()
+            if now - max(until, last_failure) > self.max_seconds
+        ]
+        for code in expired:
+            del self._entries[code]
+        self._stats["pruned"] += len(expired)
+
+    def blocked(self, code: str) -> bool:
+        """代码当前是否处于暂停期（暂停期内的调用计入 suppressed）"""
+        if not self.enabled:
+            return False
+        with self._lock:
+            entry = self._entries.get(code)
+            if entry is None or time.time() >= entry[1]:
+                return False
+            self._stats["suppressed"] += 1
+            return True
+
+    def record_failure(self, code: str) -> None:
+        """记录一次所有数据源均失败的获取"""
+        if not self.enabled:
+            return
+        now = time.time()
+        with self._lock:
+            self._prune(now)
+            failures = self._entries.get(code, (0, 0.0, 0.0))[0] + 1
+            until = now + self._backoff(failures) if failures >= self.min_failures else 0.0
+            self._entries[code] = (failures, until, now)
+            self._entries.move_to_end(code)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+                self._stats["evicted"] += 1
+            self._stats["failures"] += 1
+        if until:
+            logger.info(f"Suppressing price lookups for {code} for {until - now:.0f}s after {failures} failures")
+
+    def record_success(self, code: str) -> None:
+        if not self._entries:
+            return
+        with self._lock:
+            if self._entries.pop(code, None) is not None:
+                self._stats["recovered"] += 1
+
+    def entries(self) -> List[Dict[str, Any]]:
+        """当前记录（按暂停到期时间倒序）"""
+        now = time.time()
+        with self._lock:
+            items = list(self._entries.items())
+        out = [
+            {
+                "code": code,
+                "failures": failures,
+                "suppressed": until > now,
+                "retry_in_seconds": round(max(0.0, until - now), 1),
+                "last_failure_at": last_failure,
+            }
+            for code, (failures, until, last_failure) in items
+        ]
+        out.sort(key=lambda item: item["retry_in_seconds"], reverse=True)
+        return out
+
+    def clear(self, code: Optional[str] = None) -> int:
+        """清除指定代码（code 为 None 时清除全部），返回清除的条数"""
+        with self._lock:
+            if code is None:
+                count = len(self._entries)
+                self._entries.clear()
+            else:
+                count = 1 if self._entries.pop(code, None) is not None else 0
+            self._stats["cleared"] += count
+        return count
+
+    def stats(self) -> Dict[str, Any]:
+        now = time.time()
+        with self._lock:
+            out: Dict[str, Any] = dict(self._stats)
+            out["size"] = len(self._entries)
+            out["max_entries"] = self.max_entries
+            out["active"] = sum(1 for _, until, _ in self._entries.values() if until > now)
+            return out
+
+    def reset(self) -> None:
+        with self._lock:
+            self._entries.clear()
+            self._last_prune = 0.0
+            for key in self._stats:
+                self._stats[key] = 0
+
+
+negative_cache = NegativeCache(
+    base_seconds=config.NEGATIVE_CACHE_BASE_SECONDS,
+    max_seconds=config.NEGATIVE_CACHE_MAX_SECONDS,
+    min_failures=config.NEGATIVE_CACHE_MIN_FAILURES,
+    enabled=config.ENABLE_NEGATIVE_CACHE,
+    max_entries=config.NEGATIVE_CACHE_MAX_ENTRIES,
+)
@@ -30,6 +30,8 @@ import re
 from datetime import datetime
 from typing import List, Dict
 
+from .utils import monitored_http_get
+
 # 配置
 # 新浪财经直播接口: zhibo_id=152 (全球财经)
 SINA_API_URL = "https://zhibo.sina.com.cn/api/zhibo/feed"
@@ -59,7 +61,7 @@ class NewsFetcher:
                 "_": int(time.time() * 1000)
             }
             
-            resp = requests.get(SINA_API_URL, headers=HEADERS, params=params, timeout=5)
+            resp = monitored_http_get("sina_news", SINA_API_URL, headers=HEADERS, params=params, timeout=5)
             logger.info(f"Sina response status: {resp.status_code}")
             
             if resp.status_code == 200:
@@ -6,6 +6,8 @@ import logging
 import re
 from typing import Optional, Dict
 
+from .codes import canonical_code
+
 logger = logging.getLogger(__name__)
 
 
@@ -26,41 +28,11 @@ def parse_code(raw_code: str, curr: str = "") -> Dict[str, str]:
     code = raw_code.strip()
     curr = curr.strip().upper() if curr else ""
     
-    # 如果是纯数字
-    if code.isdigit():
-        # 11开头 -> 场外基金
-        if code.startswith('11'):
-            code = f"f_{code}"
-            if not curr:
-                curr = 'CNY'
-        # 沪市: 60, 51, 90
-        elif code.startswith(('6', '5', '9')):
-            code = f"sh{code}"
-            if not curr:
-                curr = 'CNY'
-        # 深市: 00, 30, 15, 16, 20
-        elif code.startswith(('0', '3', '1', '2')):
-            code = f"sz{code}"
-            if not curr:
-                curr = 'CNY'
-        # 北交所: 4, 8
-        elif code.startswith(('4', '8')):
-            code = f"bj{code}"
-            if not curr:
-                curr = 'CNY'
-    
-    # 港股
-    elif '.HK' in code.upper():
-        # 保持 00175.HK 格式
-        code = code.upper()
-        if not curr:
-            curr = 'HKD'
-    
-    # 美股（纯字母）
-    elif code.isalpha() and '_' not in code:
-        code = f"gb_{code.lower()}"
-        if not curr:
-            curr = 'USD'
+    # 11开头纯数字 -> 场外基金，其余写法统一为规范代码（600519 -> sh600519, hk00700 -> 00700.HK, AAPL -> gb_aapl）
+    if code.isdigit() and code.startswith('11'):
+        code = f"f_{code}"
+    else:
+        code = canonical_code(code)
     
     # 默认货币推断
     if not curr:
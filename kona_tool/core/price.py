@@ -2,71 +2,233 @@
 价格缓存和统一获取模块
 提供价格数据的缓存和统一获取接口
 """
+import sys
 import time
 import logging
-import re
 import threading
+from collections import OrderedDict
 from typing import Dict, Tuple, Optional, List, Any
-from concurrent.futures import ThreadPoolExecutor, as_completed
+from concurrent.futures import TimeoutError as FutureTimeoutError, as_completed
 
 import config
-from .stock import get_stock_price
-from .asset_type import infer_asset_type, asset_type_label
-from .fund import get_fund_price
+from .stock import get_stock_price, batch_get_stock_prices, plan_batch_chunks
+from .asset_type import asset_classifier, infer_asset_type, asset_type_label
+from .fund import get_fund_price, get_fund_race_stats
+from .market import cache_expiry
 from .source_health import source_health
-from .utils import monitored_http_get
-from .utils import safe_float
+from .executor import fetch_executor, race_executor
+from .shared_cache import build_quote_store
+from .routing import provider_router
+from .hedging import hedger
+from .affinity import provider_affinity
+from .nav_store import fund_nav_store
+from .forex import forex_service
+from .negative_cache import negative_cache
+from .symbols import exact_match, symbol_master
+from .singleflight import SingleFlight
+from .codes import canonical_code
+from .utils import monitored_http_get, get_http_pool_stats
 
 logger = logging.getLogger(__name__)
 
 
 class PriceCache:
-    """价格缓存类"""
+    """
+    价格缓存类（线程安全、有界 LRU）
+
+    market_aware=True 时按代码所属市场与开闭市状态决定有效期（见 market.cache_expiry）：
+    开市使用 ttl，休市缓存到下一次开盘，场外基金缓存到下一个净值公布窗口。
+    过期后 stale_ttl - ttl 秒内仍可作为回退值使用。
+
+    条目数超过 max_entries 时淘汰最久未使用的条目；每隔 sweep_interval 秒
+    在读写时顺带清理超出回退窗口的条目。
+
+    所有条目以规范代码（codes.canonical_code）为 key，同一标的的不同写法共用一个条目。
+
+    配置 l2（见 shared_cache）时为两级缓存：写入同时写 L2；L1 缺失或已过期时从 L2 读取，
+    保留原获取时间戳，因此各 worker 对新鲜/回退的判断一致。
+    """
     
-    def __init__(self, ttl: int = 60, stale_ttl: int = 300):
+    def __init__(self, ttl: int = 60, stale_ttl: int = 300, market_aware: bool = False,
+                 max_entries: int = 5000, sweep_interval: int = 60, l2=None):
         """
         初始化缓存
         
         Args:
             ttl: 缓存过期时间（秒）
+            stale_ttl: 过期值可回退使用的最长时间（秒，从获取时算起）
+            market_aware: 是否按市场开闭市计算有效期
+            max_entries: 最大条目数
+            sweep_interval: 过期条目清理间隔（秒）
+            l2: 跨进程共享缓存（InMemoryQuoteStore / RedisQuoteStore），None 表示仅进程内
         """
-        self.cache: Dict[str, Tuple[Tuple[float, float, float, float], float]] = {}
+        self.cache: "OrderedDict[str, Tuple[Tuple[float, float, float, float], float]]" = OrderedDict()
         self.ttl = ttl
         self.stale_ttl = max(stale_ttl, ttl)
+        self.market_aware = market_aware
+        self.max_entries = max(1, max_entries)
+        self.sweep_interval = max(1, sweep_interval)
+        self._lock = threading.RLock()
+        self._expiry_memo: Dict[str, Tuple[float, float]] = {}
+        self._last_sweep = time.monotonic()
+        self.l2 = l2
+        self._stats = {"evictions": 0, "swept": 0, "sweeps": 0, "l2_hits": 0, "l2_misses": 0}
+
+    def expires_at(self, code: str, timestamp: float) -> float:
+        """
+        缓存条目到期时间戳
+        """
+        if not self.market_aware:
+            return timestamp + self.ttl
+        with self._lock:
+            memo = self._expiry_memo.get(code)
+            if memo and memo[0] == timestamp:
+                return memo[1]
+            expiry = cache_expiry(code, timestamp, self.ttl)
+            self._expiry_memo[code] = (timestamp, expiry)
+            return expiry
+
+    def _stale_until(self, code: str, timestamp: float) -> float:
+        return self.expires_at(code, timestamp) + (self.stale_ttl - self.ttl)
+
+    def _evict(self, code: str) -> None:
+        self.cache.pop(code, None)
+        self._expiry_memo.pop(code, None)
+
+    def _enforce_bound(self) -> None:
+        while len(self.cache) > self.max_entries:
+            evicted, _ = self.cache.popitem(last=False)
+            self._expiry_memo.pop(evicted, None)
+            self._stats["evictions"] += 1
+
+    def _needs_l2(self, code: str, now: float) -> bool:
+        entry = self.cache.get(code)
+        return entry is None or now >= self.expires_at(code, entry[1])
+
+    def prefetch(self, codes) -> int:
+        """
+        L1 缺失或已过期的代码从 L2 批量读取并写入 L1（保留原获取时间戳）
+
+        Returns:
+            从 L2 读到的条目数
+        """
+        if self.l2 is None:
+            return 0
+        now = time.time()
+        with self._lock:
+            wanted = [code for code in dict.fromkeys(map(canonical_code, codes)) if self._needs_l2(code, now)]
+        if not wanted:
+            return 0
+        found = self.l2.get_many(wanted)
+        with self._lock:
+            self._stats["l2_misses"] += len(wanted) - len(found)
+            for code, (price_data, timestamp) in found.items():
+                current = self.cache.get(code)
+                if current is not None and current[1] >= timestamp:
+                    continue
+                self.cache[code] = (price_data, timestamp)
+                self.cache.move_to_end(code)
+                self._expiry_memo.pop(code, None)
+                self._stats["l2_hits"] += 1
+            self._enforce_bound()
+        return len(found)
+
+    def _maybe_sweep(self) -> None:
+        if time.monotonic() - self._last_sweep >= self.sweep_interval:
+            self.sweep()
+
+    def sweep(self) -> int:
+        """
+        清理超出回退窗口（stale_ttl）的条目
+
+        Returns:
+            清理的条目数
+        """
+        with self._lock:
+            now = time.time()
+            expired = [
+                code for code, (_, timestamp) in self.cache.items()
+                if now > self._stale_until(code, timestamp)
+            ]
+            for code in expired:
+                self._evict(code)
+            self._last_sweep = time.monotonic()
+            self._stats["sweeps"] += 1
+            self._stats["swept"] += len(expired)
+        if expired:
+            logger.debug(f"Cache sweep removed {len(expired)} entries")
+        return len(expired)
     
-    def get(self, code: str) -> Optional[Tuple[float, float, float, float]]:
+    def lookup(self, code: str, shared: bool = True) -> Tuple[Optional[Tuple[float, float, float, float]], bool]:
+        """
+        一次查询同时得到回退值与是否未过期（get / get_stale 的合并，只 prefetch 一次）
+
+        Args:
+            code: 证券代码
+            shared: L1 未命中时是否查询 L2（调用方已 prefetch 时传 False）
+
+        Returns:
+            (仍在回退窗口内的价格数据或 None, 是否未过期)
+        """
+        code = canonical_code(code)
+        if shared:
+            self.prefetch([code])
+        with self._lock:
+            self._maybe_sweep()
+            entry = self.cache.get(code)
+            if entry is None:
+                return None, False
+            price_data, timestamp = entry
+            now = time.time()
+            if now < self.expires_at(code, timestamp):
+                self.cache.move_to_end(code)
+                logger.debug(f"Cache hit for {code}")
+                return price_data, True
+            if now <= self._stale_until(code, timestamp):
+                return price_data, False
+            self._evict(code)
+            logger.debug(f"Cache expired for {code}")
+            return None, False
+
+    def get(self, code: str, shared: bool = True) -> Optional[Tuple[float, float, float, float]]:
         """
         从缓存获取价格
         
         Args:
             code: 证券代码
+            shared: L1 未命中时是否查询 L2（调用方已 prefetch 时传 False）
             
         Returns:
             (价格, 昨收, 涨跌额, 涨跌幅%) 或 None
         """
-        if code in self.cache:
-            price_data, timestamp = self.cache[code]
-            if time.time() - timestamp < self.ttl:
-                logger.debug(f"Cache hit for {code}")
-                return price_data
-            else:
-                del self.cache[code]
-                logger.debug(f"Cache expired for {code}")
-        return None
+        price_data, fresh = self.lookup(code, shared)
+        return price_data if fresh else None
 
     def get_stale(self, code: str) -> Optional[Tuple[float, float, float, float]]:
         """
         获取过期但仍可回退使用的缓存值（stale-while-revalidate）。
         """
-        if code not in self.cache:
+        return self.lookup(code)[0]
+    
+    def age(self, code: str) -> Optional[float]:
+        """
+        缓存条目的年龄（秒），不存在返回 None
+        """
+        entry = self.cache.get(canonical_code(code))
+        if entry is None:
             return None
-        price_data, timestamp = self.cache[code]
-        age = time.time() - timestamp
-        if age <= self.stale_ttl:
-            return price_data
-        del self.cache[code]
-        return None
-    
+        return time.time() - entry[1]
+
+    def remaining(self, code: str) -> Optional[float]:
+        """
+        距缓存到期的秒数（已过期为负数），不存在返回 None
+        """
+        code = canonical_code(code)
+        entry = self.cache.get(code)
+        if entry is None:
+            return None
+        return self.expires_at(code, entry[1]) - time.time()
+
     def set(self, code: str, price_data: Tuple[float, float, float, float]):
         """
         设置缓存
@@ -75,17 +237,210 @@ class PriceCache:
             code: 证券代码
             price_data: 价格数据
         """
-        self.cache[code] = (price_data, time.time())
+        code = canonical_code(code)
+        timestamp = time.time()
+        with self._lock:
+            self.cache[code] = (price_data, timestamp)
+            self.cache.move_to_end(code)
+            self._expiry_memo.pop(code, None)
+            self._enforce_bound()
+            self._maybe_sweep()
+            keep_seconds = self._stale_until(code, timestamp) - timestamp
+        if self.l2 is not None:
+            self.l2.set(code, price_data, timestamp, keep_seconds)
         logger.debug(f"Cache set for {code}")
+
+    def set_many(self, items: Dict[str, Tuple[float, float, float, float]]) -> None:
+        """
+        批量设置缓存（批量行情的结果），L2 一次往返写入
+        """
+        timestamp = time.time()
+        entries = []
+        with self._lock:
+            for code, price_data in items.items():
+                code = canonical_code(code)
+                self.cache[code] = (price_data, timestamp)
+                self.cache.move_to_end(code)
+                self._expiry_memo.pop(code, None)
+                entries.append((code, price_data, timestamp, self._stale_until(code, timestamp) - timestamp))
+            self._enforce_bound()
+            self._maybe_sweep()
+        if self.l2 is not None and entries:
+            self.l2.set_many(entries)
     
+    def export_entries(self) -> List[Tuple[str, Tuple[float, float, float, float], float]]:
+        """
+        导出仍在回退窗口内的条目 [(代码, 行情, 获取时间戳)]，用于落盘
+        """
+        with self._lock:
+            now = time.time()
+            return [
+                (code, price_data, timestamp)
+                for code, (price_data, timestamp) in self.cache.items()
+                if now <= self._stale_until(code, timestamp)
+            ]
+
+    def load_entries(self, entries) -> int:
+        """
+        导入条目并保留原获取时间戳；超出回退窗口或比现有条目旧的跳过
+
+        Returns:
+            导入的条目数
+        """
+        loaded = 0
+        with self._lock:
+            now = time.time()
+            for code, price_data, timestamp in sorted(entries, key=lambda e: e[2]):
+                code = canonical_code(code)
+                if now > self._stale_until(code, timestamp):
+                    continue
+                current = self.cache.get(code)
+                if current is not None and current[1] >= timestamp:
+                    continue
+                self.cache[code] = (tuple(price_data), timestamp)
+                self.cache.move_to_end(code)
+                self._expiry_memo.pop(code, None)
+                loaded += 1
+            self._enforce_bound()
+        return loaded
+
     def clear(self):
-        """清空缓存"""
-        self.cache.clear()
+        """清空进程内缓存（L2 条目按各自过期时间失效）"""
+        with self._lock:
+            self.cache.clear()
+            self._expiry_memo.clear()
         logger.info("Cache cleared")
 
+    def stats(self) -> Dict[str, Any]:
+        """
+        缓存统计：条目数、淘汰/清理次数、近似内存占用（字节）
+        """
+        with self._lock:
+            approx_bytes = sys.getsizeof(self.cache) + sys.getsizeof(self._expiry_memo)
+            for code, entry in self.cache.items():
+                approx_bytes += (
+                    sys.getsizeof(code)
+                    + sys.getsizeof(entry)
+                    + sys.getsizeof(entry[0])
+                    + sum(sys.getsizeof(v) for v in entry[0])
+                    + sys.getsizeof(entry[1])
+                )
+            out: Dict[str, Any] = dict(self._stats)
+            out["size"] = len(self.cache)
+            out["max_entries"] = self.max_entries
+            out["approx_bytes"] = approx_bytes
+            out["l2"] = self.l2.stats() if self.l2 is not None else None
+            return out
+
+
+class SearchCache:
+    """
+    搜索结果缓存（TTL + LRU，key 为规范化后的查询词）
+
+    complete=True 表示该结果集未被截断（未达到结果条数上限，各上游也未达到各自的返回上限），
+    更长的查询可直接从其最长的已缓存前缀的结果中过滤得到
+    只有不含英文字母的查询（代码数字、中文名称）复用前缀：上游还按全拼、英文名称匹配，
+    含字母的查询（如 "mao" -> "maot"）的结果无法由本地按代码 / 名称 / 拼音首字母过滤还原
+    """
+
+    def __init__(self, ttl: float = 300, max_entries: int = 500):
+        self.ttl = ttl
+        self.max_entries = max(1, max_entries)
+        self._lock = threading.Lock()
+        self._entries: "OrderedDict[str, Tuple[List[dict], bool, float]]" = OrderedDict()
+        self._stats = {"hits": 0, "prefix_hits": 0, "misses": 0, "evictions": 0}
+
+    @staticmethod
+    def normalize(query: str) -> str:
+        return ' '.join((query or '').split()).lower()
+
+    @staticmethod
+    def prefix_reusable(key: str) -> bool:
+        """规范化后的查询能否由已缓存前缀的结果过滤得到（不含英文字母）"""
+        return not any('a' <= ch <= 'z' for ch in key)
+
+    def _fresh(self, key: str, now: float) -> Optional[Tuple[List[dict], bool, float]]:
+        entry = self._entries.get(key)
+        if entry is None:
+            return None
+        if now - entry[2] > self.ttl:
+            del self._entries[key]
+            return None
+        self._entries.move_to_end(key)
+        return entry
+
+    def get(self, query: str) -> Optional[List[dict]]:
+        """完全匹配的缓存结果（副本）"""
+        key = self.normalize(query)
+        with self._lock:
+            entry = self._fresh(key, time.time())
+            if entry is None:
+                return None
+            self._stats["hits"] += 1
+            return [dict(item) for item in entry[0]]
+
+    def complete_prefix(self, query: str) -> Optional[Tuple[str, List[dict]]]:
+        """最长的、结果集完整的已缓存前缀 -> (前缀, 结果副本)"""
+        key = self.normalize(query)
+        if not self.prefix_reusable(key):
+            return None
+        now = time.time()
+        with self._lock:
+            for end in range(len(key) - 1, 0, -1):
+                entry = self._fresh(key[:end], now)
+                if entry is not None and entry[1]:
+                    return key[:end], [dict(item) for item in entry[0]]
+        return None
+
+    def put(self, query: str, results: List[dict], complete: bool) -> None:
+        key = self.normalize(query)
+        if not key:
+            return
+        complete = complete and self.prefix_reusable(key)
+        with self._lock:
+            self._entries[key] = ([dict(item) for item in results], complete, time.time())
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+                self._stats["evictions"] += 1
+
+    def mark(self, key: str) -> None:
+        with self._lock:
+            self._stats[key] += 1
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            out: Dict[str, Any] = dict(self._stats)
+            out["size"] = len(self._entries)
+        lookups = out["hits"] + out["prefix_hits"] + out["misses"]
+        out["hit_ratio"] = round((out["hits"] + out["prefix_hits"]) / lookups, 4) if lookups else 0.0
+        return out
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+
 
 # 全局缓存实例
-price_cache = PriceCache(ttl=config.CACHE_TTL, stale_ttl=config.CACHE_STALE_TTL)
+price_cache = PriceCache(
+    ttl=config.CACHE_TTL,
+    stale_ttl=config.CACHE_STALE_TTL,
+    market_aware=config.CACHE_MARKET_AWARE_TTL,
+    max_entries=config.CACHE_MAX_ENTRIES,
+    sweep_interval=config.CACHE_SWEEP_INTERVAL,
+    l2=build_quote_store(config.PRICE_CACHE_REDIS_URL),
+)
+
+search_cache = SearchCache(
+    ttl=config.SEARCH_CACHE_TTL,
+    max_entries=config.SEARCH_CACHE_MAX_ENTRIES,
+)
+
+# 同一代码的并发网络请求合并
+_price_flights = SingleFlight()
+# 已提交、尚未完成的后台刷新（stale-while-revalidate）
+_swr_pending: set = set()
+_swr_lock = threading.Lock()
 
 _runtime_lock = threading.Lock()
 _runtime_metrics: Dict[str, Any] = {
@@ -93,6 +448,14 @@ _runtime_metrics: Dict[str, Any] = {
     "stale_hits": 0,
     "network_fetch": 0,
     "network_fail": 0,
+    "batch_hits": 0,
+    "search_local": 0,
+    "search_network": 0,
+    "negative_hits": 0,
+    "swr_hits": 0,
+    "swr_refreshes": 0,
+    "batch_deadline_expired": 0,
+    "batch_deadline_stale": 0,
     "last_fetch_at": 0.0,
 }
 
@@ -105,82 +468,281 @@ def _mark_metric(key: str, inc: int = 1) -> None:
 
 def get_price_runtime_metrics() -> Dict[str, Any]:
     with _runtime_lock:
-        return dict(_runtime_metrics)
+        metrics = dict(_runtime_metrics)
+    metrics["cache"] = price_cache.stats()
+    metrics["executor"] = fetch_executor.stats()
+    metrics["race_executor"] = race_executor.stats()
+    metrics["routing"] = provider_router.stats()
+    metrics["hedging"] = hedger.stats()
+    metrics["affinity"] = provider_affinity.stats()
+    metrics["fund_nav"] = fund_nav_store.stats()
+    metrics["forex"] = forex_service.stats()
+    metrics["symbols"] = symbol_master.stats()
+    metrics["asset_classification"] = asset_classifier.stats()
+    metrics["search_cache"] = search_cache.stats()
+    metrics["fund_race"] = get_fund_race_stats()
+    metrics["singleflight"] = _price_flights.stats()
+    metrics["negative_cache"] = negative_cache.stats()
+    return metrics
 
 
 def get_price_source_health() -> Dict[str, Dict[str, Any]]:
-    return source_health.snapshot()
+    health = source_health.snapshot()
+    # 连接池复用统计与熔断统计按数据源合并展示
+    for source, pool_stats in get_http_pool_stats().items():
+        health.setdefault(source, {}).update(pool_stats)
+    return health
 
 
-def get_price(code: str, use_cache: bool = True) -> Tuple[float, float, float, float]:
+def _fetch_price(code: str) -> Optional[Tuple[float, float, float, float]]:
+    """
+    从网络获取价格并写入缓存（single-flight 的实际执行体）
+
+    Returns:
+        有效价格数据，失败返回 None（负缓存暂停中的代码不发请求）
+    """
+    if negative_cache.blocked(code):
+        _mark_metric("negative_hits")
+        return None
+
+    _mark_metric("network_fetch")
+
+    # 场外基金
+    if code.startswith('f_'):
+        price_data = get_fund_price(code)
+    # 其他（股票、指数等）
+    else:
+        price_data = get_stock_price(code)
+
+    if price_data and price_data[0] > 0:
+        price_cache.set(code, price_data)
+        negative_cache.record_success(code)
+        return price_data
+
+    _mark_metric("network_fail")
+    # 近期获取成功过（仍有可回退的缓存）的代码按临时故障处理，不计入负缓存
+    if price_cache.get_stale(code) is None:
+        negative_cache.record_failure(code)
+    return None
+
+
+def _fallback_price(code: str, stale_fallback: Optional[Tuple[float, float, float, float]]) -> Tuple[float, float, float, float]:
+    """获取失败时回退到过期缓存，否则返回 0"""
+    if stale_fallback:
+        _mark_metric("stale_hits")
+        logger.info(f"Price fallback to stale cache for {code}")
+        return stale_fallback
+    return (0.0, 0.0, 0.0, 0.0)
+
+
+def _refresh_in_background(code: str) -> bool:
+    """
+    在共享线程池后台刷新价格（与进行中的获取、已提交的刷新去重）
+
+    Returns:
+        是否提交了新的刷新任务
+    """
+    with _swr_lock:
+        if code in _swr_pending or _price_flights.in_flight(code):
+            return False
+        _swr_pending.add(code)
+
+    def run():
+        try:
+            _price_flights.do(code, lambda: _fetch_price(code))
+        except Exception as e:
+            logger.debug(f"Background price refresh failed for {code}: {e}")
+        finally:
+            with _swr_lock:
+                _swr_pending.discard(code)
+
+    try:
+        fetch_executor.submit(run)
+    except Exception as e:
+        with _swr_lock:
+            _swr_pending.discard(code)
+        logger.debug(f"Background price refresh not scheduled for {code}: {e}")
+        return False
+    _mark_metric("swr_refreshes")
+    return True
+
+
+def _fill_meta(meta: Optional[Dict[str, Any]], code: str, stale: bool) -> None:
+    if meta is None:
+        return
+    age = price_cache.age(code)
+    meta["stale"] = stale
+    meta["age_ms"] = int(age * 1000) if age is not None else None
+
+
+def get_price(code: str, use_cache: bool = True, meta: Optional[Dict[str, Any]] = None) -> Tuple[float, float, float, float]:
     """
     统一的价格获取接口（自动判断类型并缓存）
+
+    同一代码的并发缓存未命中会合并为一次网络请求（single-flight）。
+    缓存过期但仍在 stale_ttl 内时（ENABLE_PRICE_SWR）立即返回旧值，并在后台刷新。
     
     Args:
         code: 证券代码
-        use_cache: 是否使用缓存
+        use_cache: 是否使用缓存（False 时总是同步请求网络）
+        meta: 传入 dict 时填充 {"stale": 是否为过期值, "age_ms": 价格年龄（毫秒，无缓存为 None）}
         
     Returns:
         (价格, 昨收, 涨跌额, 涨跌幅%)
     """
+    code = canonical_code(code)
     logger.debug(f"Getting price for {code}")
     
-    stale_fallback = price_cache.get_stale(code)
+    # 一次查询（一次 L2 读取）同时得到未过期值与回退值
+    cached, fresh = price_cache.lookup(code)
+    stale_fallback = cached
 
     # 检查缓存
     if use_cache:
-        cached = price_cache.get(code)
-        if cached:
+        if fresh:
             _mark_metric("cache_hits")
+            _fill_meta(meta, code, stale=False)
             return cached
+        if stale_fallback and config.ENABLE_PRICE_SWR:
+            _mark_metric("swr_hits")
+            _refresh_in_background(code)
+            _fill_meta(meta, code, stale=True)
+            return stale_fallback
     
-    # 根据代码类型选择获取方式
-    price_data = None
-    
-    # 场外基金
-    _mark_metric("network_fetch")
-
-    if code.startswith('f_'):
-        price_data = get_fund_price(code)
-    
-    # 其他（股票、指数等）
-    else:
-        price_data = get_stock_price(code)
-    
-    # 如果获取成功，更新缓存
-    if price_data and price_data[0] > 0:
-        price_cache.set(code, price_data)
+    price_data = _price_flights.do(code, lambda: _fetch_price(code))
+    if price_data:
+        _fill_meta(meta, code, stale=False)
         return price_data
 
-    _mark_metric("network_fail")
-    if stale_fallback:
-        _mark_metric("stale_hits")
-        logger.info(f"Price fallback to stale cache for {code}")
-        return stale_fallback
-
-    return (0.0, 0.0, 0.0, 0.0)
+    _fill_meta(meta, code, stale=bool(stale_fallback))
+    return _fallback_price(code, stale_fallback)
+
 
+# batch_get_prices 每个代码的数据新鲜度
+FRESH = "fresh"      # 缓存未过期或本次获取成功
+STALE = "stale"      # 获取失败或超过 deadline，使用过期缓存
+MISSING = "missing"  # 无可用价格
 
-def batch_get_prices(codes: list, use_cache: bool = True) -> Dict[str, Tuple[float, float, float, float]]:
+
+def _freshness(code: str, price_data: Optional[Tuple[float, float, float, float]]) -> str:
+    if not price_data or price_data[0] <= 0:
+        return MISSING
+    remaining = price_cache.remaining(code)
+    # 本次获取成功会写入未过期的缓存；缓存仍是过期条目说明返回的是回退值
+    return STALE if remaining is not None and remaining <= 0 else FRESH
+
+
+def batch_get_prices(
+    codes: list,
+    use_cache: bool = True,
+    deadline: Optional[float] = None,
+    freshness: Optional[Dict[str, str]] = None,
+) -> Dict[str, Tuple[float, float, float, float]]:
     """
-    批量获取价格（并发获取）
+    批量获取价格（先按数据源批量请求，未命中的再并发逐个获取）
+
+    与其他请求（包括其他用户的批量请求）重叠的代码通过 single-flight 共享同一次获取；
+    同一标的的不同写法（600519 / sh600519）按规范代码合并为一次获取。
     
     Args:
         codes: 证券代码列表
         use_cache: 是否使用缓存
+        deadline: 整个批量调用的时间预算（秒），None / <=0 不限制。到期后不再等待
+            批量请求、其他请求中的同代码获取和逐个获取，未完成的代码返回过期缓存（无则为 0）；
+            未完成的获取继续在后台执行，完成后写入缓存
+        freshness: 传入 dict 时填充 {代码: FRESH / STALE / MISSING}
         
     Returns:
-        代码到价格数据的映射
+        代码（调用方传入的写法）到价格数据的映射
     """
+    aliases: Dict[str, List[str]] = {}
+    for raw in codes:
+        aliases.setdefault(canonical_code(raw), []).append(raw)
+    flags: Dict[str, str] = {}
+    results = _batch_get_canonical(list(aliases), use_cache, deadline, flags)
+    out = {}
+    for code, raws in aliases.items():
+        for raw in raws:
+            if code in results:
+                out[raw] = results[code]
+            if freshness is not None and code in flags:
+                freshness[raw] = flags[code]
+    return out
+
+
+def _fetch_batch_chunk(
+    chunk: List[str],
+    flights: Dict[str, Any],
+    state: Dict[str, Any],
+) -> Tuple[Dict[str, Tuple[float, float, float, float]], List[str]]:
+    """
+    在共享线程池中执行一个数据源分块的批量请求（chunk 中的代码均已由调用方抢占 single-flight）
+
+    命中的代码写入缓存并完成 single-flight，未命中的释放抢占（等待方会加入新的请求）。
+    调用方已因 deadline 放弃等待时（state["abandoned"]），未命中的代码在后台逐个获取，结果写入缓存。
+
+    Returns:
+        (命中的 {代码: 价格数据}, 未命中的代码列表)
+    """
+    batched = {}
+    hits: Dict[str, Tuple[float, float, float, float]] = {}
+    misses: List[str] = []
+    try:
+        batched = batch_get_stock_prices(chunk)
+    except Exception as e:
+        logger.warning(f"Batch quote fetch failed: {e}")
+    finally:
+        for code in chunk:
+            price_data = batched.get(code)
+            if price_data and price_data[0] > 0:
+                hits[code] = price_data
+            else:
+                misses.append(code)
+        # 命中的代码一次写入缓存（L2 一次 pipeline），再完成各自的 single-flight
+        if hits:
+            price_cache.set_many(hits)
+        for code in chunk:
+            if code in hits:
+                negative_cache.record_success(code)
+                _price_flights.resolve(code, flights[code], result=hits[code])
+            else:
+                _price_flights.release(code, flights[code])
+        with state["lock"]:
+            state["done"] = True
+            abandoned = state["abandoned"]
+    if hits:
+        _mark_metric("batch_hits", len(hits))
+    if abandoned:
+        for code in misses:
+            fetch_executor.submit(get_price, code, False)
+    return hits, misses
+
+
+def _batch_get_canonical(
+    codes: List[str],
+    use_cache: bool,
+    deadline: Optional[float],
+    flags: Dict[str, str],
+) -> Dict[str, Tuple[float, float, float, float]]:
+    """batch_get_prices 的实现，codes 为去重后的规范代码，flags 填充各代码的新鲜度"""
+    deadline_at = time.monotonic() + deadline if deadline and deadline > 0 else None
+
+    def remaining() -> Optional[float]:
+        return None if deadline_at is None else max(0.0, deadline_at - time.monotonic())
+
     results = {}
     missing_codes: List[str] = []
+    fallback_codes: List[str] = []
+    pending_codes: List[str] = []
     seen_missing = set()
 
     if use_cache:
+        price_cache.prefetch(codes)
         for code in codes:
-            cached = price_cache.get(code)
+            cached = price_cache.get(code, shared=False)
             if cached:
                 results[code] = cached
+                flags[code] = FRESH
             elif code not in seen_missing:
                 missing_codes.append(code)
                 seen_missing.add(code)
@@ -190,50 +752,112 @@ def batch_get_prices(codes: list, use_cache: bool = True) -> Dict[str, Tuple[flo
                 missing_codes.append(code)
                 seen_missing.add(code)
 
+    # 负缓存暂停中的代码不参与批量请求与逐个回退
+    blocked = [code for code in missing_codes if negative_cache.blocked(code)]
+    if blocked:
+        _mark_metric("negative_hits", len(blocked))
+        blocked_set = set(blocked)
+        missing_codes = [code for code in missing_codes if code not in blocked_set]
+        for code in blocked:
+            results[code] = price_cache.get_stale(code) or (0.0, 0.0, 0.0, 0.0)
+            flags[code] = STALE if results[code][0] > 0 else MISSING
+
     if missing_codes:
-        with ThreadPoolExecutor(max_workers=10) as executor:
-            future_to_code = {
-                executor.submit(get_price, code, False): code
-                for code in missing_codes
-            }
-            for future in as_completed(future_to_code):
-                code = future_to_code[future]
+        # 1. 抢占 single-flight：已有进行中请求的代码直接等待其结果
+        leaders: Dict[str, Any] = {}
+        followers: Dict[str, Any] = {}
+        for code in missing_codes:
+            flight, is_leader = _price_flights.claim(code)
+            (leaders if is_leader else followers)[code] = flight
+
+        # 2. 按数据源分块批量获取（每个分块一次请求，在共享线程池中并发执行，受 deadline 限制）
+        chunks = plan_batch_chunks(list(leaders)) if leaders else []
+        chunked = {code for chunk in chunks for code in chunk}
+        for code, flight in leaders.items():
+            if code not in chunked:
+                # 不支持批量：释放抢占，由逐个获取重新发起
+                _price_flights.release(code, flight)
+                fallback_codes.append(code)
+        chunk_futures = {}
+        for chunk in chunks:
+            state = {"lock": threading.Lock(), "done": False, "abandoned": False}
+            future = fetch_executor.submit(_fetch_batch_chunk, chunk, {code: leaders[code] for code in chunk}, state)
+            chunk_futures[future] = (chunk, state)
+
+        # 3. 等待其他请求中的同代码获取结果
+        for code, flight in followers.items():
+            if not flight.wait(remaining()):
+                pending_codes.append(code)
+            elif flight.released or flight.error is not None:
+                fallback_codes.append(code)
+            elif flight.result:
+                results[code] = flight.result
+                flags[code] = FRESH
+            else:
+                results[code] = _fallback_price(code, price_cache.get_stale(code))
+                flags[code] = _freshness(code, results[code])
+
+        # 4. 收集批量分块结果；deadline 到期仍未返回的分块在后台继续执行（完成后写入缓存）
+        def collect(future) -> None:
+            hits, misses = future.result()
+            results.update(hits)
+            for code in hits:
+                flags[code] = FRESH
+            fallback_codes.extend(misses)
+
+        try:
+            for future in as_completed(chunk_futures, timeout=remaining()):
+                chunk_futures.pop(future)
+                collect(future)
+        except FutureTimeoutError:
+            for future, (chunk, state) in chunk_futures.items():
+                with state["lock"]:
+                    state["abandoned"] = not state["done"]
+                if state["abandoned"]:
+                    pending_codes.extend(chunk)
+                else:
+                    collect(future)
+
+    # 5. 批量未命中的代码回退到逐个获取（deadline 到期后仍提交，结果写入缓存供下次使用）
+    if fallback_codes:
+        future_to_code = {
+            fetch_executor.submit(get_price, code, False): code
+            for code in fallback_codes
+        }
+        try:
+            for future in as_completed(future_to_code, timeout=remaining()):
+                code = future_to_code.pop(future)
                 try:
                     results[code] = future.result()
                 except Exception as e:
                     logger.warning(f"Failed to get price for {code}: {e}")
                     results[code] = (0.0, 0.0, 0.0, 0.0)
+                flags[code] = _freshness(code, results[code])
+        except FutureTimeoutError:
+            pending_codes.extend(future_to_code.values())
+
+    # 6. deadline 到期仍未完成的代码返回过期缓存
+    if pending_codes:
+        _mark_metric("batch_deadline_expired")
+        for code in pending_codes:
+            results[code] = price_cache.get_stale(code) or (0.0, 0.0, 0.0, 0.0)
+            flags[code] = STALE if results[code][0] > 0 else MISSING
+        stale_count = sum(1 for code in pending_codes if flags[code] == STALE)
+        if stale_count:
+            _mark_metric("batch_deadline_stale", stale_count)
+        logger.info(f"Batch price deadline ({deadline}s) expired, {len(pending_codes)} codes still fetching")
 
     return results
 
 
 def get_forex_rates() -> Dict[str, float]:
     """
-    获取实时汇率
+    获取实时汇率（见 forex.ForexService：TTL 缓存、批量获取、失败回退最近一次已知汇率）
     
     Returns:
-        汇率字典 {'USD': 7.25, 'HKD': 0.93, 'CNY': 1.0}
+        汇率字典 {'USD': 7.25, 'HKD': 0.93, 'CNY': 1.0, ...}
     """
-    rates = config.DEFAULT_FOREX_RATES.copy()
-    
-    try:
-        url = config.API_ENDPOINTS["sina_forex"]
-        r = monitored_http_get("sina_forex", url, headers=config.HEADERS, timeout=config.API_TIMEOUT)
-        
-        if r.status_code == 200:
-            text = r.text
-            # 使用正则匹配 hf_USDCNY=7.25, hf_HKDCNY=0.93
-            matches = re.findall(r'hf_([A-Z]+)CNY.*?=([0-9.]+)', text)
-            for curr, price_str in matches:
-                p = safe_float(price_str)
-                if p > 0:
-                    rates[curr] = p
-                    logger.debug(f"Updated {curr} rate: {p}")
-                    
-    except Exception as e:
-        logger.warning(f"Failed to get forex rates: {e}, using defaults")
-    
-    return rates
+    return forex_service.rates()
 
 
 def _parse_sina_response(content: str, type_code: str) -> List[dict]:
@@ -271,6 +895,13 @@ def _parse_sina_response(content: str, type_code: str) -> List[dict]:
                         })
     return items
 
+# 搜索结果条数上限
+SEARCH_RESULT_LIMIT = 15
+# 各上游单次返回条数上限（达到上限视为结果可能被截断，不用于前缀复用）
+SINA_SEARCH_PAGE = 10
+FUND_SEARCH_LIMIT = 5
+
+
 def _search_sina(query: str, type_code: str) -> List[dict]:
     """搜索新浪接口 (type_code: 11=A股, 31=港股, 41=美股)"""
     results = []
@@ -303,7 +934,7 @@ def _search_fund(query: str) -> List[dict]:
         if r.status_code == 200:
             data = r.json()
             if data.get('Datas'):
-                for fund in data['Datas'][:5]:
+                for fund in data['Datas'][:FUND_SEARCH_LIMIT]:
                     code = 'f_' + fund.get('CODE', '')
                     name = fund.get('NAME', '')
                     if code and name:
@@ -311,15 +942,28 @@ def _search_fund(query: str) -> List[dict]:
                             'code': code,
                             'name': name,
                             'type_name': '基金',
-                            'currency': 'CNY'
+                            'currency': 'CNY',
+                            'pinyin': fund.get('JP', '')
                         })
     except Exception as e:
         logger.warning(f"Fund search error: {e}")
     return results
 
+def _search_matches(item: dict, query: str) -> bool:
+    """结果是否匹配（更长的）查询词：代码 / 名称子串，或代码表中的拼音首字母"""
+    if query in item['code'].lower() or query in item['name'].lower():
+        return True
+    known = symbol_master.get(item['code'])
+    return bool(known and known.get('pinyin') and query in known['pinyin'])
+
+
 def search_stocks(query: str) -> list:
     """
-    搜索股票（支持A股、港股、美股、基金）- 并行搜索
+    搜索股票（支持A股、港股、美股、基金）
+
+    - 命中搜索结果缓存（SearchCache）直接返回；不含英文字母的更长查询从结果集完整的已缓存前缀中过滤
+    - 先查本地代码表（symbols.SymbolMaster），命中不少于 SYMBOL_SEARCH_MIN_HITS 条或代码 / 名称完全匹配时
+      直接返回；否则并行请求上游搜索接口，结果写回本地代码表
     
     Args:
         query: 搜索关键词
@@ -327,36 +971,71 @@ def search_stocks(query: str) -> list:
     Returns:
         搜索结果列表 [{'code': '...', 'name': '...', 'type_name': '...', 'currency': '...'}, ...]
     """
+    cached = search_cache.get(query)
+    if cached is not None:
+        return cached
+    normalized = search_cache.normalize(query)
+    prefix = search_cache.complete_prefix(query)
+    if prefix is not None:
+        filtered = [item for item in prefix[1] if _search_matches(item, normalized)]
+        if filtered:
+            search_cache.mark("prefix_hits")
+            search_cache.put(query, filtered, complete=True)
+            return filtered
+    search_cache.mark("misses")
+
+    local_results = symbol_master.search(query, SEARCH_RESULT_LIMIT)
+    # 完全匹配排在最前；输入完整代码 / 名称时通常只有 1 条结果，不再为凑够条数请求上游
+    if len(local_results) >= min(config.SYMBOL_SEARCH_MIN_HITS, SEARCH_RESULT_LIMIT) or \
+            (local_results and exact_match(local_results[0], normalized)):
+        _mark_metric("search_local")
+        # 本地代码表只收录见过的标的，结果不能代表上游的完整结果集
+        search_cache.put(query, local_results, complete=False)
+        return local_results
+    _mark_metric("search_network")
+
     results = []
     seen_codes = set()
+    truncated = False
     
-    # 并行执行搜索
-    with ThreadPoolExecutor(max_workers=4) as executor:
-        futures = []
-        # 1. A股
-        futures.append(executor.submit(_search_sina, query, '11'))
-        # 2. 港股
-        futures.append(executor.submit(_search_sina, query, '31'))
-        # 3. 美股
-        futures.append(executor.submit(_search_sina, query, '41'))
-        # 4. 基金
-        futures.append(executor.submit(_search_fund, query))
-        
-        for future in as_completed(futures):
-            try:
-                items = future.result()
-                for item in items:
-                    if item['code'] not in seen_codes:
-                        seen_codes.add(item['code'])
-                        results.append(item)
-            except Exception as e:
-                logger.error(f"Search task failed: {e}")
+    # 并行执行搜索（共享抓取线程池），(任务, 该上游单次返回上限)
+    futures = {}
+    # 1. A股
+    futures[fetch_executor.submit(_search_sina, query, '11')] = SINA_SEARCH_PAGE
+    # 2. 港股
+    futures[fetch_executor.submit(_search_sina, query, '31')] = SINA_SEARCH_PAGE
+    # 3. 美股
+    futures[fetch_executor.submit(_search_sina, query, '41')] = SINA_SEARCH_PAGE
+    # 4. 基金
+    futures[fetch_executor.submit(_search_fund, query)] = FUND_SEARCH_LIMIT
+
+    for future in as_completed(futures):
+        try:
+            items = future.result()
+            truncated = truncated or len(items) >= futures[future]
+            for item in items:
+                if item['code'] not in seen_codes:
+                    seen_codes.add(item['code'])
+                    results.append(item)
+        except Exception as e:
+            # 上游失败时结果不完整，不用于前缀复用
+            truncated = True
+            logger.error(f"Search task failed: {e}")
                 
-    final_results = []
     for item in results:
-        asset_type = infer_asset_type(item.get('code', ''), item.get('name', ''))
+        # 不等待 Nasdaq：美股使用已记录的分类，无记录时先按股票返回，后台确认
+        asset_type = infer_asset_type(item.get('code', ''), item.get('name', ''), wait=False)
         item['asset_type'] = asset_type
         item['type_name'] = asset_type_label(asset_type)
-        final_results.append(item)
+    if results:
+        symbol_master.add(results)
 
-    return final_results[:15]
+    final_results = list(local_results)
+    local_codes = {item['code'] for item in local_results}
+    for item in results:
+        if item['code'] not in local_codes:
+            item.pop('pinyin', None)
+            final_results.append(item)
+    final_results = final_results[:SEARCH_RESULT_LIMIT]
+    search_cache.put(query, final_results, complete=not truncated and len(final_results) < SEARCH_RESULT_LIMIT)
+    return final_results
@@ -0,0 +1,188 @@
+"""
+行情响应解析
+新浪（hq_str_xxx="a,b,c"）/ 腾讯（v_xxx="a~b~c"）格式：预编译正则一次遍历定位各代码的报文区间，
+按 (分隔符, 字段下标) 预编译的正则在原响应上定位字段，只切出需要的字段（不切分整条报文）
+"""
+import re
+from functools import lru_cache
+from typing import Dict, Iterator, List, Optional, Pattern, Sequence, Tuple
+
+from .utils import safe_float
+
+Quote = Tuple[float, float, float, float]
+
+_TENCENT_PAYLOAD_RE = re.compile(r'v_([A-Za-z0-9_.]+)="([^"]*)"')
+_SINA_PAYLOAD_RE = re.compile(r'hq_str_([A-Za-z0-9_.$]+)="([^"]*)"')
+
+
+def iter_tencent_payloads(text: str) -> Iterator[Tuple[str, int, int]]:
+    """遍历腾讯响应中的报文 -> (代码, 报文起点, 报文终点)"""
+    for match in _TENCENT_PAYLOAD_RE.finditer(text):
+        yield match.group(1), match.start(2), match.end(2)
+
+
+def iter_sina_payloads(text: str) -> Iterator[Tuple[str, int, int]]:
+    """遍历新浪响应中的报文 -> (代码, 报文起点, 报文终点)"""
+    for match in _SINA_PAYLOAD_RE.finditer(text):
+        yield match.group(1), match.start(2), match.end(2)
+
+
+@lru_cache(maxsize=64)
+def _field_pattern(sep: str, indices: Tuple[int, ...]) -> Pattern:
+    """跳过无关字段、只捕获指定下标字段的正则（按 (分隔符, 下标) 缓存）"""
+    field = '([^' + re.escape(sep) + ']*)'
+    skip = '[^' + re.escape(sep) + ']*' + re.escape(sep)
+    parts, pos = [], 0
+    for index in sorted(set(indices)):
+        if index > pos:
+            parts.append('(?:' + skip + '){' + str(index - pos) + '}')
+        parts.append(field)
+        pos = index
+        if index != max(indices):
+            parts.append(re.escape(sep))
+            pos += 1
+    return re.compile(''.join(parts))
+
+
+def pick_fields(text: str, start: int, end: int, sep: str, indices: Sequence[int]) -> List[Optional[str]]:
+    """
+    取报文 text[start:end] 按 sep 分隔后的指定下标字段
+
+    在原响应上按区间匹配，只切出需要的字段，不切分整条报文；
+    字段数不足时（少见）退回切分到最大下标为止
+
+    Returns:
+        与 indices 顺序一致的字段列表，报文字段数不足的下标为 None
+    """
+    key = tuple(indices)
+    ordered = sorted(set(key))
+    match = _field_pattern(sep, key).match(text, start, end)
+    if match is not None:
+        found = dict(zip(ordered, match.groups()))
+    else:
+        parts = text[start:end].split(sep, ordered[-1] + 1)
+        found = {i: parts[i] for i in ordered if i < len(parts)}
+    return [found.get(i) for i in key]
+
+
+def _quote(curr: float, yclose: float) -> Optional[Quote]:
+    if curr > 0 and yclose > 0:
+        return curr, yclose, curr - yclose, (curr - yclose) / yclose * 100
+    return None
+
+
+def parse_tencent(symbol: str, text: str, start: int, end: int) -> Optional[Quote]:
+    """
+    腾讯行情：指数 s_xxx（3 现价, 4 涨跌额）；港股 / A股（沪深京，3 现价, 4 昨收）
+    """
+    if 's_' in symbol:  # 指数
+        curr_s, change_s, guard = pick_fields(text, start, end, '~', (3, 4, 5))
+        if guard is None:
+            return None
+        curr = safe_float(curr_s)
+        change = safe_float(change_s)
+        if curr > 0:
+            yclose = curr - change
+            return curr, yclose, change, (change / yclose * 100) if yclose > 0 else 0.0
+    elif 'hk' in symbol or 'sh' in symbol or 'sz' in symbol or 'bj' in symbol:  # 港股 / A股
+        curr_s, yclose_s = pick_fields(text, start, end, '~', (3, 4))
+        if yclose_s is None:
+            return None
+        curr = safe_float(curr_s)
+        yclose = safe_float(yclose_s)
+        if curr > 0:
+            return curr, yclose, curr - yclose, (curr - yclose) / yclose * 100 if yclose > 0 else 0.0
+    return None
+
+
+def parse_tencent_index(text: str, start: int, end: int) -> Optional[Quote]:
+    """腾讯海外指数（us.IXIC / hkHSTECH）：3 现价, 4 昨收，现价缺失时取昨收"""
+    curr_s, yclose_s = pick_fields(text, start, end, '~', (3, 4))
+    if yclose_s is None:
+        return None
+    curr = safe_float(curr_s)
+    yclose = safe_float(yclose_s)
+    if curr <= 0:
+        curr = yclose
+    return _quote(curr, yclose)
+
+
+def parse_sina_us(text: str, start: int, end: int) -> Optional[Quote]:
+    """新浪美股 gb_xxx：1 现价, 21 盘后价（现价为 0 时使用）, 26 昨收"""
+    curr_s, after_s, yclose_s = pick_fields(text, start, end, ',', (1, 21, 26))
+    if yclose_s is None:
+        return None
+    curr = safe_float(curr_s)
+    yclose = safe_float(yclose_s)
+
+    if curr == 0:
+        curr = safe_float(after_s)  # 盘后价
+
+    if curr > 0:
+        if yclose <= 0:
+            yclose = curr
+        return curr, yclose, curr - yclose, (curr - yclose) / yclose * 100
+    return None
+
+
+def parse_sina_us_index(text: str, start: int, end: int) -> Optional[Quote]:
+    """新浪美股指数 gb_ixic：1 现价, 2 涨跌幅, 26 昨收；昨收缺失时由涨跌推算"""
+    curr_s, change_s, yclose_s = pick_fields(text, start, end, ',', (1, 2, 26))
+    if yclose_s is None:
+        return None
+    curr = safe_float(curr_s)
+    yclose = safe_float(yclose_s)
+    if curr <= 0:
+        curr = yclose
+    if yclose <= 0:
+        yclose = curr - safe_float(change_s)
+    return _quote(curr, yclose)
+
+
+def parse_sina_cn(symbol: str, text: str, start: int, end: int) -> Optional[Quote]:
+    """
+    新浪 A股 / 港股 / 指数：
+    指数 s_xxx（1 现价, 2 涨跌额）；港股 rt_hkxxx（3 昨收, 6 现价）；A股（2 昨收, 3 现价）
+    """
+    if 's_' in symbol:  # 指数
+        curr_s, change_s, guard = pick_fields(text, start, end, ',', (1, 2, 3))
+        if guard is None:
+            return None
+        curr = safe_float(curr_s)
+        yclose = curr - safe_float(change_s)
+    elif 'rt_hk' in symbol:  # 港股
+        yclose_s, curr_s = pick_fields(text, start, end, ',', (3, 6))
+        curr, yclose = safe_float(curr_s), safe_float(yclose_s)
+    else:  # A股
+        yclose_s, curr_s = pick_fields(text, start, end, ',', (2, 3))
+        curr, yclose = safe_float(curr_s), safe_float(yclose_s)
+    return _quote(curr, yclose)
+
+
+def find_payload(text: str, symbol: Optional[str] = None, tencent: bool = True) -> Optional[Tuple[int, int]]:
+    """单代码响应中指定代码（symbol 为 None 时取第一条）的报文区间"""
+    payloads = iter_tencent_payloads(text) if tencent else iter_sina_payloads(text)
+    for s, start, end in payloads:
+        if symbol is None or s == symbol:
+            return start, end
+    return None
+
+
+def parse_tencent_batch(text: str) -> Dict[str, Quote]:
+    """多代码腾讯响应一次遍历解析 -> {接口代码: 报价}（无效报价不返回）"""
+    out = {}
+    for symbol, start, end in iter_tencent_payloads(text):
+        quote = parse_tencent(symbol, text, start, end)
+        if quote:
+            out[symbol] = quote
+    return out
+
+
+def parse_sina_us_batch(text: str) -> Dict[str, Quote]:
+    """多代码新浪美股响应一次遍历解析 -> {接口代码: 报价}（无效报价不返回）"""
+    out = {}
+    for symbol, start, end in iter_sina_payloads(text):
+        quote = parse_sina_us(text, start, end)
+        if quote:
+            out[symbol] = quote
+    return out
@@ -0,0 +1,203 @@
+"""
+实时行情推送（Server-Sent Events）
+每个进程一个共享刷新循环：汇总所有连接订阅的代码，每个周期批量获取一次（走 PriceCache / 批量接口），
+只向订阅了变化代码的连接推送变化的报价；无变化时定期发送心跳
+"""
+import json
+import logging
+import threading
+import time
+from typing import Any, Dict, Iterator, List, Optional, Sequence
+
+import config
+from .background import BackgroundLoop
+from .codes import canonical_code
+from .price import batch_get_prices
+
+logger = logging.getLogger(__name__)
+
+Quote = Dict[str, Any]
+
+
+def _format_quote(price_data, freshness: str) -> Quote:
+    price, yclose, amt, chg = price_data
+    return {"price": price, "yclose": yclose, "amt": amt, "chg": chg, "freshness": freshness}
+
+
+def format_event(event: str, data: Any) -> str:
+    return f"event: {event}\ndata: {json.dumps(data, ensure_ascii=False, separators=(',', ':'))}\n\n"
+
+
+class Subscription:
+    """
+    一个 SSE 连接的订阅
+
+    codes: {规范代码: [客户端传入的写法, ...]}
+    刷新循环写入的变化在 pending 中合并（客户端读取慢时只保留每个代码的最新报价）
+    sent 记录已推送的报价，由连接线程（首次全量）与刷新循环共同读写，只在 diff() 中持锁访问
+    """
+
+    def __init__(self, codes: Dict[str, List[str]]):
+        self.codes = codes
+        self.sent: Dict[str, tuple] = {}
+        self.closed = False
+        self._lock = threading.Lock()
+        self._pending: Dict[str, Quote] = {}
+        self._event = threading.Event()
+
+    def diff(self, prices: Dict[str, tuple], flags: Dict[str, str]) -> Dict[str, Quote]:
+        """报价有变化（或首次获取）的代码，按客户端写法展开，并记为已推送"""
+        updates: Dict[str, Quote] = {}
+        with self._lock:
+            for code, raws in self.codes.items():
+                price_data = prices.get(code)
+                if not price_data or price_data[0] <= 0 or self.sent.get(code) == tuple(price_data):
+                    continue
+                self.sent[code] = tuple(price_data)
+                quote = _format_quote(price_data, flags.get(code, "fresh"))
+                for raw in raws:
+                    updates[raw] = quote
+        return updates
+
+    def push(self, updates: Dict[str, Quote]) -> None:
+        with self._lock:
+            self._pending.update(updates)
+        self._event.set()
+
+    def close(self) -> None:
+        self.closed = True
+        self._event.set()
+
+    def wait(self, timeout: float) -> Dict[str, Quote]:
+        """等待变化（最多 timeout 秒），返回并清空已合并的变化"""
+        self._event.wait(timeout)
+        with self._lock:
+            self._event.clear()
+            out, self._pending = self._pending, {}
+        return out
+
+
+class QuoteHub:
+    """
+    行情推送中心（每个进程一个实例）
+
+    - subscribe() 超过 max_connections 时返回 None（调用方返回 503）
+    - 首个订阅时启动刷新循环；没有订阅时循环空转，不请求上游
+    - 连接最长保持 max_seconds 秒，之后由客户端按 retry 重连（gthread 下释放线程）
+    """
+
+    def __init__(self, interval: float, max_connections: int, heartbeat_seconds: float,
+                 max_seconds: float, max_codes: int):
+        self.max_connections = max(0, int(max_connections))
+        self.heartbeat_seconds = max(1.0, float(heartbeat_seconds))
+        self.max_seconds = max(self.heartbeat_seconds, float(max_seconds))
+        self.max_codes = max(1, int(max_codes))
+        self.interval = max(1.0, float(interval))
+        self._loop = BackgroundLoop("kona-quote-stream", self.interval, self.run_once)
+        self._lock = threading.Lock()
+        self._subs: List[Subscription] = []
+        self._stats: Dict[str, Any] = {
+            "connections_total": 0,
+            "rejected": 0,
+            "cycles": 0,
+            "updates_sent": 0,
+            "last_cycle_codes": 0,
+            "last_cycle_ms": 0.0,
+        }
+
+    def _aliases(self, codes: Sequence[str]) -> Dict[str, List[str]]:
+        aliases: Dict[str, List[str]] = {}
+        for raw in codes:
+            raw = (raw or '').strip()
+            code = canonical_code(raw)
+            if code and (code in aliases or len(aliases) < self.max_codes):
+                if raw not in aliases.setdefault(code, []):
+                    aliases[code].append(raw)
+        return aliases
+
+    def subscribe(self, codes: Sequence[str]) -> Optional[Subscription]:
+        """注册订阅，连接数已满返回 None"""
+        sub = Subscription(self._aliases(codes))
+        with self._lock:
+            if len(self._subs) >= self.max_connections:
+                self._stats["rejected"] += 1
+                return None
+            self._subs.append(sub)
+            self._stats["connections_total"] += 1
+        self._loop.start()
+        return sub
+
+    def unsubscribe(self, sub: Subscription) -> None:
+        sub.close()
+        with self._lock:
+            if sub in self._subs:
+                self._subs.remove(sub)
+
+    def snapshot(self, sub: Subscription) -> Dict[str, Quote]:
+        """连接建立时的全量报价（之后只推送变化）"""
+        flags: Dict[str, str] = {}
+        prices = batch_get_prices(list(sub.codes), deadline=config.PRICES_BATCH_DEADLINE_SECONDS, freshness=flags)
+        return sub.diff(prices, flags)
+
+    def run_once(self) -> int:
+        """刷新一轮：所有订阅代码批量获取一次，向各连接推送变化，返回推送的连接数"""
+        with self._lock:
+            subs = list(self._subs)
+        if not subs:
+            return 0
+        start = time.monotonic()
+        codes = list(dict.fromkeys(code for sub in subs for code in sub.codes))
+        flags: Dict[str, str] = {}
+        prices = batch_get_prices(codes, deadline=self.interval, freshness=flags)
+
+        notified = 0
+        for sub in subs:
+            updates = sub.diff(prices, flags)
+            if updates:
+                sub.push(updates)
+                notified += 1
+        with self._lock:
+            self._stats["cycles"] += 1
+            self._stats["updates_sent"] += notified
+            self._stats["last_cycle_codes"] = len(codes)
+            self._stats["last_cycle_ms"] = round((time.monotonic() - start) * 1000, 1)
+        return notified
+
+    def events(self, sub: Subscription) -> Iterator[str]:
+        """SSE 事件流：全量报价 -> 变化推送 / 心跳，结束或客户端断开时注销订阅"""
+        try:
+            yield f"retry: {int(self.interval * 1000)}\n\n"
+            yield format_event("quotes", self.snapshot(sub))
+            deadline = time.monotonic() + self.max_seconds
+            while not sub.closed and time.monotonic() < deadline:
+                updates = sub.wait(self.heartbeat_seconds)
+                if sub.closed:
+                    break
+                yield format_event("quotes", updates) if updates else ": heartbeat\n\n"
+        finally:
+            self.unsubscribe(sub)
+
+    def stop(self) -> None:
+        self._loop.stop()
+        with self._lock:
+            subs, self._subs = self._subs, []
+        for sub in subs:
+            sub.close()
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            out = dict(self._stats)
+            out["connections"] = len(self._subs)
+            out["subscribed_codes"] = len({code for sub in self._subs for code in sub.codes})
+        out["max_connections"] = self.max_connections
+        out["running"] = self._loop.is_running()
+        return out
+
+
+quote_hub = QuoteHub(
+    interval=config.QUOTE_STREAM_INTERVAL,
+    max_connections=config.QUOTE_STREAM_MAX_CONNECTIONS,
+    heartbeat_seconds=config.QUOTE_STREAM_HEARTBEAT_SECONDS,
+    max_seconds=config.QUOTE_STREAM_MAX_SECONDS,
+    max_codes=config.QUOTE_STREAM_MAX_CODES,
+)
@@ -0,0 +1,123 @@
+"""
+行情数据源路由
+按 source_health 中各数据源近期成功率与延迟为每类资产排序数据源，熔断中的数据源直接跳过
+"""
+import threading
+import time
+from collections import Counter
+from typing import Any, Dict, List, Optional, Sequence, Tuple
+
+import config
+from .source_health import source_health as default_health
+
+
+class ProviderRouter:
+    """
+    数据源排序
+
+    - 预期耗时 = 平均延迟 + (1 - 近期成功率) × 失败惩罚（fail_penalty_ms，约等于一次超时）
+    - 样本数不足 min_samples 的数据源取默认顺序中排在它之前的数据源的最高得分，
+      不会越过默认顺序在前的数据源，冷启动时保持默认顺序
+    - 熔断中的数据源不参与排序（记入 skipped）
+    - 得分相同按默认顺序
+    - 排序结果按数据源列表缓存：健康统计无变化时一直复用，有变化时最多 cache_seconds 秒重算一次；
+      被跳过的数据源熔断到期时立即重算
+    """
+
+    def __init__(self, health=None, min_samples: int = 5, fail_penalty_ms: float = 3000.0, enabled: bool = True,
+                 cache_seconds: float = 1.0):
+        self._health = health or default_health
+        self.min_samples = max(1, min_samples)
+        self.fail_penalty_ms = max(0.0, fail_penalty_ms)
+        self.enabled = enabled
+        self.cache_seconds = max(0.0, float(cache_seconds))
+        self._lock = threading.Lock()
+        self._last: Dict[str, Dict[str, Any]] = {}
+        self._first_choice: Dict[str, Counter] = {}
+        # 数据源列表 -> (健康统计版本, 计算时间, 有效期上限, 排序, 跳过, 得分)
+        self._ranked: Dict[Tuple[str, ...], Tuple[int, float, float, List[str], List[str], Dict[str, float]]] = {}
+
+    def _score(self, info: Optional[Dict[str, Any]]) -> Optional[float]:
+        if not info or int(info.get("ok", 0)) + int(info.get("fail", 0)) < self.min_samples:
+            return None
+        success = float(info.get("success_rate_ewma", 1.0))
+        return float(info.get("latency_avg_ms", 0.0)) + (1.0 - success) * self.fail_penalty_ms
+
+    def order(self, asset_class: str, providers: Sequence[str]) -> List[str]:
+        """
+        返回本次请求应依次尝试的数据源
+
+        Args:
+            asset_class: 资产类别（用于统计，如 cn_stock / us_stock）
+            providers: 默认顺序的数据源名称（即 source_health 中的 source）
+        """
+        key = tuple(providers)
+        now = time.time()
+        version = self._health.version()
+        with self._lock:
+            cached = self._ranked.get(key)
+        if cached is not None and now < cached[2] and (cached[0] == version or now - cached[1] < self.cache_seconds):
+            chosen, skipped, scores = cached[3], cached[4], cached[5]
+        else:
+            chosen, skipped, scores, valid_until = self._rank(providers, now)
+            with self._lock:
+                self._ranked[key] = (version, now, valid_until, chosen, skipped, scores)
+
+        with self._lock:
+            self._last[asset_class] = {
+                "order": chosen,
+                "skipped": skipped,
+                "scores_ms": {name: round(score, 1) for name, score in scores.items()},
+                "at": time.time(),
+            }
+            if chosen:
+                self._first_choice.setdefault(asset_class, Counter())[chosen[0]] += 1
+        return list(chosen)
+
+    def _rank(self, providers: Sequence[str], now: float) -> Tuple[List[str], List[str], Dict[str, float], float]:
+        """按健康统计排序 -> (排序, 跳过, 得分, 结果有效期上限（最早的熔断到期时间）)"""
+        snapshot = self._health.snapshot()
+        available: List[str] = []
+        skipped: List[str] = []
+        valid_until = float("inf")
+        for name in providers:
+            info = snapshot.get(name) or {}
+            if info.get("circuit_open"):
+                skipped.append(name)
+                valid_until = min(valid_until, float(info.get("circuit_open_until", now)))
+            else:
+                available.append(name)
+
+        scores: Dict[str, float] = {}
+        if self.enabled:
+            ceiling = 0.0
+            for name in available:
+                score = self._score(snapshot.get(name))
+                scores[name] = ceiling if score is None else score
+                ceiling = max(ceiling, scores[name])
+            rank = {name: i for i, name in enumerate(available)}
+            chosen = sorted(available, key=lambda name: (scores[name], rank[name]))
+        else:
+            chosen = available
+        return chosen, skipped, scores, valid_until
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            return {
+                asset_class: dict(last, first_choice=dict(self._first_choice.get(asset_class, {})))
+                for asset_class, last in self._last.items()
+            }
+
+    def reset(self) -> None:
+        with self._lock:
+            self._last.clear()
+            self._first_choice.clear()
+            self._ranked.clear()
+
+
+provider_router = ProviderRouter(
+    min_samples=config.ROUTING_MIN_SAMPLES,
+    fail_penalty_ms=config.ROUTING_FAIL_PENALTY_MS,
+    enabled=config.ENABLE_PROVIDER_ROUTING,
+    cache_seconds=config.ROUTING_CACHE_SECONDS,
+)
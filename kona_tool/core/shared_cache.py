@@ -0,0 +1,182 @@
+"""
+跨进程共享行情缓存（L2）
+gunicorn 多个 worker 共享同一份行情缓存，任一 worker 获取的行情其他 worker 均可直接使用
+"""
+import logging
+import math
+import struct
+import threading
+import time
+from typing import Dict, Iterable, List, Optional, Tuple
+
+import config
+from .source_health import source_health
+
+logger = logging.getLogger(__name__)
+
+PriceData = Tuple[float, float, float, float]
+# (代码, 行情, 获取时间戳, 保留秒数)
+StoreEntry = Tuple[str, PriceData, float, float]
+
+# 紧凑编码：获取时间戳 + (价格, 昨收, 涨跌额, 涨跌幅%)，共 40 字节
+_ENTRY_STRUCT = struct.Struct("<d4d")
+
+REDIS_SOURCE = "redis_price_cache"
+
+
+def encode_entry(price_data: PriceData, fetched_at: float) -> bytes:
+    return _ENTRY_STRUCT.pack(fetched_at, *(float(v) for v in price_data[:4]))
+
+
+def decode_entry(raw: Optional[bytes]) -> Optional[Tuple[PriceData, float]]:
+    if not raw or len(raw) != _ENTRY_STRUCT.size:
+        return None
+    fetched_at, *values = _ENTRY_STRUCT.unpack(raw)
+    return tuple(values), fetched_at
+
+
+class InMemoryQuoteStore:
+    """
+    进程内 L2 实现（测试及未部署 Redis 时的替身），与 RedisQuoteStore 接口、编码一致
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._data: Dict[str, Tuple[bytes, float]] = {}
+
+    def get_many(self, codes: Iterable[str]) -> Dict[str, Tuple[PriceData, float]]:
+        now = time.time()
+        out: Dict[str, Tuple[PriceData, float]] = {}
+        with self._lock:
+            for code in codes:
+                item = self._data.get(code)
+                if item is None:
+                    continue
+                raw, expire_at = item
+                if now >= expire_at:
+                    del self._data[code]
+                    continue
+                entry = decode_entry(raw)
+                if entry is not None:
+                    out[code] = entry
+        return out
+
+    def set(self, code: str, price_data: PriceData, fetched_at: float, keep_seconds: float) -> None:
+        if keep_seconds <= 0:
+            return
+        with self._lock:
+            self._data[code] = (encode_entry(price_data, fetched_at), time.time() + keep_seconds)
+
+    def set_many(self, entries: Iterable[StoreEntry]) -> None:
+        for code, price_data, fetched_at, keep_seconds in entries:
+            self.set(code, price_data, fetched_at, keep_seconds)
+
+    def stats(self) -> Dict[str, object]:
+        with self._lock:
+            return {"backend": "memory", "size": len(self._data)}
+
+
+class RedisQuoteStore:
+    """
+    Redis L2 实现
+
+    - 每个代码一个 key（prefix + code），值为 40 字节紧凑编码，过期时间 = 回退窗口结束
+    - 批量读取使用一次 MGET，批量写入使用一次 pipeline（非事务）
+    - Redis 异常计入 source_health（redis_price_cache），连续失败后熔断，期间只使用 L1
+    """
+
+    def __init__(self, url: str, prefix: str = "kona:quote:", timeout: float = 0.2):
+        self.url = url
+        self.prefix = prefix
+        self.timeout = timeout
+        self._client = None
+        self._lock = threading.Lock()
+
+    def _get_client(self):
+        if self._client is None:
+            with self._lock:
+                if self._client is None:
+                    import redis
+                    self._client = redis.Redis.from_url(
+                        self.url,
+                        socket_timeout=self.timeout,
+                        socket_connect_timeout=self.timeout,
+                    )
+        return self._client
+
+    def _call(self, fn):
+        if not source_health.can_attempt(REDIS_SOURCE):
+            return None
+        start = time.monotonic()
+        try:
+            result = fn(self._get_client())
+        except Exception as e:
+            source_health.record(
+                source=REDIS_SOURCE,
+                success=False,
+                duration_ms=(time.monotonic() - start) * 1000,
+                timeout="timeout" in str(e).lower(),
+                error=str(e),
+            )
+            logger.warning(f"Shared quote cache error: {e}")
+            return None
+        source_health.record(source=REDIS_SOURCE, success=True, duration_ms=(time.monotonic() - start) * 1000)
+        return result
+
+    def get_many(self, codes: Iterable[str]) -> Dict[str, Tuple[PriceData, float]]:
+        codes = list(codes)
+        if not codes:
+            return {}
+        values = self._call(lambda client: client.mget([self.prefix + code for code in codes]))
+        out: Dict[str, Tuple[PriceData, float]] = {}
+        for code, raw in zip(codes, values or []):
+            entry = decode_entry(raw)
+            if entry is not None:
+                out[code] = entry
+        return out
+
+    def set(self, code: str, price_data: PriceData, fetched_at: float, keep_seconds: float) -> None:
+        if keep_seconds <= 0:
+            return
+        raw = encode_entry(price_data, fetched_at)
+        self._call(lambda client: client.set(self.prefix + code, raw, px=self._px(keep_seconds)))
+
+    def set_many(self, entries: Iterable[StoreEntry]) -> None:
+        items: List[Tuple[str, bytes, int]] = [
+            (self.prefix + code, encode_entry(price_data, fetched_at), self._px(keep_seconds))
+            for code, price_data, fetched_at, keep_seconds in entries
+            if keep_seconds > 0
+        ]
+        if not items:
+            return
+
+        def write(client):
+            pipe = client.pipeline(transaction=False)
+            for key, raw, px in items:
+                pipe.set(key, raw, px=px)
+            return pipe.execute()
+
+        self._call(write)
+
+    @staticmethod
+    def _px(keep_seconds: float) -> int:
+        return max(1, int(math.ceil(keep_seconds * 1000)))
+
+    def stats(self) -> Dict[str, object]:
+        return {"backend": "redis", "prefix": self.prefix}
+
+
+def build_quote_store(url: str):
+    """
+    根据 PRICE_CACHE_REDIS_URL 创建 L2；为空返回 None（仅使用进程内缓存），memory:// 使用进程内替身
+    """
+    url = (url or "").strip()
+    if not url:
+        return None
+    if url.startswith("memory://"):
+        return InMemoryQuoteStore()
+    return RedisQuoteStore(
+        url,
+        prefix=config.PRICE_CACHE_REDIS_PREFIX,
+        timeout=config.PRICE_CACHE_REDIS_TIMEOUT,
+    )
@@ -0,0 +1,112 @@
+"""
+请求合并（single-flight）
+同一 key 的并发请求只执行一次，其余调用方等待并共享同一结果
+"""
+import threading
+from collections import Counter
+from typing import Any, Callable, Dict, Optional, Tuple
+
+
+class Flight:
+    """一次进行中的请求"""
+
+    def __init__(self):
+        self.event = threading.Event()
+        self.result: Any = None
+        self.error: Optional[BaseException] = None
+        self.released = False
+        self.waiters = 0
+
+    def wait(self, timeout: Optional[float] = None) -> bool:
+        return self.event.wait(timeout)
+
+
+class SingleFlight:
+    """
+    按 key 合并并发请求
+
+    - claim(): 抢占 key，第一个调用方成为 leader，其余为等待方
+    - resolve(): leader 写入结果并唤醒所有等待方
+    - release(): leader 放弃本次请求（如批量接口未命中），等待方会重新抢占
+    - do(): claim + 执行 + resolve 的组合
+    """
+
+    _MAX_TRACKED_KEYS = 1000
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._flights: Dict[str, Flight] = {}
+        self._leaders = 0
+        self._shared = 0
+        self._shared_by_key: Counter = Counter()
+
+    def claim(self, key: str) -> Tuple[Flight, bool]:
+        """返回 (flight, 是否为 leader)"""
+        with self._lock:
+            flight = self._flights.get(key)
+            if flight is not None:
+                flight.waiters += 1
+                self._shared += 1
+                self._shared_by_key[key] += 1
+                if len(self._shared_by_key) > self._MAX_TRACKED_KEYS:
+                    self._shared_by_key = Counter(dict(self._shared_by_key.most_common(self._MAX_TRACKED_KEYS // 5)))
+                return flight, False
+            flight = Flight()
+            self._flights[key] = flight
+            self._leaders += 1
+            return flight, True
+
+    def _finish(self, key: str, flight: Flight) -> None:
+        with self._lock:
+            if self._flights.get(key) is flight:
+                del self._flights[key]
+        flight.event.set()
+
+    def resolve(self, key: str, flight: Flight, result: Any = None, error: Optional[BaseException] = None) -> None:
+        flight.result = result
+        flight.error = error
+        self._finish(key, flight)
+
+    def release(self, key: str, flight: Flight) -> None:
+        flight.released = True
+        self._finish(key, flight)
+
+    def in_flight(self, key: str) -> bool:
+        with self._lock:
+            return key in self._flights
+
+    def do(self, key: str, fn: Callable[[], Any]) -> Any:
+        """执行 fn，同一 key 的并发调用共享同一次执行结果"""
+        while True:
+            flight, leader = self.claim(key)
+            if leader:
+                try:
+                    result = fn()
+                except BaseException as e:
+                    self.resolve(key, flight, error=e)
+                    raise
+                self.resolve(key, flight, result=result)
+                return result
+
+            flight.wait()
+            if flight.released:
+                continue
+            if flight.error is not None:
+                raise flight.error
+            return flight.result
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            return {
+                "in_flight": len(self._flights),
+                "leaders": self._leaders,
+                "shared": self._shared,
+                "waiters": {key: f.waiters for key, f in self._flights.items() if f.waiters},
+                "top_shared": dict(self._shared_by_key.most_common(20)),
+            }
+
+    def reset(self) -> None:
+        with self._lock:
+            self._leaders = 0
+            self._shared = 0
+            self._shared_by_key.clear()
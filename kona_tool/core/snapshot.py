@@ -8,7 +8,9 @@ from datetime import datetime
 from typing import Dict
 
 from .db import db
-from .price import batch_get_prices, get_forex_rates
+from .forex import get_forex_rates_on
+from .price import batch_get_prices
+from .executor import fetch_executor
 
 logger = logging.getLogger(__name__)
 
@@ -37,9 +39,12 @@ def is_market_closed() -> bool:
     
     return False
 
-def calculate_portfolio_stats(user_id: str = None) -> Dict[str, float]:
+def calculate_portfolio_stats(user_id: str = None, date: str = None) -> Dict[str, float]:
     """
     计算当前时刻的投资组合统计数据
+
+    date 为快照日期（YYYY-MM-DD，默认当天），外币按该日期记录的汇率折算，
+    保证快照与汇率历史一致
     
     Returns:
         {
@@ -58,10 +63,12 @@ def calculate_portfolio_stats(user_id: str = None) -> Dict[str, float]:
     other_assets = db.get_other_assets(user_id=user_id)
     liabilities = db.get_liabilities(user_id=user_id)
     
-    # 2. 获取实时价格和汇率
+    # 2. 获取实时价格和汇率（汇率与行情并行获取）
+    # 结果会写入快照，不设时间预算：deadline 到期返回的过期 / 缺失价格会被当作当日数据保存
     codes = [p['code'] for p in portfolio]
+    rates_future = fetch_executor.submit(get_forex_rates_on, date or snapshot_date())
     prices = batch_get_prices(codes)
-    rates = get_forex_rates()
+    rates = rates_future.result()
     
     # 3. 计算投资资产 stats
     invest_mv = 0.0
@@ -128,6 +135,11 @@ def calculate_portfolio_stats(user_id: str = None) -> Dict[str, float]:
         'day_pnl': round(day_pnl, 2)
     }
 
+def snapshot_date() -> str:
+    """当前快照日期（YYYY-MM-DD），调用方取一次后同时用于估值汇率与快照写入"""
+    return datetime.now().strftime('%Y-%m-%d')
+
+
 def is_weekend() -> bool:
     """判断是否周末"""
     return datetime.now().weekday() >= 5
@@ -148,12 +160,14 @@ def take_snapshot(user_id: str = None) -> bool:
             user_ids = [None]
 
         success_any = False
+        # 同一轮快照使用同一日期（跨零点时估值汇率与写入日期一致）
+        date = snapshot_date()
         for uid in user_ids:
-            stats = calculate_portfolio_stats(uid)
+            stats = calculate_portfolio_stats(uid, date)
             if is_weekend():
                 logger.info("Weekend, setting day_pnl to 0")
                 stats['day_pnl'] = 0.0
-            success = db.save_daily_snapshot(stats, uid)
+            success = db.save_daily_snapshot(stats, uid, date)
             success_any = success_any or success
             if success:
                 logger.info(f"Snapshot saved successfully: user={uid}, Total={stats['total_asset']}, DayPnl={stats['day_pnl']}")
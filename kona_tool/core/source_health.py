@@ -5,18 +5,25 @@ from __future__ import annotations
 
 import threading
 import time
+from collections import deque
 from datetime import datetime, timezone
-from typing import Dict, Any
+from typing import Deque, Dict, Any, Optional
 
 import config
 
 
 class SourceHealth:
+    # 每个数据源保留最近 N 次成功请求的耗时，用于计算分位数
+    LATENCY_WINDOW = 100
+
     def __init__(self, fail_threshold: int = 3, cooldown_seconds: int = 30):
         self._fail_threshold = max(1, fail_threshold)
         self._cooldown_seconds = max(1, cooldown_seconds)
         self._lock = threading.Lock()
         self._stats: Dict[str, Dict[str, Any]] = {}
+        self._latencies: Dict[str, Deque[float]] = {}
+        # 每次 record / reset 加一，供 ProviderRouter 判断排序缓存是否需要重算
+        self._version = 0
 
     def _ensure(self, source: str) -> Dict[str, Any]:
         if source not in self._stats:
@@ -26,6 +33,7 @@ class SourceHealth:
                 "timeout": 0,
                 "consecutive_fail": 0,
                 "latency_avg_ms": 0.0,
+                "success_rate_ewma": 1.0,
                 "last_error": "",
                 "last_ok_at": "",
                 "last_fail_at": "",
@@ -48,6 +56,7 @@ class SourceHealth:
     ) -> None:
         now = datetime.now(timezone.utc).isoformat()
         with self._lock:
+            self._version += 1
             info = self._ensure(source)
             if success:
                 info["ok"] += 1
@@ -57,28 +66,46 @@ class SourceHealth:
                 old = float(info.get("latency_avg_ms", 0.0))
                 info["latency_avg_ms"] = duration_ms if old <= 0 else (old * 0.8 + duration_ms * 0.2)
                 info["circuit_open_until"] = 0.0
+                info["success_rate_ewma"] = info["success_rate_ewma"] * 0.8 + 0.2
+                self._latencies.setdefault(source, deque(maxlen=self.LATENCY_WINDOW)).append(duration_ms)
                 return
 
             info["fail"] += 1
             info["consecutive_fail"] += 1
             info["last_fail_at"] = now
             info["last_error"] = error[:160]
+            info["success_rate_ewma"] = info["success_rate_ewma"] * 0.8
             if timeout:
                 info["timeout"] += 1
             if info["consecutive_fail"] >= self._fail_threshold:
                 info["circuit_open_until"] = time.time() + self._cooldown_seconds
 
+    def latency_percentile(self, source: str, q: float = 0.9, min_samples: int = 1) -> Optional[float]:
+        """最近成功请求耗时的分位数（毫秒），样本不足返回 None"""
+        with self._lock:
+            samples = sorted(self._latencies.get(source, ()))
+        if len(samples) < max(1, min_samples):
+            return None
+        return samples[min(len(samples) - 1, int(q * len(samples)))]
+
+    def version(self) -> int:
+        return self._version
+
     def snapshot(self) -> Dict[str, Dict[str, Any]]:
         with self._lock:
             out: Dict[str, Dict[str, Any]] = {}
             for source, info in self._stats.items():
                 out[source] = dict(info)
                 out[source]["circuit_open"] = time.time() < float(info.get("circuit_open_until", 0.0))
+                samples = sorted(self._latencies.get(source, ()))
+                out[source]["latency_p90_ms"] = samples[min(len(samples) - 1, int(0.9 * len(samples)))] if samples else 0.0
             return out
 
     def reset(self) -> None:
         with self._lock:
             self._stats.clear()
+            self._latencies.clear()
+            self._version += 1
 
 
 source_health = SourceHealth(
@@ -6,10 +6,24 @@ import re
 import logging
 import requests
 from typing import Tuple, Optional
-from bs4 import BeautifulSoup
 
 import config
 from .utils import safe_float, retry_on_failure, get_first_valid_price, monitored_http_get
+from .codes import canonical_code
+from .html_extract import extract_ft_quote, iter_response_text
+from .quote_parser import (
+    find_payload,
+    parse_sina_cn,
+    parse_sina_us,
+    parse_sina_us_batch,
+    parse_sina_us_index,
+    parse_tencent,
+    parse_tencent_batch,
+    parse_tencent_index,
+)
+from .routing import provider_router
+from .hedging import hedger
+from .affinity import provider_affinity
 
 logger = logging.getLogger(__name__)
 
@@ -26,19 +40,11 @@ def get_nasdaq_price() -> Tuple[float, float, float, float]:
         url = config.API_ENDPOINTS["sina_stock"].format(code="gb_ixic")
         r = monitored_http_get("sina_us_index", url, headers=config.HEADERS, timeout=config.API_TIMEOUT)
         
-        if '="' in r.text:
-            data = r.text.split('="')[1].split(',')
-            if len(data) > 1:
-                curr = safe_float(data[1])
-                yclose = safe_float(data[26])
-                
-                if curr <= 0:
-                    curr = yclose
-                if yclose <= 0 and len(data) > 2:
-                    yclose = curr - safe_float(data[2])
-                
-                if curr > 0:
-                    return curr, yclose, curr - yclose, (curr - yclose) / yclose * 100
+        span = find_payload(r.text, tencent=False)
+        if span:
+            quote = parse_sina_us_index(r.text, *span)
+            if quote:
+                return quote
                     
     except Exception as e:
         logger.warning(f"Sina NASDAQ API error: {e}")
@@ -47,16 +53,11 @@ def get_nasdaq_price() -> Tuple[float, float, float, float]:
         url = "http://qt.gtimg.cn/q=us.IXIC"
         r = monitored_http_get("tencent_us_index", url, timeout=config.API_TIMEOUT)
         
-        if r.status_code == 200 and '="' in r.text:
-            data = r.text.split('="')[1].split('~')
-            if len(data) > 3:
-                curr = safe_float(data[3])
-                yclose = safe_float(data[4])
-                
-                if curr <= 0:
-                    curr = yclose
-                if curr > 0 and yclose > 0:
-                    return curr, yclose, curr - yclose, (curr - yclose) / yclose * 100
+        span = find_payload(r.text) if r.status_code == 200 else None
+        if span:
+            quote = parse_tencent_index(r.text, *span)
+            if quote:
+                return quote
                     
     except Exception as e:
         logger.warning(f"Tencent NASDAQ API error: {e}")
@@ -79,19 +80,15 @@ def get_ft_fund_price(isin: str) -> Tuple[float, float, float, float]:
         url = config.API_ENDPOINTS["ft_fund"].format(isin=isin.upper())
         headers = config.API_HEADERS["ft"]
         
-        r = monitored_http_get("ft_fund", url, headers=headers, timeout=config.API_TIMEOUT)
-        if r.status_code == 200:
-            soup = BeautifulSoup(r.text, 'html.parser')
-            price_tag = soup.find('span', class_='mod-tearsheet-overview__quote__value') or \
-                        soup.find('span', class_='mod-ui-data-list__value')
-            
-            if price_tag:
-                curr = safe_float(price_tag.text)
-                if curr > 0:
-                    chg_tag = soup.find('span', class_='mod-tearsheet-overview__quote__chg')
-                    chg = safe_float(chg_tag.text) if chg_tag else 0.0
-                    yclose = curr / (1 + chg/100) if (1 + chg/100) != 0 else curr
-                    return curr, yclose, curr - yclose, chg
+        r = monitored_http_get("ft_fund", url, headers=headers, timeout=config.API_TIMEOUT, stream=True)
+        try:
+            if r.status_code == 200:
+                # 增量扫描，价格与涨跌幅找到后即停止读取页面剩余部分
+                quote = extract_ft_quote(iter_response_text(r))
+                if quote:
+                    return quote
+        finally:
+            r.close()
                     
     except Exception as e:
         logger.warning(f"FT fund API error for {isin}: {e}")
@@ -99,10 +96,85 @@ def get_ft_fund_price(isin: str) -> Tuple[float, float, float, float]:
     return 0.0, 0.0, 0.0, 0.0
 
 
+def _sina_us_quote(s: str) -> Optional[Tuple[float, float, float, float]]:
+    url = config.API_ENDPOINTS["sina_stock"].format(code=f"gb_{s.lower()}")
+    r = monitored_http_get("sina_us_stock", url, headers=config.HEADERS, timeout=config.API_TIMEOUT)
+    span = find_payload(r.text, tencent=False)
+    return parse_sina_us(r.text, *span) if span else None
+
+
+def _eastmoney_us_quote(s: str) -> Optional[Tuple[float, float, float, float]]:
+    for secid in [f"105.{s}", f"106.{s}"]:
+        url = f"https://push2.eastmoney.com/api/qt/stock/get?invt=2&fltt=2&fields=f43,f60&secid={secid}"
+        r = monitored_http_get(
+            "eastmoney_us_stock",
+            url,
+            headers={'User-Agent': config.HEADERS['User-Agent']},
+            timeout=config.API_TIMEOUT,
+        )
+        data = r.json().get('data')
+
+        if data:
+            curr = safe_float(data.get('f43'))
+            yclose = safe_float(data.get('f60'))
+            if curr <= 0:
+                curr = yclose
+            if curr > 0:
+                return curr, yclose, curr - yclose, (curr - yclose) / yclose * 100
+    return None
+
+
+def _nasdaq_us_quote(s: str) -> Optional[Tuple[float, float, float, float]]:
+    # Nasdaq 备用接口（ETF/US Stocks）
+    for assetclass in ["etf", "stocks"]:
+        quote = _get_nasdaq_quote(s, assetclass)
+        if quote:
+            return quote
+    return None
+
+
+# 各资产类别的数据源（默认顺序），名称与 monitored_http_get 的 source 一致
+_US_STOCK_PROVIDERS = {
+    "sina_us_stock": _sina_us_quote,
+    "eastmoney_us_stock": _eastmoney_us_quote,
+    "nasdaq_quote": _nasdaq_us_quote,
+}
+
+
+def _route_quote(asset_class: str, providers: dict, symbol: str, code: str) -> Optional[Tuple[float, float, float, float]]:
+    """
+    按 provider_router 给出的顺序依次尝试数据源，返回第一个有效行情
+
+    代码有亲和数据源（上次返回有效行情的数据源）时优先尝试；
+    开启对冲（ENABLE_QUOTE_HEDGING）时前两个数据源以主/备对冲方式请求
+    """
+    order = provider_affinity.prefer(code, provider_router.order(asset_class, list(providers)))
+    if hedger.enabled and len(order) >= 2:
+        primary, secondary = order[0], order[1]
+        winner, quote = hedger.run_with_source(
+            (primary, lambda: providers[primary](symbol)),
+            (secondary, lambda: providers[secondary](symbol)),
+        )
+        if quote:
+            provider_affinity.record(code, winner)
+            return quote
+        order = order[2:]
+
+    for name in order:
+        try:
+            quote = providers[name](symbol)
+            if quote:
+                provider_affinity.record(code, name)
+                return quote
+        except Exception as e:
+            logger.warning(f"{name} quote error for {code}: {e}")
+    return None
+
+
 @retry_on_failure(max_retries=2, delay=0.5)
 def get_us_stock_price(code: str) -> Tuple[float, float, float, float]:
     """
-    获取美股价格
+    获取美股价格（新浪 / 东方财富 / Nasdaq，按数据源路由排序）
     
     Args:
         code: 美股代码（如 gb_bili）
@@ -111,59 +183,9 @@ def get_us_stock_price(code: str) -> Tuple[float, float, float, float]:
         (当前价格, 昨收, 涨跌额, 涨跌幅%)
     """
     s = code.upper().replace('GB_', '').replace('US.', '')
-    
-    try:
-        url = config.API_ENDPOINTS["sina_stock"].format(code=f"gb_{s.lower()}")
-        r = monitored_http_get("sina_us_stock", url, headers=config.HEADERS, timeout=config.API_TIMEOUT)
-        
-        if '="' in r.text:
-            data = r.text.split('="')[1].split(',')
-            curr = safe_float(data[1])
-            yclose = safe_float(data[26])
-            
-            if curr == 0:
-                curr = safe_float(data[21])  # 盘后价
-            
-            if curr > 0:
-                if yclose <= 0:
-                    yclose = curr
-                return curr, yclose, curr - yclose, (curr - yclose) / yclose * 100
-                
-    except Exception as e:
-        logger.warning(f"Sina US stock API error for {code}: {e}")
-    
-    try:
-        for secid in [f"105.{s}", f"106.{s}"]:
-            url = f"https://push2.eastmoney.com/api/qt/stock/get?invt=2&fltt=2&fields=f43,f60&secid={secid}"
-            r = monitored_http_get(
-                "eastmoney_us_stock",
-                url,
-                headers={'User-Agent': config.HEADERS['User-Agent']},
-                timeout=config.API_TIMEOUT,
-            )
-            data = r.json().get('data')
-            
-            if data:
-                curr = safe_float(data.get('f43'))
-                yclose = safe_float(data.get('f60'))
-                if curr <= 0:
-                    curr = yclose
-                if curr > 0:
-                    return curr, yclose, curr - yclose, (curr - yclose) / yclose * 100
-                    
-    except Exception as e:
-        logger.warning(f"Eastmoney US stock API error for {code}: {e}")
-
-    # Nasdaq 备用接口（ETF/US Stocks）
-    try:
-        for assetclass in ["etf", "stocks"]:
-            quote = _get_nasdaq_quote(s, assetclass)
-            if quote:
-                curr, yclose, amt, pct = quote
-                return curr, yclose, amt, pct
-    except Exception as e:
-        logger.warning(f"Nasdaq quote API error for {code}: {e}")
-
+    quote = _route_quote("us_stock", _US_STOCK_PROVIDERS, s, code)
+    if quote:
+        return quote
     return 0.0, 0.0, 0.0, 0.0
 
 
@@ -224,14 +246,11 @@ def get_hstech_price() -> Tuple[float, float, float, float]:
     """
     try:
         r = monitored_http_get("tencent_hstech", "http://qt.gtimg.cn/q=hkHSTECH", timeout=config.API_TIMEOUT)
-        if r.status_code == 200 and 'v_hkHSTECH=' in r.text:
-            data = r.text.split('="')[1].split('~')
-            curr = safe_float(data[3])
-            yclose = safe_float(data[4])
-            
-            if curr <= 0:
-                curr = yclose
-            return curr, yclose, curr - yclose, (curr - yclose) / yclose * 100
+        span = find_payload(r.text, "hkHSTECH") if r.status_code == 200 else None
+        if span:
+            quote = parse_tencent_index(r.text, *span)
+            if quote:
+                return quote
             
     except Exception as e:
         logger.warning(f"HSTECH API error: {e}")
@@ -239,9 +258,44 @@ def get_hstech_price() -> Tuple[float, float, float, float]:
     return 0.0, 0.0, 0.0, 0.0
 
 
+def _to_quote_symbol(code: str) -> str:
+    """
+    将证券代码转换为行情接口使用的代码（如 600519 -> sh600519, 430047 -> bj430047, 00700.HK -> hk00700）
+    """
+    s = code.lower()
+    if s.isdigit() and len(s) == 6:
+        s = canonical_code(s)
+    elif '.hk' in s:
+        s = 'hk' + s.replace('.hk', '')
+    elif not any(x in s for x in ['sh', 'sz', 'bj', 'hk', 'gb_', 's_', 'f_', 'of']):
+        s = 'gb_' + s
+    return s
+
+
+def _tencent_stock_quote(s: str) -> Optional[Tuple[float, float, float, float]]:
+    url = config.API_ENDPOINTS["tencent_stock"].format(code=s)
+    r = monitored_http_get("tencent_stock", url, timeout=config.API_TIMEOUT)
+    span = find_payload(r.text, s)
+    return parse_tencent(s, r.text, *span) if span else None
+
+
+def _sina_stock_quote(s: str) -> Optional[Tuple[float, float, float, float]]:
+    url = config.API_ENDPOINTS["sina_stock"].format(code=s)
+    r = monitored_http_get("sina_stock", url, headers=config.HEADERS, timeout=config.API_TIMEOUT)
+    span = find_payload(r.text, tencent=False)
+    return parse_sina_cn(s, r.text, *span) if span else None
+
+
+# A股 / 港股 / 指数数据源（默认腾讯优先）
+_CN_STOCK_PROVIDERS = {
+    "tencent_stock": _tencent_stock_quote,
+    "sina_stock": _sina_stock_quote,
+}
+
+
 def get_sina_stock_price(code: str) -> Tuple[float, float, float, float]:
     """
-    通过新浪接口获取股票价格（通用接口）
+    获取股票价格（通用接口，腾讯 / 新浪按数据源路由排序）
     
     Args:
         code: 证券代码
@@ -249,87 +303,15 @@ def get_sina_stock_price(code: str) -> Tuple[float, float, float, float]:
     Returns:
         (当前价格, 昨收, 涨跌额, 涨跌幅%)
     """
-    try:
-        s = code.lower()
-        
-        # 代码格式转换
-        if s.isdigit() and len(s) == 6:
-            s = ('sh' if s[0] in ['5', '6', '9'] else 'sz') + s
-        elif '.hk' in s:
-            s = 'hk' + s.replace('.hk', '')
-        elif not any(x in s for x in ['sh', 'sz', 'hk', 'gb_', 's_', 'f_', 'of']):
-            s = 'gb_' + s
-        
-        # 美股（包含 gb_ 前缀）- 直接调用美股专用函数
-        if 'gb_' in s:
-            return get_us_stock_price(s)
-        
-        # 对于指数、港股和A股，优先使用腾讯API
-        try:
-            url = config.API_ENDPOINTS["tencent_stock"].format(code=s)
-            r = monitored_http_get("tencent_stock", url, timeout=config.API_TIMEOUT)
-
-            if 'v_' + s + '=' in r.text:
-                data = r.text.split('=\"')[1].split(';')[0].split('~')
-
-                if 's_' in s:  # 指数
-                    if len(data) > 5:
-                        curr = safe_float(data[3])
-                        change = safe_float(data[4])  # 涨跌额
-                        if curr > 0:
-                            yclose = curr - change
-                            return curr, yclose, change, (change / yclose * 100) if yclose > 0 else 0.0
-                elif 'hk' in s:  # 港股
-                    if len(data) > 4:
-                        curr = safe_float(data[3])
-                        yclose = safe_float(data[4])
-                        if curr > 0:
-                            return curr, yclose, curr - yclose, (curr - yclose) / yclose * 100 if yclose > 0 else 0.0
-                elif 'sh' in s or 'sz' in s:  # A股
-                    if len(data) > 4:
-                        curr = safe_float(data[3])
-                        yclose = safe_float(data[4])
-                        if curr > 0:
-                            return curr, yclose, curr - yclose, (curr - yclose) / yclose * 100 if yclose > 0 else 0.0
-        except Exception as e:
-            logger.debug(f"Tencent API error for {code}: {e}")
-        
-        # 新浪API
-        url = config.API_ENDPOINTS["sina_stock"].format(code=s)
-        r = monitored_http_get("sina_stock", url, headers=config.HEADERS, timeout=config.API_TIMEOUT)
-        
-        if '="' in r.text:
-            match = re.search(r'="(.+)"', r.text)
-            if match:
-                data = match.group(1).split(',')
-            else:
-                return 0.0, 0.0, 0.0, 0.0
-            curr, yclose = 0.0, 0.0
-            
-            if 's_' in s:  # 指数
-                if len(data) > 3:
-                    curr = safe_float(data[1])
-                    yclose = curr - safe_float(data[2])
-            elif 'gb_' in s:  # 美股
-                yclose = safe_float(data[26])
-                curr = safe_float(data[1])
-                if curr == 0:
-                    curr = safe_float(data[21])
-                if curr == 0:
-                    curr = yclose
-            elif 'rt_hk' in s:  # 港股
-                curr = safe_float(data[6])
-                yclose = safe_float(data[3])
-            else:  # A股
-                curr = safe_float(data[3])
-                yclose = safe_float(data[2])
-            
-            if curr > 0 and yclose > 0:
-                return curr, yclose, curr - yclose, (curr - yclose) / yclose * 100
-                
-    except Exception as e:
-        logger.warning(f"Sina stock API error for {code}: {e}")
-    
+    s = _to_quote_symbol(code)
+
+    # 美股（包含 gb_ 前缀）- 直接调用美股专用函数
+    if 'gb_' in s:
+        return get_us_stock_price(s)
+
+    quote = _route_quote("cn_stock", _CN_STOCK_PROVIDERS, s, code)
+    if quote:
+        return quote
     return 0.0, 0.0, 0.0, 0.0
 
 
@@ -343,6 +325,7 @@ def get_stock_price(code: str) -> Tuple[float, float, float, float]:
     Returns:
         (当前价格, 昨收, 涨跌额, 涨跌幅%)
     """
+    code = canonical_code(code)
     logger.debug(f"Fetching stock price for {code}")
     
     # 特殊处理
@@ -366,3 +349,115 @@ def get_stock_price(code: str) -> Tuple[float, float, float, float]:
     
     # 通用接口
     return get_sina_stock_price(code)
+
+
+_TENCENT_BATCH_RE = re.compile(r'^(s_)?(sh|sz|bj|hk)[0-9a-z]+$')
+
+
+def _batch_provider(code: str) -> Optional[Tuple[str, str]]:
+    """
+    判断代码可走哪个批量接口
+
+    Returns:
+        (provider, 接口代码)，不支持批量时返回 None
+    """
+    c = code or ''
+    lower = c.lower()
+    if not c or lower.startswith(('f_', 'ft_')) or 'ixic' in lower or 'HSTECH' in c:
+        return None
+
+    if lower.startswith('gb_') or re.fullmatch(r'[A-Za-z\\.]+', c):
+        s = lower.replace('gb_', '').replace('us.', '')
+        return ('sina_us', f"gb_{s}") if s else None
+
+    s = _to_quote_symbol(c)
+    if _TENCENT_BATCH_RE.match(s):
+        return 'tencent', s
+    return None
+
+
+def _fetch_tencent_batch(symbols: list) -> dict:
+    """一次请求获取多只腾讯行情，返回 {接口代码: 报价}"""
+    url = config.API_ENDPOINTS["tencent_stock"].format(code=','.join(symbols))
+    r = monitored_http_get("tencent_stock", url, timeout=config.API_TIMEOUT)
+    if r.status_code != 200:
+        return {}
+    return parse_tencent_batch(r.text)
+
+
+def _fetch_sina_us_batch(symbols: list) -> dict:
+    """一次请求获取多只新浪美股行情，返回 {接口代码: 报价}"""
+    url = config.API_ENDPOINTS["sina_stock"].format(code=','.join(symbols))
+    r = monitored_http_get("sina_us_stock", url, headers=config.HEADERS, timeout=config.API_TIMEOUT)
+    if r.status_code != 200:
+        return {}
+    return parse_sina_us_batch(r.text)
+
+
+_BATCH_FETCHERS = {
+    'tencent': _fetch_tencent_batch,
+    'sina_us': _fetch_sina_us_batch,
+}
+
+
+def _group_batch(codes: list) -> dict:
+    """{provider: {接口代码: [原始代码, ...]}}，不支持批量的代码不出现在结果中"""
+    groups = {}
+    for code in codes:
+        target = _batch_provider(code)
+        if not target:
+            continue
+        provider, symbol = target
+        groups.setdefault(provider, {}).setdefault(symbol, []).append(code)
+    return groups
+
+
+def plan_batch_chunks(codes: list) -> list:
+    """
+    按数据源和 config.BATCH_QUOTE_CHUNK_SIZE 划分批量请求
+
+    每个分块传给 batch_get_stock_prices 时恰好发起一次请求，调用方可并发提交各分块；
+    不支持批量的代码不出现在结果中。
+
+    Returns:
+        [[原始代码, ...], ...]
+    """
+    chunks = []
+    chunk_size = max(1, config.BATCH_QUOTE_CHUNK_SIZE)
+    for symbol_map in _group_batch(codes).values():
+        symbols = list(symbol_map.keys())
+        for i in range(0, len(symbols), chunk_size):
+            chunks.append([code for symbol in symbols[i:i + chunk_size] for code in symbol_map[symbol]])
+    return chunks
+
+
+def batch_get_stock_prices(codes: list) -> dict:
+    """
+    按数据源分组批量获取股票价格（腾讯: 沪深京/港股/指数，新浪 gb_: 美股）
+
+    每个数据源按 config.BATCH_QUOTE_CHUNK_SIZE 拼接多个代码为一次请求。
+    批量接口未返回有效报价的代码不会出现在结果中，由调用方逐个回退。
+
+    Args:
+        codes: 证券代码列表
+
+    Returns:
+        {原始代码: (当前价格, 昨收, 涨跌额, 涨跌幅%)}
+    """
+    groups = _group_batch(codes)
+
+    results = {}
+    chunk_size = max(1, config.BATCH_QUOTE_CHUNK_SIZE)
+    for provider, symbol_map in groups.items():
+        symbols = list(symbol_map.keys())
+        for i in range(0, len(symbols), chunk_size):
+            chunk = symbols[i:i + chunk_size]
+            try:
+                quotes = _BATCH_FETCHERS[provider](chunk)
+            except Exception as e:
+                logger.warning(f"Batch quote error ({provider}, {len(chunk)} codes): {e}")
+                continue
+            for symbol, quote in quotes.items():
+                for code in symbol_map.get(symbol, []):
+                    results[code] = quote
+    return results
@@ -0,0 +1,420 @@
+"""
+本地代码表
+代码 / 名称 / 拼音首字母 / 市场 / 货币 / 资产类型，内存索引支持毫秒级前缀与子串搜索；
+数据来自定期全量刷新（A股、场外基金）与上游搜索结果，持久化在 symbol_master 表
+"""
+import bisect
+import json
+import logging
+import threading
+import time
+import unicodedata
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+
+import config
+from .asset_type import asset_classifier, asset_type_label
+from .background import BackgroundLoop
+from .market import MARKET_A, MARKET_FUND, MARKET_HK, MARKET_US, market_of
+from .utils import monitored_http_get
+
+logger = logging.getLogger(__name__)
+
+_MARKET_CURRENCY = {
+    MARKET_A: 'CNY',
+    MARKET_HK: 'HKD',
+    MARKET_US: 'USD',
+    MARKET_FUND: 'CNY',
+}
+
+SOURCE_BULK_A = "bulk_a"
+SOURCE_BULK_FUND = "bulk_fund"
+SOURCE_SEARCH = "search"
+
+# GB2312 一级汉字按拼音排序：各声母第一个汉字的编码（无 i / u / v 开头的拼音）
+_GB2312_INITIALS = (
+    (0xB0A1, 'a'), (0xB0C5, 'b'), (0xB2C1, 'c'), (0xB4EE, 'd'), (0xB6EA, 'e'), (0xB7A2, 'f'),
+    (0xB8C1, 'g'), (0xB9FE, 'h'), (0xBBF7, 'j'), (0xBFA6, 'k'), (0xC0AC, 'l'), (0xC2E8, 'm'),
+    (0xC4C3, 'n'), (0xC5B6, 'o'), (0xC5BE, 'p'), (0xC6DA, 'q'), (0xC8BB, 'r'), (0xC8F6, 's'),
+    (0xCBFA, 't'), (0xCDDA, 'w'), (0xCEF4, 'x'), (0xD1B9, 'y'), (0xD4D1, 'z'),
+)
+_GB2312_STARTS = [start for start, _ in _GB2312_INITIALS]
+_GB2312_LEVEL1_END = 0xD7FA
+# 证券名称中常见的多音字（GB2312 按另一读音排序）
+_POLYPHONE_INITIALS = {'行': 'h', '重': 'c', '藏': 'z'}
+
+
+def pinyin_initials(name: str) -> str:
+    """
+    名称 -> 拼音首字母（贵州茅台 -> gzmt，万科Ａ -> wka）
+
+    只覆盖 GB2312 一级汉字（常用字），其余汉字跳过；字母数字保留为小写
+    """
+    out = []
+    for ch in unicodedata.normalize('NFKC', name or ''):
+        if ch.isascii():
+            if ch.isalnum():
+                out.append(ch.lower())
+            continue
+        initial = _POLYPHONE_INITIALS.get(ch)
+        if initial is None:
+            try:
+                raw = ch.encode('gb2312')
+            except UnicodeEncodeError:
+                continue
+            value = int.from_bytes(raw, 'big') if len(raw) == 2 else 0
+            if not _GB2312_STARTS[0] <= value < _GB2312_LEVEL1_END:
+                continue
+            initial = _GB2312_INITIALS[bisect.bisect_right(_GB2312_STARTS, value) - 1][1]
+        out.append(initial)
+    return ''.join(out)
+
+
+def _bare_code(code: str) -> str:
+    """去掉市场前缀/后缀的代码（sh600519 -> 600519，f_000001 -> 000001，gb_aapl -> aapl）"""
+    c = code.lower()
+    for prefix in ('f_', 'ft_', 'gb_', 'sh', 'sz', 'bj', 'hk'):
+        if c.startswith(prefix) and len(c) > len(prefix):
+            c = c[len(prefix):]
+            break
+    if c.endswith('.hk'):
+        c = c[:-3]
+    return c
+
+
+def _search_keys(record: Dict[str, Any]) -> List[str]:
+    keys = {record['code'].lower(), _bare_code(record['code']), record['name'].lower()}
+    if record.get('pinyin'):
+        keys.add(record['pinyin'].lower())
+    return [k for k in keys if k]
+
+
+def _grams(text: str) -> set:
+    """子串索引使用的二元组"""
+    return {text[i:i + 2] for i in range(len(text) - 1)}
+
+
+def _record_grams(record: Dict[str, Any]) -> set:
+    return _grams(record['name'].lower()) | _grams(record.get('pinyin') or '')
+
+
+def _build_index(records: List[Dict[str, Any]]) -> Tuple[List[Tuple[str, str]], Dict[str, Dict[str, None]]]:
+    """
+    (前缀索引：排序的 (key, 代码)，子串索引：二元组 -> {代码: None})
+
+    倒排表用 dict 作有序集合：同一代码重复写入不会重复，遍历保持写入顺序
+    """
+    keys = sorted((key, record['code']) for record in records for key in _search_keys(record))
+    grams: Dict[str, Dict[str, None]] = {}
+    for record in records:
+        for gram in _record_grams(record):
+            grams.setdefault(gram, {})[record['code']] = None
+    return keys, grams
+
+
+def exact_match(item: Dict[str, Any], query: str) -> bool:
+    """搜索结果的代码（含去前缀代码）或名称与查询词完全一致"""
+    q = (query or '').strip().lower()
+    code = item.get('code') or ''
+    return bool(q) and q in (code.lower(), _bare_code(code), (item.get('name') or '').lower())
+
+
+class SymbolMaster:
+    """
+    代码表内存索引（key 为带前缀的完整代码，与搜索结果 / 持仓代码一致）
+
+    - 前缀匹配：代码、去前缀代码、名称、拼音首字母排序后二分查找
+    - 前缀结果不足时按名称 / 拼音子串补充：二元组倒排索引取候选代码再校验，不扫描全表
+    - 全量重建索引在锁外基于记录快照进行，完成后替换；少量写入在锁内增量更新
+      （更新记录时旧二元组的候选不删除，查询时校验排除）
+    - A股名称没有拼音时按名称生成拼音首字母（贵州茅台 -> gzmt）
+    - 首次使用时从数据库加载；refresh() 拉取 A股与场外基金全量表，间隔内不重复拉取
+    """
+
+    def __init__(self, refresh_interval: float = 86400, database=None):
+        self.refresh_interval = max(60.0, float(refresh_interval))
+        self._database = database
+        self._loop = BackgroundLoop("kona-symbol-refresh", 600, self.refresh_if_due)
+        self._lock = threading.RLock()
+        self._loaded = False
+        self._entries: Dict[str, Dict[str, Any]] = {}
+        self._keys: List[Tuple[str, str]] = []
+        self._grams: Dict[str, Dict[str, None]] = {}
+        # 记录每次变更加一，锁外重建期间有写入时重新构建
+        self._version = 0
+        self._stats: Dict[str, Any] = {
+            "searches": 0,
+            "refreshes": 0,
+            "refresh_errors": 0,
+            "last_refresh_at": 0.0,
+            "last_refresh_ms": 0.0,
+        }
+
+    def _db(self):
+        if self._database is not None:
+            return self._database
+        from .db import db
+        return db
+
+    def _ensure_loaded(self) -> None:
+        if self._loaded:
+            return
+        with self._lock:
+            if self._loaded:
+                return
+            self._loaded = True
+        rows = self._db().get_symbols()
+        for row in rows:
+            if not row.get('pinyin') and row.get('market') == MARKET_A:
+                row['pinyin'] = pinyin_initials(row['name'])
+        with self._lock:
+            for row in rows:
+                self._entries.setdefault(row['code'], row)
+            self._version += 1
+        self._rebuild()
+
+    def _rebuild(self) -> None:
+        """全量重建索引（锁外构建，构建期间记录有变化则基于新快照重来）"""
+        while True:
+            with self._lock:
+                version = self._version
+                records = list(self._entries.values())
+            keys, grams = _build_index(records)
+            with self._lock:
+                if version == self._version:
+                    self._keys, self._grams = keys, grams
+                    return
+
+    @staticmethod
+    def normalize(item: Dict[str, Any], source: str, now: Optional[float] = None) -> Optional[Dict[str, Any]]:
+        """搜索结果 / 全量表条目 -> 代码表记录（缺代码或名称返回 None）"""
+        code = (item.get('code') or '').strip()
+        name = (item.get('name') or '').strip()
+        if not code or not name:
+            return None
+        market = item.get('market') or market_of(code)
+        pinyin = (item.get('pinyin') or '').strip().lower()
+        if not pinyin and market == MARKET_A:
+            pinyin = pinyin_initials(name)
+        return {
+            'code': code,
+            'name': name,
+            'pinyin': pinyin,
+            'market': market,
+            'currency': item.get('currency') or _MARKET_CURRENCY.get(market, 'CNY'),
+            'asset_type': item.get('asset_type') or market,
+            'source': source,
+            'updated_at': time.time() if now is None else now,
+        }
+
+    def add(self, items: Iterable[Dict[str, Any]], source: str = SOURCE_SEARCH, persist: bool = True) -> int:
+        """写入代码表（内存索引 + 数据库），返回写入条数"""
+        self._ensure_loaded()
+        now = time.time()
+        records = [r for r in (self.normalize(item, source, now) for item in items) if r]
+        if not records:
+            return 0
+        with self._lock:
+            for record in records:
+                previous = self._entries.get(record['code'])
+                if previous is not None and not record['pinyin']:
+                    record['pinyin'] = previous.get('pinyin') or ''
+                if previous is not None and len(records) <= 100:
+                    for key in _search_keys(previous):
+                        index = bisect.bisect_left(self._keys, (key, previous['code']))
+                        if index < len(self._keys) and self._keys[index] == (key, previous['code']):
+                            del self._keys[index]
+                    for gram in _record_grams(previous) - _record_grams(record):
+                        self._grams.get(gram, {}).pop(previous['code'], None)
+                self._entries[record['code']] = record
+                if len(records) <= 100:
+                    for key in _search_keys(record):
+                        bisect.insort(self._keys, (key, record['code']))
+                    for gram in _record_grams(record):
+                        self._grams.setdefault(gram, {})[record['code']] = None
+            self._version += 1
+        if len(records) > 100:
+            self._rebuild()
+        if persist:
+            self._db().save_symbols(records)
+        return len(records)
+
+    def get(self, code: str) -> Optional[Dict[str, Any]]:
+        self._ensure_loaded()
+        with self._lock:
+            record = self._entries.get(code)
+            return dict(record) if record else None
+
+    @staticmethod
+    def _result(record: Dict[str, Any]) -> Dict[str, Any]:
+        asset_type = record['asset_type']
+        if record['market'] == MARKET_US:
+            # 美股 ETF / 股票以分类缓存为准（后台确认后可能已更新）
+            asset_type = asset_classifier.get(record['code']) or asset_type
+        return {
+            'code': record['code'],
+            'name': record['name'],
+            'type_name': asset_type_label(asset_type),
+            'currency': record['currency'],
+            'asset_type': asset_type,
+        }
+
+    def search(self, query: str, limit: int = 15) -> List[Dict[str, Any]]:
+        """
+        本地搜索：完全匹配 -> 前缀匹配 -> 名称 / 拼音子串匹配
+
+        Returns:
+            与 search_stocks 相同格式的结果列表
+        """
+        q = (query or '').strip().lower()
+        if not q or limit <= 0:
+            return []
+        self._ensure_loaded()
+        with self._lock:
+            self._stats["searches"] += 1
+            exact: List[str] = []
+            prefix: List[str] = []
+            seen = set()
+            index = bisect.bisect_left(self._keys, (q, ''))
+            while index < len(self._keys) and len(exact) + len(prefix) < limit * 4:
+                key, code = self._keys[index]
+                if not key.startswith(q):
+                    break
+                if code not in seen:
+                    seen.add(code)
+                    (exact if key == q else prefix).append(code)
+                index += 1
+            codes = exact + prefix
+            grams = _grams(q)
+            if len(codes) < limit and grams:
+                postings = [self._grams.get(gram) for gram in grams]
+                candidates = min(postings, key=len) if all(postings) else []
+                for code in candidates:
+                    record = self._entries.get(code)
+                    if code in seen or record is None:
+                        continue
+                    seen.add(code)
+                    if q in record['name'].lower() or (record.get('pinyin') and q in record['pinyin']):
+                        codes.append(code)
+                        if len(codes) >= limit:
+                            break
+            return [self._result(self._entries[code]) for code in codes[:limit]]
+
+    def _fetch_a_shares(self) -> List[Dict[str, Any]]:
+        """东方财富沪深京 A 股列表（分页）"""
+        items: List[Dict[str, Any]] = []
+        page, page_size = 1, 100
+        while page <= 100:
+            r = monitored_http_get(
+                "eastmoney_symbol_list",
+                config.API_ENDPOINTS["eastmoney_stock_list"],
+                params={
+                    'pn': page, 'pz': page_size, 'po': 1, 'np': 1, 'fltt': 2, 'invt': 2, 'fid': 'f12',
+                    'fs': 'm:0+t:6,m:0+t:80,m:1+t:2,m:1+t:23,m:0+t:81+s:2048',
+                    'fields': 'f12,f13,f14',
+                },
+                headers=config.HEADERS,
+                timeout=config.API_TIMEOUT,
+            )
+            if r.status_code != 200:
+                break
+            data = (r.json() or {}).get('data') or {}
+            rows = data.get('diff') or []
+            for row in rows:
+                code, name = str(row.get('f12') or ''), str(row.get('f14') or '')
+                if not code or not name:
+                    continue
+                if row.get('f13') == 1:
+                    prefix = 'sh'
+                elif code.startswith(('4', '8', '92')):
+                    prefix = 'bj'
+                else:
+                    prefix = 'sz'
+                items.append({'code': prefix + code, 'name': name, 'market': MARKET_A, 'asset_type': 'a'})
+            if not rows or page * page_size >= int(data.get('total') or 0):
+                break
+            page += 1
+        return items
+
+    def _fetch_funds(self) -> List[Dict[str, Any]]:
+        """天天基金全量基金列表：[["000001","HXCZHH","华夏成长混合","混合型-偏股","HUAXIA..."], ...]"""
+        r = monitored_http_get(
+            "eastmoney_symbol_list",
+            config.API_ENDPOINTS["eastmoney_fund_list"],
+            headers=config.HEADERS,
+            timeout=max(config.API_TIMEOUT, 10),
+        )
+        if r.status_code != 200:
+            return []
+        text = r.text
+        start, end = text.find('['), text.rfind(']')
+        if start < 0 or end <= start:
+            return []
+        items = []
+        for row in json.loads(text[start:end + 1]):
+            if len(row) >= 3 and row[0] and row[2]:
+                items.append({
+                    'code': 'f_' + row[0],
+                    'name': row[2],
+                    'pinyin': row[1],
+                    'market': MARKET_FUND,
+                    'asset_type': 'fund',
+                })
+        return items
+
+    def refresh(self, sources: Optional[List[str]] = None) -> int:
+        """拉取全量代码表（A股 + 场外基金），返回写入条数；单个来源失败不影响其它来源"""
+        fetchers = {SOURCE_BULK_A: self._fetch_a_shares, SOURCE_BULK_FUND: self._fetch_funds}
+        start = time.monotonic()
+        total = 0
+        for source in sources or list(fetchers):
+            try:
+                items = fetchers[source]()
+            except Exception as e:
+                logger.warning(f"Symbol list refresh failed ({source}): {e}")
+                with self._lock:
+                    self._stats["refresh_errors"] += 1
+                continue
+            total += self.add(items, source=source)
+        with self._lock:
+            self._stats["refreshes"] += 1
+            self._stats["last_refresh_at"] = time.time()
+            self._stats["last_refresh_ms"] = round((time.monotonic() - start) * 1000, 1)
+        logger.info(f"Symbol master refreshed: {total} entries")
+        return total
+
+    def refresh_if_due(self) -> int:
+        """距上次全量刷新（含其它进程写入的）超过 refresh_interval 的来源重新拉取"""
+        self._ensure_loaded()
+        now = time.time()
+        database = self._db()
+        due = [
+            source for source in (SOURCE_BULK_A, SOURCE_BULK_FUND)
+            if now - database.get_symbol_refresh_time(source) >= self.refresh_interval
+        ]
+        return self.refresh(due) if due else 0
+
+    def start(self) -> bool:
+        return self._loop.start()
+
+    def stop(self) -> None:
+        self._loop.stop()
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            out = dict(self._stats)
+            out["size"] = len(self._entries)
+        out["running"] = self._loop.is_running()
+        return out
+
+    def reset(self) -> None:
+        """清空内存索引（下次使用时重新从数据库加载）"""
+        with self._lock:
+            self._entries.clear()
+            self._keys = []
+            self._grams = {}
+            self._version += 1
+            self._loaded = False
+
+
+symbol_master = SymbolMaster(refresh_interval=config.SYMBOL_REFRESH_INTERVAL)
+
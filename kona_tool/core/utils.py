@@ -5,10 +5,15 @@
 import re
 import time
 import logging
-from typing import Optional, Dict, Any
+import threading
+from contextlib import contextmanager
+from typing import Optional, Dict, Any, Iterator
 from functools import wraps
 import requests
 from requests import Timeout, RequestException
+from requests.adapters import HTTPAdapter
+
+import config
 from .source_health import source_health
 
 logger = logging.getLogger(__name__)
@@ -149,6 +154,149 @@ def normalize_code(code: str) -> str:
     return code.strip().lower()
 
 
+class HttpSessionPool:
+    """
+    按数据源管理 requests.Session（连接池 + keep-alive）
+
+    - 每个数据源一个 Session，连接池大小与空闲超时见 config.HTTP_POOL_SOURCES
+    - 空闲超过 idle_timeout 的 Session 会被关闭并重建，避免复用已被服务端断开的连接
+    - 请求通过 lease() 租用 Session：租用中的 Session 不算空闲，不会被其他线程的回收关闭；
+      close_all() 时仍在租用的 Session 在归还时关闭
+    - 连接复用统计来自 urllib3 连接池：新建连接记为 miss，其余请求记为 hit
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._sessions: Dict[str, Dict[str, Any]] = {}
+        self._retired: Dict[str, Dict[str, int]] = {}
+
+    @staticmethod
+    def pool_config(source: str) -> Dict[str, Any]:
+        cfg = dict(config.HTTP_POOL_DEFAULT)
+        cfg.update(config.HTTP_POOL_SOURCES.get(source, {}))
+        return cfg
+
+    def _create(self, source: str) -> Dict[str, Any]:
+        cfg = self.pool_config(source)
+        session = requests.Session()
+        adapter = HTTPAdapter(
+            pool_connections=int(cfg["pool_connections"]),
+            pool_maxsize=int(cfg["pool_maxsize"]),
+            max_retries=0,
+        )
+        session.mount("http://", adapter)
+        session.mount("https://", adapter)
+        return {
+            "session": session,
+            "adapter": adapter,
+            "idle_timeout": float(cfg["idle_timeout"]),
+            "last_used": time.monotonic(),
+            "active": 0,
+            "closing": False,
+        }
+
+    @staticmethod
+    def _adapter_counts(adapter: HTTPAdapter) -> Dict[str, int]:
+        requests_total = 0
+        connections = 0
+        pools = adapter.poolmanager.pools
+        for key in list(pools.keys()):
+            try:
+                pool = pools[key]
+            except KeyError:
+                continue
+            requests_total += int(getattr(pool, "num_requests", 0))
+            connections += int(getattr(pool, "num_connections", 0))
+        return {"requests": requests_total, "connections": connections}
+
+    def _retire(self, source: str, entry: Dict[str, Any]) -> None:
+        counts = self._adapter_counts(entry["adapter"])
+        retired = self._retired.setdefault(source, {"requests": 0, "connections": 0, "recycled": 0})
+        retired["requests"] += counts["requests"]
+        retired["connections"] += counts["connections"]
+        retired["recycled"] += 1
+        if entry["active"]:
+            # 仍有请求在使用，归还时再关闭
+            entry["closing"] = True
+            return
+        self._close(source, entry)
+
+    @staticmethod
+    def _close(source: str, entry: Dict[str, Any]) -> None:
+        try:
+            entry["session"].close()
+        except Exception as e:
+            logger.debug(f"Failed to close HTTP session for {source}: {e}")
+
+    def _acquire(self, source: str, leased: bool) -> Dict[str, Any]:
+        now = time.monotonic()
+        with self._lock:
+            entry = self._sessions.get(source)
+            if entry and not entry["active"] and now - entry["last_used"] > entry["idle_timeout"]:
+                self._retire(source, entry)
+                entry = None
+            if entry is None:
+                entry = self._create(source)
+                self._sessions[source] = entry
+            entry["last_used"] = now
+            if leased:
+                entry["active"] += 1
+            return entry
+
+    def get(self, source: str) -> requests.Session:
+        """获取数据源对应的 Session（线程安全；不租用，发请求请使用 lease()）"""
+        return self._acquire(source, leased=False)["session"]
+
+    @contextmanager
+    def lease(self, source: str) -> Iterator[requests.Session]:
+        """租用数据源对应的 Session，租用期间不会被空闲回收关闭，归还时刷新最近使用时间"""
+        entry = self._acquire(source, leased=True)
+        try:
+            yield entry["session"]
+        finally:
+            with self._lock:
+                entry["active"] -= 1
+                entry["last_used"] = time.monotonic()
+                if entry["closing"] and not entry["active"]:
+                    self._close(source, entry)
+
+    def stats(self) -> Dict[str, Dict[str, Any]]:
+        """各数据源连接池命中统计"""
+        with self._lock:
+            sources = set(self._sessions) | set(self._retired)
+            out: Dict[str, Dict[str, Any]] = {}
+            for source in sources:
+                retired = self._retired.get(source, {})
+                requests_total = int(retired.get("requests", 0))
+                connections = int(retired.get("connections", 0))
+                entry = self._sessions.get(source)
+                if entry:
+                    counts = self._adapter_counts(entry["adapter"])
+                    requests_total += counts["requests"]
+                    connections += counts["connections"]
+                hits = max(0, requests_total - connections)
+                out[source] = {
+                    "pool_hits": hits,
+                    "pool_misses": connections,
+                    "pool_reuse_rate": round(hits / requests_total, 4) if requests_total else 0.0,
+                    "pool_recycled": int(retired.get("recycled", 0)),
+                }
+            return out
+
+    def close_all(self) -> None:
+        with self._lock:
+            for source, entry in list(self._sessions.items()):
+                self._retire(source, entry)
+            self._sessions.clear()
+
+
+http_sessions = HttpSessionPool()
+
+
+def get_http_pool_stats() -> Dict[str, Dict[str, Any]]:
+    return http_sessions.stats()
+
+
 def http_get(url: str, params: Optional[Dict[str, Any]] = None,
              headers: Optional[Dict[str, Any]] = None,
              timeout: float = 3, retries: int = 2, backoff: float = 0.3):
@@ -158,7 +306,8 @@ def http_get(url: str, params: Optional[Dict[str, Any]] = None,
     last_err = None
     for _ in range(retries):
         try:
-            return requests.get(url, params=params, headers=headers, timeout=timeout)
+            with http_sessions.lease("default") as session:
+                return session.get(url, params=params, headers=headers, timeout=timeout)
         except Exception as e:
             last_err = e
             time.sleep(backoff)
@@ -171,16 +320,21 @@ def monitored_http_get(
     params: Optional[Dict[str, Any]] = None,
     headers: Optional[Dict[str, Any]] = None,
     timeout: float = 3,
+    stream: bool = False,
 ):
     """
     带熔断与统计的 HTTP GET。
+
+    stream=True 时只等待响应头（耗时统计到响应头为止），响应体由调用方按需读取，
+    读完或提前停止后需调用 resp.close()。
     """
     if not source_health.can_attempt(source):
         raise RuntimeError(f"source circuit open: {source}")
 
     start = time.monotonic()
     try:
-        resp = requests.get(url, params=params, headers=headers, timeout=timeout)
+        with http_sessions.lease(source) as session:
+            resp = session.get(url, params=params, headers=headers, timeout=timeout, stream=stream)
         duration_ms = (time.monotonic() - start) * 1000
         ok = resp.status_code == 200
         source_health.record(
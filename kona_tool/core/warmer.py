@@ -0,0 +1,110 @@
+"""
+行情预热模块
+后台定时刷新所有用户持仓代码，在缓存过期前提前更新，使交互请求命中 PriceCache
+"""
+import logging
+import threading
+import time
+from typing import Any, Dict, List
+
+import config
+from .background import BackgroundLoop
+from .market import is_code_trading
+from .price import batch_get_prices, price_cache
+
+logger = logging.getLogger(__name__)
+
+
+class PriceWarmer:
+    """
+    持仓行情预热器
+
+    每个周期读取 portfolio 表中全部持仓代码：
+    - 所属市场休市的代码跳过（暂停预热）
+    - 缓存缺失或剩余有效期不足 lead_seconds 的代码批量刷新
+
+    刷新滞后（refresh lag）= 刷新时缓存已过期的时长，0 表示在过期前完成刷新。
+    """
+
+    def __init__(self, interval: float, lead_seconds: float):
+        self.lead_seconds = max(0.0, float(lead_seconds))
+        self._loop = BackgroundLoop("kona-price-warmer", interval, self.run_once)
+        self._lock = threading.Lock()
+        self._stats: Dict[str, Any] = {
+            "cycles": 0,
+            "refreshed": 0,
+            "last_cycle_at": 0.0,
+            "last_cycle_ms": 0.0,
+            "last_held": 0,
+            "last_due": 0,
+            "last_paused": 0,
+            "lag_last_max_ms": 0.0,
+            "lag_avg_ms": 0.0,
+            "late_refreshes": 0,
+        }
+
+    def _held_codes(self) -> List[str]:
+        from .db import db
+        return db.get_held_codes()
+
+    def run_once(self) -> int:
+        """执行一轮预热，返回刷新的代码数"""
+        start = time.monotonic()
+        now = time.time()
+        codes = self._held_codes()
+        # 其他 worker 已刷新（共享缓存 L2）的代码无需重复获取
+        price_cache.prefetch(codes)
+
+        due: List[str] = []
+        lags_ms: List[float] = []
+        paused = 0
+        for code in codes:
+            if not is_code_trading(code, now):
+                paused += 1
+                continue
+            remaining = price_cache.remaining(code)
+            if remaining is None:
+                due.append(code)
+            elif remaining <= self.lead_seconds:
+                due.append(code)
+                lags_ms.append(max(0.0, -remaining) * 1000)
+
+        if due:
+            batch_get_prices(due, use_cache=False)
+
+        with self._lock:
+            stats = self._stats
+            stats["cycles"] += 1
+            stats["refreshed"] += len(due)
+            stats["last_cycle_at"] = now
+            stats["last_cycle_ms"] = round((time.monotonic() - start) * 1000, 1)
+            stats["last_held"] = len(codes)
+            stats["last_due"] = len(due)
+            stats["last_paused"] = paused
+            stats["lag_last_max_ms"] = round(max(lags_ms), 1) if lags_ms else 0.0
+            for lag in lags_ms:
+                stats["lag_avg_ms"] = round(lag if stats["lag_avg_ms"] <= 0 else stats["lag_avg_ms"] * 0.8 + lag * 0.2, 1)
+                if lag > 0:
+                    stats["late_refreshes"] += 1
+
+        if due:
+            logger.debug(f"Price warmer refreshed {len(due)}/{len(codes)} codes ({paused} paused)")
+        return len(due)
+
+    def start(self) -> bool:
+        return self._loop.start()
+
+    def stop(self) -> None:
+        self._loop.stop()
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            out = dict(self._stats)
+        out["running"] = self._loop.is_running()
+        return out
+
+
+price_warmer = PriceWarmer(
+    interval=config.PRICE_WARMER_INTERVAL,
+    lead_seconds=config.PRICE_WARMER_LEAD_SECONDS,
+)
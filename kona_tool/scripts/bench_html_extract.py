@@ -0,0 +1,119 @@
+#!/usr/bin/env python3
+"""
+Micro-benchmark: FT / overseas fund page parsing, old path vs core.html_extract.
+
+Uses the saved pages in tests/fixtures. The old paths are reproduced here:
+- FT: BeautifulSoup(html, 'html.parser') + three find() calls
+- overseas: uncompiled re.search over the whole page, pattern by pattern
+The new path feeds the page in CHUNK_SIZE pieces (as iter_content would) and
+stops once the fields are found.
+
+Usage:
+  python scripts/bench_html_extract.py [--runs 50]
+"""
+import argparse
+import os
+import re
+import sys
+import time
+from pathlib import Path
+from typing import Callable, Tuple
+
+KONA_TOOL = Path(__file__).resolve().parents[1]
+if str(KONA_TOOL) not in sys.path:
+    sys.path.insert(0, str(KONA_TOOL))
+# 导入 core 会加载 config，基准测试不需要真实密钥
+os.environ.setdefault("JWT_SECRET", "bench_html_extract")
+
+from core.html_extract import CHUNK_SIZE, extract_ft_quote, extract_overseas_quote, ft_scanner, overseas_scanner, scan  # noqa: E402
+from core.utils import safe_float  # noqa: E402
+
+FIXTURES = KONA_TOOL / "tests" / "fixtures"
+
+
+def _chunks(html: str):
+    for i in range(0, len(html), CHUNK_SIZE):
+        yield html[i:i + CHUNK_SIZE]
+
+
+def old_ft(html: str):
+    from bs4 import BeautifulSoup
+
+    soup = BeautifulSoup(html, 'html.parser')
+    price_tag = soup.find('span', class_='mod-tearsheet-overview__quote__value') or \
+        soup.find('span', class_='mod-ui-data-list__value')
+    if not price_tag:
+        return None
+    curr = safe_float(price_tag.text)
+    chg_tag = soup.find('span', class_='mod-tearsheet-overview__quote__chg')
+    chg = safe_float(chg_tag.text) if chg_tag else 0.0
+    yclose = curr / (1 + chg / 100) if (1 + chg / 100) != 0 else curr
+    return curr, yclose, curr - yclose, chg
+
+
+def old_overseas(html: str):
+    patterns = [
+        r'fix_dwjz[^>]*>([\d.]+)',
+        r'class="dwjz"[^>]*>([\d.]+)',
+        r'>([\d.]+)元',
+        r'([\d.]+)\(([-\d.]+)，',
+        r'单位净值[^>]*>([\d.]+)',
+    ]
+    chg_patterns = [
+        r'\(([-\d.]+)，([-\d.]+)%\)',
+        r'fix_zzl[^>]*>([-\d.]+)%',
+        r'涨跌幅[^>]*>([-\d.]+)%',
+    ]
+    for pattern in patterns:
+        match = re.search(pattern, html)
+        if match:
+            curr = safe_float(match.group(1))
+            if curr > 0:
+                yclose, amt, chg = curr, 0.0, 0.0
+                for chg_pattern in chg_patterns:
+                    chg_match = re.search(chg_pattern, html)
+                    if chg_match:
+                        if len(chg_match.groups()) == 2:
+                            amt = safe_float(chg_match.group(1))
+                            chg = safe_float(chg_match.group(2))
+                        else:
+                            chg = safe_float(chg_match.group(1))
+                            amt = curr * chg / 100 if chg != 0 else 0
+                        yclose = curr - amt
+                        break
+                return curr, yclose, amt, chg
+    return None
+
+
+def _time(fn: Callable[[], object], runs: int) -> Tuple[float, object]:
+    result = fn()
+    start = time.perf_counter()
+    for _ in range(runs):
+        fn()
+    return (time.perf_counter() - start) / runs * 1000, result
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--runs", type=int, default=50)
+    args = parser.parse_args()
+
+    cases = [
+        ("ft_tearsheet.html", old_ft, extract_ft_quote, ft_scanner),
+        ("overseas_fund.html", old_overseas, extract_overseas_quote, overseas_scanner),
+    ]
+    for fixture, old_fn, new_fn, make_scanner in cases:
+        html = (FIXTURES / fixture).read_text(encoding="utf-8")
+        total_chunks = (len(html) + CHUNK_SIZE - 1) // CHUNK_SIZE
+        old_ms, old_result = _time(lambda: old_fn(html), args.runs)
+        new_ms, new_result = _time(lambda: new_fn(_chunks(html)), args.runs)
+        read_chunks = scan(_chunks(html), make_scanner()).chunks
+        print(f"{fixture} ({len(html) // 1024} KB)")
+        print(f"  old: {old_ms:8.3f} ms  {old_result}")
+        print(f"  new: {new_ms:8.3f} ms  {new_result}  read {read_chunks}/{total_chunks} chunks")
+        print(f"  speedup: {old_ms / new_ms:.1f}x  same result: {old_result == new_result}")
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
@@ -0,0 +1,102 @@
+#!/usr/bin/env python3
+"""
+Micro-benchmark: Sina / Tencent quote payload parsing, old split path vs core.quote_parser.
+
+Uses the sample responses in tests/fixtures. The old path is reproduced here:
+regex finditer over the response, then payload.split(sep) of every field before
+indexing. The new path locates only the needed fields inside the response.
+
+Usage:
+  python scripts/bench_quote_parser.py [--runs 2000]
+"""
+import argparse
+import os
+import sys
+import time
+from pathlib import Path
+from typing import Callable, Tuple
+
+KONA_TOOL = Path(__file__).resolve().parents[1]
+if str(KONA_TOOL) not in sys.path:
+    sys.path.insert(0, str(KONA_TOOL))
+# 导入 core 会加载 config，基准测试不需要真实密钥
+os.environ.setdefault("JWT_SECRET", "bench_quote_parser")
+
+from core.quote_parser import (  # noqa: E402
+    _SINA_PAYLOAD_RE,
+    _TENCENT_PAYLOAD_RE,
+    parse_sina_us_batch,
+    parse_tencent_batch,
+)
+from core.utils import safe_float  # noqa: E402
+
+FIXTURES = KONA_TOOL / "tests" / "fixtures"
+
+
+def old_tencent_batch(text: str):
+    out = {}
+    for match in _TENCENT_PAYLOAD_RE.finditer(text):
+        s, data = match.group(1), match.group(2).split('~')
+        quote = None
+        if 's_' in s:
+            if len(data) > 5:
+                curr, change = safe_float(data[3]), safe_float(data[4])
+                if curr > 0:
+                    yclose = curr - change
+                    quote = curr, yclose, change, (change / yclose * 100) if yclose > 0 else 0.0
+        elif 'hk' in s or 'sh' in s or 'sz' in s:
+            if len(data) > 4:
+                curr, yclose = safe_float(data[3]), safe_float(data[4])
+                if curr > 0:
+                    quote = curr, yclose, curr - yclose, (curr - yclose) / yclose * 100 if yclose > 0 else 0.0
+        if quote:
+            out[s] = quote
+    return out
+
+
+def old_sina_us_batch(text: str):
+    out = {}
+    for match in _SINA_PAYLOAD_RE.finditer(text):
+        s, data = match.group(1), match.group(2).split(',')
+        if len(data) <= 26:
+            continue
+        curr, yclose = safe_float(data[1]), safe_float(data[26])
+        if curr == 0:
+            curr = safe_float(data[21])
+        if curr > 0:
+            if yclose <= 0:
+                yclose = curr
+            out[s] = curr, yclose, curr - yclose, (curr - yclose) / yclose * 100
+    return out
+
+
+def _time(fn: Callable[[], object], runs: int) -> Tuple[float, object]:
+    result = fn()
+    start = time.perf_counter()
+    for _ in range(runs):
+        fn()
+    return (time.perf_counter() - start) / runs * 1e6, result
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--runs", type=int, default=2000)
+    args = parser.parse_args()
+
+    cases = [
+        ("tencent_quotes.txt", old_tencent_batch, parse_tencent_batch),
+        ("sina_quotes.txt", old_sina_us_batch, parse_sina_us_batch),
+    ]
+    for fixture, old_fn, new_fn in cases:
+        text = (FIXTURES / fixture).read_text(encoding="utf-8")
+        old_us, old_result = _time(lambda: old_fn(text), args.runs)
+        new_us, new_result = _time(lambda: new_fn(text), args.runs)
+        print(f"{fixture} ({len(text)} chars, {len(new_result)} quotes)")
+        print(f"  old: {old_us:8.2f} us")
+        print(f"  new: {new_us:8.2f} us")
+        print(f"  speedup: {old_us / new_us:.1f}x  same result: {old_result == new_result}")
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
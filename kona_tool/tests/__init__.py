@@ -1 +1,17 @@
 # Test package
+import tempfile
+import unittest
+from pathlib import Path
+
+
+class TempDatabaseTestCase(unittest.TestCase):
+    """每个测试使用独立的临时 SQLite 数据库（self.database，路径 self.db_path），测试结束后删除"""
+
+    def setUp(self):
+        super().setUp()
+        from core.db import DatabaseManager
+
+        tmp = tempfile.TemporaryDirectory()
+        self.addCleanup(tmp.cleanup)
+        self.db_path = str(Path(tmp.name) / "test.db")
+        self.database = DatabaseManager(self.db_path)
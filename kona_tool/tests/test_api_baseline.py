@@ -15,6 +15,7 @@ if str(KONA_TOOL) not in sys.path:
 _tmp_dir = tempfile.TemporaryDirectory()
 os.environ["KONA_DATABASE_PATH"] = str(Path(_tmp_dir.name) / "test.db")
 os.environ.setdefault("JWT_SECRET", "ci_test_jwt_secret")
+os.environ.setdefault("ENABLE_SYMBOL_REFRESH", "false")
 
 import app as app_module  # noqa: E402
 
@@ -47,6 +48,15 @@ class ApiBaselineTests(unittest.TestCase):
             self.assertEqual(resp.status_code, 200)
             self.assertEqual(resp.get_json().get('USD'), 7.0)
 
+    def test_rates_by_date(self):
+        with patch.object(app_module, 'get_forex_rates_on', return_value={'USD': 7.1}) as mock_on:
+            resp = self.client.get('/api/rates?date=2026-01-05')
+            self.assertEqual(resp.status_code, 200)
+            self.assertEqual(resp.get_json().get('USD'), 7.1)
+            mock_on.assert_called_once_with('2026-01-05')
+        resp = self.client.get('/api/rates?date=bad')
+        self.assertEqual(resp.status_code, 400)
+
     def test_price_mocked(self):
         with patch.object(app_module, 'get_price', return_value=(10, 9, 0, 0)):
             resp = self.client.get('/api/price?code=sh600000')
@@ -0,0 +1,116 @@
+import os
+import sys
+from pathlib import Path
+import sqlite3
+import time
+import unittest
+from unittest.mock import patch
+
+ROOT = Path(__file__).resolve().parents[2]
+KONA_TOOL = ROOT / "kona_tool"
+if str(KONA_TOOL) not in sys.path:
+    sys.path.insert(0, str(KONA_TOOL))
+os.environ.setdefault("JWT_SECRET", "ci_test_jwt_secret")
+
+from core import asset_type
+from core.asset_type import AssetClassifier, bulk_infer_asset_types, infer_asset_type
+from core.db import DatabaseManager
+from tests import TempDatabaseTestCase
+
+
+class _InlineExecutor:
+    def submit(self, fn, *args):
+        fn(*args)
+
+
+class TestAssetClassifier(TempDatabaseTestCase):
+    def setUp(self):
+        super().setUp()
+        self.classifier = self._make()
+
+    def _make(self):
+        return AssetClassifier(ttl_seconds=86400, executor=_InlineExecutor(), database=self.database)
+
+    def test_wait_checks_once_and_persists(self):
+        with patch.object(asset_type, 'get_us_asset_type', return_value='fund') as nasdaq:
+            self.assertEqual(self.classifier.classify('gb_qqq'), 'fund')
+            self.assertEqual(self.classifier.classify('QQQ'), 'fund')
+        nasdaq.assert_called_once_with('QQQ')
+
+        with patch.object(asset_type, 'get_us_asset_type') as nasdaq:
+            self.assertEqual(self._make().classify('us.QQQ'), 'fund')
+        nasdaq.assert_not_called()
+
+    def test_no_wait_returns_stock_and_checks_in_background(self):
+        with patch.object(asset_type, 'get_us_asset_type', return_value='fund') as nasdaq:
+            self.assertEqual(self.classifier.classify('gb_spy', wait=False), 'us')
+        nasdaq.assert_called_once_with('SPY')
+        self.assertEqual(self.classifier.get('gb_spy'), 'fund')
+
+    def test_stale_entry_returns_cached_and_refreshes(self):
+        self.database.save_asset_classification('AAPL', 'us', 'nasdaq', time.time() - 2 * 86400)
+        with patch.object(asset_type, 'get_us_asset_type', return_value='us') as nasdaq:
+            self.assertEqual(self.classifier.classify('gb_aapl'), 'us')
+        nasdaq.assert_called_once_with('AAPL')
+        self.assertGreater(self.database.get_asset_classifications()['AAPL'][2], time.time() - 60)
+
+    def test_unresolved_check_keeps_confirmed_type(self):
+        self.database.save_asset_classification('QQQ', 'fund', 'nasdaq', time.time() - 2 * 86400)
+        with patch.object(asset_type, 'get_us_asset_type', return_value=None):
+            self.assertEqual(self.classifier.check('QQQ'), 'fund')
+            self.assertEqual(self.classifier.check('ZZZZ'), 'us')
+        self.assertEqual(self.database.get_asset_classifications()['ZZZZ'][:2], ('us', 'default'))
+
+    def test_rules_do_not_consult_classifier(self):
+        with patch.object(asset_type, 'asset_classifier') as classifier:
+            self.assertEqual(infer_asset_type('f_000001'), 'fund')
+            self.assertEqual(infer_asset_type('00700.HK'), 'hk')
+            self.assertEqual(infer_asset_type('gb_arkk', '方舟创新ETF'), 'fund')
+            self.assertEqual(infer_asset_type('sh600519'), 'a')
+        classifier.classify.assert_not_called()
+
+    def test_bulk_backfill_uses_known_classifications(self):
+        with patch.object(asset_type, 'asset_classifier') as classifier:
+            self.assertEqual(
+                bulk_infer_asset_types([('gb_qqq', 'QQQ'), ('gb_msft', '微软'), ('sh600519', '贵州茅台')], {'QQQ': 'fund'}),
+                [('fund', 'gb_qqq'), ('us', 'gb_msft'), ('a', 'sh600519')],
+            )
+        classifier.queue.assert_called_once_with(['gb_msft'])
+
+        self.database.save_asset_classification('QQQ', 'fund', 'nasdaq', time.time())
+        conn = sqlite3.connect(self.db_path)
+        conn.executemany(
+            "INSERT INTO portfolio (code, name, qty, price, asset_type) VALUES (?, ?, 1, 1, '')",
+            [('gb_qqq', 'QQQ'), ('gb_msft', '微软'), ('f_000001', '华夏成长')],
+        )
+        conn.commit()
+        conn.close()
+
+        with patch.object(asset_type, 'get_us_asset_type') as nasdaq, \
+                patch.object(asset_type, 'asset_classifier', self.classifier):
+            DatabaseManager(self.db_path)
+        nasdaq.assert_not_called()
+        self.assertEqual(self.classifier.stats()['queued'], 1)
+
+        conn = sqlite3.connect(self.db_path)
+        types = dict(conn.execute("SELECT code, asset_type FROM portfolio").fetchall())
+        conn.close()
+        self.assertEqual(types, {'gb_qqq': 'fund', 'gb_msft': 'us', 'f_000001': 'fund'})
+
+    def test_queued_backfill_checks_after_start(self):
+        conn = sqlite3.connect(self.db_path)
+        conn.execute("INSERT INTO portfolio (code, name, qty, price, asset_type) VALUES ('gb_spy', 'SPY', 1, 1, 'us')")
+        conn.commit()
+        conn.close()
+
+        with patch.object(asset_type, 'get_us_asset_type', return_value='fund') as nasdaq:
+            self.assertEqual(self.classifier.queue(['gb_spy']), 0)
+            nasdaq.assert_not_called()
+            self.assertEqual(self.classifier.start(), 1)
+        nasdaq.assert_called_once_with('SPY')
+        self.assertEqual(self.classifier.get('gb_spy'), 'fund')
+        self.assertEqual(self.database.get_portfolio()[0]['asset_type'], 'fund')
+
+
+if __name__ == '__main__':
+    unittest.main()
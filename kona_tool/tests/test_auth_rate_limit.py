@@ -13,6 +13,7 @@ if str(KONA_TOOL) not in sys.path:
 _tmp_dir = tempfile.TemporaryDirectory()
 os.environ["KONA_DATABASE_PATH"] = str(Path(_tmp_dir.name) / "test_rate_limit.db")
 os.environ.setdefault("JWT_SECRET", "ci_test_jwt_secret")
+os.environ.setdefault("ENABLE_SYMBOL_REFRESH", "false")
 
 import app as app_module  # noqa: E402
 
@@ -0,0 +1,160 @@
+import os
+import sys
+import threading
+import time
+from pathlib import Path
+import unittest
+from unittest.mock import patch, MagicMock
+
+ROOT = Path(__file__).resolve().parents[2]
+KONA_TOOL = ROOT / "kona_tool"
+if str(KONA_TOOL) not in sys.path:
+    sys.path.insert(0, str(KONA_TOOL))
+os.environ.setdefault("JWT_SECRET", "ci_test_jwt_secret")
+
+import core.price as price
+import core.stock as stock
+
+
+TENCENT_PAYLOAD = (
+    'v_sh600519="1~贵州茅台~600519~1500.00~1480.00~1482.00~100~50~50";\n'
+    'v_hk00700="100~腾讯控股~00700~380.20~375.00~376.00~100";\n'
+    'v_s_sh000001="1~上证指数~000001~3000.00~15.00~0.50~100~200";\n'
+    'v_sz000002="1~万科A~000002~0.00~8.00~8.00";\n'
+)
+
+SINA_US_FIELDS = ["Apple"] + ["0"] * 26
+SINA_US_FIELDS[1] = "190.00"
+SINA_US_FIELDS[26] = "188.00"
+SINA_PAYLOAD = 'var hq_str_gb_aapl="%s";\nvar hq_str_gb_zzzz="";\n' % ",".join(SINA_US_FIELDS)
+
+
+def _resp(text):
+    r = MagicMock()
+    r.status_code = 200
+    r.text = text
+    return r
+
+
+class TestBatchStockPrices(unittest.TestCase):
+    def test_groups_by_provider_and_parses_combined_payload(self):
+        def fake_get(source, url, **kwargs):
+            return _resp(TENCENT_PAYLOAD if source == "tencent_stock" else SINA_PAYLOAD)
+
+        codes = ["sh600519", "00700.HK", "s_sh000001", "sz000002", "gb_aapl", "ZZZZ", "f_000001"]
+        with patch("core.stock.monitored_http_get", side_effect=fake_get) as mock_get:
+            res = stock.batch_get_stock_prices(codes)
+
+        # 一个腾讯请求 + 一个新浪请求
+        self.assertEqual(mock_get.call_count, 2)
+        self.assertEqual(res["sh600519"][0], 1500.0)
+        self.assertEqual(res["00700.HK"][1], 375.0)
+        self.assertAlmostEqual(res["s_sh000001"][1], 2985.0)
+        self.assertEqual(res["gb_aapl"][0], 190.0)
+        # 无效报价 / 不支持批量的代码交给调用方回退
+        self.assertNotIn("sz000002", res)
+        self.assertNotIn("ZZZZ", res)
+        self.assertNotIn("f_000001", res)
+
+    def test_chunks_large_batches(self):
+        codes = [f"sh6{i:05d}" for i in range(5)]
+        with patch.object(stock.config, "BATCH_QUOTE_CHUNK_SIZE", 2), \
+                patch("core.stock.monitored_http_get", return_value=_resp("")) as mock_get:
+            stock.batch_get_stock_prices(codes)
+        self.assertEqual(mock_get.call_count, 3)
+
+
+class TestPlanBatchChunks(unittest.TestCase):
+    def test_one_chunk_per_provider_request(self):
+        codes = ["sh600519", "00700.HK", "gb_aapl", "gb_msft", "f_000001"]
+        with patch.object(stock.config, "BATCH_QUOTE_CHUNK_SIZE", 1):
+            chunks = stock.plan_batch_chunks(codes)
+        self.assertCountEqual(chunks, [["sh600519"], ["00700.HK"], ["gb_aapl"], ["gb_msft"]])
+        with patch.object(stock.config, "BATCH_QUOTE_CHUNK_SIZE", 50):
+            chunks = stock.plan_batch_chunks(codes)
+        self.assertCountEqual(chunks, [["sh600519", "00700.HK"], ["gb_aapl", "gb_msft"]])
+
+
+class TestBatchGetPricesFallback(unittest.TestCase):
+    def setUp(self):
+        price.price_cache.clear()
+
+    def test_batch_misses_fall_back_to_per_code_fetch(self):
+        batched = {"sh600519": (1500.0, 1480.0, 20.0, 1.35)}
+        with patch("core.price.batch_get_stock_prices", return_value=batched), \
+                patch("core.price.get_price", return_value=(5, 4, 1, 0)) as mock_get:
+            res = price.batch_get_prices(["sh600519", "f_000001"])
+
+        mock_get.assert_called_once_with("f_000001", False)
+        self.assertEqual(res["sh600519"][0], 1500.0)
+        self.assertEqual(res["f_000001"][0], 5)
+        self.assertEqual(price.price_cache.get("sh600519")[0], 1500.0)
+
+
+class TestBatchGetPricesDeadline(unittest.TestCase):
+    def setUp(self):
+        price.price_cache.clear()
+
+    def test_deadline_returns_stale_and_late_fetch_fills_cache(self):
+        stale = (9.0, 8.8, 0.2, 2.27)
+        fresh = (10.0, 9.8, 0.2, 2.04)
+        price.price_cache.set("f_000001", stale)
+        done = threading.Event()
+
+        def slow_get(code, use_cache):
+            time.sleep(0.4)
+            price.price_cache.set(code, fresh)
+            done.set()
+            return fresh
+
+        flags = {}
+        started = time.monotonic()
+        with patch("core.price.batch_get_stock_prices", return_value={"sh600519": (1500.0, 1480.0, 20.0, 1.35)}), \
+                patch.object(price.price_cache, "get", return_value=None), \
+                patch("core.price.get_price", side_effect=slow_get):
+            res = price.batch_get_prices(["sh600519", "f_000001", "f_000002"], deadline=0.1, freshness=flags)
+            self.assertLess(time.monotonic() - started, 0.35)
+            self.assertTrue(done.wait(2))
+
+        self.assertEqual(res["f_000001"], stale)
+        self.assertEqual(res["f_000002"], (0.0, 0.0, 0.0, 0.0))
+        self.assertEqual(flags, {"sh600519": "fresh", "f_000001": "stale", "f_000002": "missing"})
+        self.assertEqual(price.price_cache.get("f_000001"), fresh)
+
+    def test_deadline_bounds_slow_batch_provider(self):
+        stale = (1490.0, 1480.0, 10.0, 0.68)
+        fresh = (1500.0, 1480.0, 20.0, 1.35)
+        price.price_cache.set("sh600519", stale)
+        done = threading.Event()
+
+        def slow_batch(codes):
+            time.sleep(0.4)
+            done.set()
+            return {"sh600519": fresh}
+
+        flags = {}
+        started = time.monotonic()
+        with patch("core.price.batch_get_stock_prices", side_effect=slow_batch), \
+                patch.object(price.price_cache, "get", return_value=None):
+            res = price.batch_get_prices(["sh600519"], deadline=0.1, freshness=flags)
+            self.assertLess(time.monotonic() - started, 0.35)
+            self.assertTrue(done.wait(2))
+            time.sleep(0.05)
+
+        self.assertEqual(res["sh600519"], stale)
+        self.assertEqual(flags["sh600519"], "stale")
+        # 未完成的批量请求在后台完成并写入缓存
+        self.assertEqual(price.price_cache.get("sh600519"), fresh)
+        self.assertFalse(price._price_flights.in_flight("sh600519"))
+
+    def test_no_deadline_waits_for_fetch(self):
+        flags = {}
+        with patch("core.price.batch_get_stock_prices", return_value={}), \
+                patch("core.price.get_price", side_effect=lambda code, use_cache: (time.sleep(0.2), (5, 4, 1, 0))[1]):
+            res = price.batch_get_prices(["f_000001"], freshness=flags)
+        self.assertEqual(res["f_000001"][0], 5)
+        self.assertEqual(flags["f_000001"], "fresh")
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,72 @@
+import os
+import sys
+from pathlib import Path
+import tempfile
+import time
+import unittest
+
+ROOT = Path(__file__).resolve().parents[2]
+KONA_TOOL = ROOT / "kona_tool"
+if str(KONA_TOOL) not in sys.path:
+    sys.path.insert(0, str(KONA_TOOL))
+os.environ.setdefault("JWT_SECRET", "ci_test_jwt_secret")
+
+from core.cache_snapshot import QuoteCacheSnapshot
+from core.price import PriceCache
+
+
+class TestQuoteCacheSnapshot(unittest.TestCase):
+    def setUp(self):
+        self._tmp = tempfile.TemporaryDirectory()
+        self.snapshot = QuoteCacheSnapshot(Path(self._tmp.name) / "quote_cache.db")
+
+    def tearDown(self):
+        self._tmp.cleanup()
+
+    def test_restart_keeps_original_timestamps(self):
+        before = PriceCache(ttl=60, stale_ttl=300)
+        before.set('sh600000', (10, 9, 1, 11.1))
+        before.set('gb_aapl', (200, 198, 2, 1.01))
+        before.cache['gb_aapl'] = ((200, 198, 2, 1.01), time.time() - 120)
+        fetched_at = before.cache['sh600000'][1]
+        self.assertEqual(self.snapshot.save(before), 2)
+
+        after = PriceCache(ttl=60, stale_ttl=300)
+        self.assertEqual(self.snapshot.load(after), 2)
+        self.assertEqual(after.get('sh600000'), (10, 9, 1, 11.1))
+        self.assertEqual(after.cache['sh600000'][1], fetched_at)
+        # 落盘前已过期的条目加载后仍为过期，只能作为回退值
+        self.assertIsNone(after.get('gb_aapl'))
+        self.assertEqual(after.get_stale('gb_aapl')[0], 200)
+
+    def test_entries_past_stale_window_are_not_loaded(self):
+        before = PriceCache(ttl=60, stale_ttl=300)
+        before.set('sh600000', (10, 9, 1, 11.1))
+        before.cache['sh600000'] = ((10, 9, 1, 11.1), time.time() - 200)
+        self.snapshot.save(before)
+
+        shorter = PriceCache(ttl=60, stale_ttl=120)
+        self.assertEqual(self.snapshot.load(shorter), 0)
+        self.assertNotIn('sh600000', shorter.cache)
+
+    def test_older_snapshot_does_not_overwrite_newer_row(self):
+        cache = PriceCache(ttl=60, stale_ttl=300)
+        cache.set('sh600000', (10, 9, 1, 11.1))
+        self.snapshot.save(cache)
+
+        stale_worker = PriceCache(ttl=60, stale_ttl=300)
+        stale_worker.set('sh600000', (8, 9, -1, -11.1))
+        stale_worker.cache['sh600000'] = ((8, 9, -1, -11.1), time.time() - 30)
+        self.snapshot.save(stale_worker)
+
+        restored = PriceCache(ttl=60, stale_ttl=300)
+        self.snapshot.load(restored)
+        self.assertEqual(restored.get('sh600000')[0], 10)
+
+    def test_missing_file_loads_nothing(self):
+        self.assertEqual(self.snapshot.load(PriceCache()), 0)
+        self.assertEqual(self.snapshot.stats()['errors'], 0)
+
+
+if __name__ == '__main__':
+    unittest.main()
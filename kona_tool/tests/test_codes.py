@@ -0,0 +1,159 @@
+import os
+import sqlite3
+import sys
+import tempfile
+from pathlib import Path
+import unittest
+from unittest.mock import MagicMock, patch
+
+ROOT = Path(__file__).resolve().parents[2]
+KONA_TOOL = ROOT / "kona_tool"
+if str(KONA_TOOL) not in sys.path:
+    sys.path.insert(0, str(KONA_TOOL))
+os.environ.setdefault("JWT_SECRET", "ci_test_jwt_secret")
+
+import core.price as price
+import core.stock as stock
+from core.codes import canonical_code, market_of, same_instrument
+from core.db import DatabaseManager
+from core.parser import parse_code
+
+
+class TestCanonicalCode(unittest.TestCase):
+    def test_aliases_map_to_one_code(self):
+        cases = {
+            "00700.HK": ["hk00700", "rt_hk00700", "HK00700", "700.hk", " 00700.HK "],
+            "sh600519": ["600519", "SH600519"],
+            "sz000001": ["000001"],
+            "bj430047": ["430047"],
+            "gb_aapl": ["AAPL", "aapl", "gb_AAPL", "us.AAPL"],
+            "gb_ixic": [".IXIC", "us.IXIC"],
+            "hkHSTECH": ["rt_hkHSTECH"],
+            "f_000001": ["F_000001"],
+        }
+        for canonical, aliases in cases.items():
+            self.assertEqual(canonical_code(canonical), canonical)
+            for alias in aliases:
+                with self.subTest(alias=alias):
+                    self.assertEqual(canonical_code(alias), canonical)
+
+    def test_unrecognized_and_ambiguous_codes(self):
+        self.assertEqual(canonical_code("HKD"), "gb_hkd")
+        self.assertEqual(canonical_code("s_sh000001"), "s_sh000001")
+        self.assertEqual(canonical_code("ft_LU0552385295"), "ft_LU0552385295")
+        self.assertEqual(canonical_code(""), "")
+        self.assertTrue(same_instrument("hk00700", "00700.HK"))
+        self.assertFalse(same_instrument("sh000001", "000001"))
+
+    def test_market_of_accepts_legacy_and_canonical_forms(self):
+        for code, market in {"hk00700": "hk", "00700.HK": "hk", "hkHSTECH": "hk", "600519": "a",
+                             "bj430047": "a", "AAPL": "us", "f_000001": "fund", "ft_LU0552385295": "fund",
+                             "s_sh000001": "other"}.items():
+            with self.subTest(code=code):
+                self.assertEqual(market_of(code), market)
+
+    def test_parse_code_uses_canonical_form(self):
+        self.assertEqual(parse_code("hk00700"), {"code": "00700.HK", "curr": "HKD"})
+        self.assertEqual(parse_code("600519"), {"code": "sh600519", "curr": "CNY"})
+        self.assertEqual(parse_code("AAPL"), {"code": "gb_aapl", "curr": "USD"})
+        self.assertEqual(parse_code("110011")["code"], "f_110011")
+
+
+class TestAliasDeduplication(unittest.TestCase):
+    def setUp(self):
+        price.price_cache.clear()
+
+    def test_batch_fetches_each_instrument_once(self):
+        quote = (380.0, 375.0, 5.0, 1.33)
+        with patch("core.price.batch_get_stock_prices", return_value={"00700.HK": quote}) as mock_batch:
+            flags = {}
+            res = price.batch_get_prices(["00700.HK", "hk00700", "rt_hk00700"], freshness=flags)
+        mock_batch.assert_called_once_with(["00700.HK"])
+        self.assertEqual(res, {"00700.HK": quote, "hk00700": quote, "rt_hk00700": quote})
+        self.assertEqual(set(flags.values()), {"fresh"})
+        with patch("core.price.get_stock_price") as mock_get:
+            self.assertEqual(price.get_price("HK700"), quote)
+        mock_get.assert_not_called()
+
+    def test_beijing_codes_fetch_end_to_end(self):
+        resp = MagicMock()
+        resp.status_code = 200
+        resp.text = 'v_bj430047="0~诺思兰德~430047~12.50~12.00~12.10~100";\n'
+        with patch.object(stock, "monitored_http_get", return_value=resp) as mock_get:
+            self.assertEqual(price.batch_get_prices(["430047"])["430047"][:2], (12.5, 12.0))
+            price.price_cache.clear()
+            self.assertEqual(price.get_price("bj430047", use_cache=False)[:2], (12.5, 12.0))
+        urls = [call.args[1] for call in mock_get.call_args_list]
+        self.assertTrue(urls)
+        self.assertTrue(all("bj430047" in url and "gb_" not in url for url in urls))
+
+    def test_db_merges_alias_holdings(self):
+        with tempfile.TemporaryDirectory() as tmp:
+            manager = DatabaseManager(Path(tmp) / "test.db")
+            asset = {"name": "腾讯控股", "qty": 100, "price": 300.0, "curr": "HKD", "asset_type": "hk"}
+            manager.add_asset(dict(asset, code="hk00700"), user_id="u1")
+            manager.add_asset(dict(asset, code="00700.HK", qty=200), user_id="u1")
+            portfolio = manager.get_portfolio(user_id="u1")
+            self.assertEqual([(p["code"], p["qty"]) for p in portfolio], [("00700.HK", 200.0)])
+            self.assertEqual(manager.get_held_codes(), ["00700.HK"])
+
+    def test_init_migrates_stored_codes(self):
+        with tempfile.TemporaryDirectory() as tmp:
+            path = Path(tmp) / "test.db"
+            DatabaseManager(path)
+            conn = sqlite3.connect(path)
+            conn.executemany(
+                "INSERT INTO portfolio (code, name, qty, price, curr, user_id) VALUES (?, ?, ?, ?, ?, ?)",
+                [
+                    ("700.HK", "腾讯控股", 100, 300.0, "HKD", "u1"),
+                    ("BRK.B", "Berkshire", 1, 400.0, "USD", "u1"),
+                    ("f_000001", "华夏成长", 10, 1.0, "CNY", "u1"),
+                    ("hk09988", "阿里巴巴", 10, 80.0, "HKD", "u2"),
+                    ("09988.HK", "阿里巴巴", 20, 80.0, "HKD", "u2"),
+                ],
+            )
+            conn.execute(
+                "INSERT INTO transactions (time, code, name, type, price, qty, amount, user_id) "
+                "VALUES ('2026-01-02', '700.HK', '腾讯控股', 'BUY', 300.0, 100, 30000.0, 'u1')"
+            )
+            conn.commit()
+            conn.close()
+
+            manager = DatabaseManager(path)
+            self.assertEqual(
+                sorted(p["code"] for p in manager.get_portfolio(user_id="u1")),
+                ["00700.HK", "f_000001", "gb_brk.b"],
+            )
+            # 同一用户已持有规范代码：旧行保留，由 add_asset 合并
+            self.assertEqual(sorted(p["code"] for p in manager.get_portfolio(user_id="u2")), ["09988.HK", "hk09988"])
+            conn = sqlite3.connect(path)
+            self.assertEqual(conn.execute("SELECT code FROM transactions").fetchall(), [("00700.HK",)])
+            conn.close()
+
+    def test_rank_after_migration_keeps_markets(self):
+        with tempfile.TemporaryDirectory() as tmp:
+            path = Path(tmp) / "test.db"
+            DatabaseManager(path)
+            conn = sqlite3.connect(path)
+            conn.executemany(
+                "INSERT INTO portfolio (code, name, qty, price, curr, user_id) VALUES (?, ?, ?, ?, ?, ?)",
+                [
+                    ("hk00700", "腾讯控股", 100, 300.0, "HKD", "u1"),
+                    ("600519", "贵州茅台", 10, 1500.0, "CNY", "u1"),
+                    ("AAPL", "Apple", 5, 200.0, "USD", "u1"),
+                ],
+            )
+            conn.commit()
+            conn.close()
+
+            manager = DatabaseManager(path)
+            hk = manager.get_rank_data(market="hk", user_id="u1")
+            self.assertEqual([row["code"] for row in hk], ["00700.HK"])
+            markets = {row["code"]: row["market"] for row in manager.get_rank_data(market="all", user_id="u1")}
+            # 纯数字代码不迁移，仍按规范代码归入 A股
+            self.assertEqual(markets, {"00700.HK": "hk", "600519": "a", "gb_aapl": "us"})
+            self.assertEqual([row["code"] for row in manager.get_rank_data(market="a", user_id="u1")], ["600519"])
+
+
+if __name__ == "__main__":
+    unittest.main()
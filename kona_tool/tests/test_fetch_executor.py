@@ -0,0 +1,58 @@
+import os
+import sys
+import threading
+from pathlib import Path
+import unittest
+
+ROOT = Path(__file__).resolve().parents[2]
+KONA_TOOL = ROOT / "kona_tool"
+if str(KONA_TOOL) not in sys.path:
+    sys.path.insert(0, str(KONA_TOOL))
+os.environ.setdefault("JWT_SECRET", "ci_test_jwt_secret")
+
+from core.executor import FetchExecutor
+
+
+class TestFetchExecutor(unittest.TestCase):
+    def test_submit_runs_on_shared_pool(self):
+        executor = FetchExecutor(max_workers=2, name="test-fetch")
+        try:
+            names = [executor.submit(lambda: threading.current_thread().name).result(timeout=5) for _ in range(3)]
+            self.assertTrue(all(n.startswith("test-fetch") for n in names))
+            stats = executor.stats()
+            self.assertEqual(stats["submitted"], 3)
+            self.assertEqual(stats["completed"], 3)
+            self.assertEqual(stats["queue_depth"], 0)
+            self.assertEqual(stats["max_workers"], 2)
+        finally:
+            executor.shutdown(wait=True)
+
+    def test_nested_submit_on_saturated_pool_runs_inline(self):
+        executor = FetchExecutor(max_workers=1, name="test-nested")
+
+        def outer():
+            # 唯一的 worker 正在执行 outer，嵌套任务必须同步执行而不是排队等待
+            return executor.submit(lambda: "inner").result(timeout=5)
+
+        try:
+            self.assertEqual(executor.submit(outer).result(timeout=5), "inner")
+            self.assertEqual(executor.stats()["inline"], 1)
+        finally:
+            executor.shutdown(wait=True)
+
+    def test_exception_propagates_through_future(self):
+        executor = FetchExecutor(max_workers=1, name="test-error")
+
+        def boom():
+            raise ValueError("boom")
+
+        try:
+            with self.assertRaises(ValueError):
+                executor.submit(boom).result(timeout=5)
+            self.assertEqual(executor.stats()["failed"], 1)
+        finally:
+            executor.shutdown(wait=True)
+
+
+if __name__ == "__main__":
+    unittest.main()
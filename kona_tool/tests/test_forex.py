@@ -0,0 +1,105 @@
+import os
+import sys
+from pathlib import Path
+import unittest
+from unittest.mock import MagicMock, patch
+
+ROOT = Path(__file__).resolve().parents[2]
+KONA_TOOL = ROOT / "kona_tool"
+if str(KONA_TOOL) not in sys.path:
+    sys.path.insert(0, str(KONA_TOOL))
+os.environ.setdefault("JWT_SECRET", "ci_test_jwt_secret")
+
+from core import forex, snapshot
+from tests import TempDatabaseTestCase
+from core.forex import ForexService
+
+SINA_BODY = (
+    'var hq_str_hf_USDCNY="7.1234,7.1000,0,0";\n'
+    'var hq_str_hf_HKDCNY="0.9123,0.9100,0,0";\n'
+    'var hq_str_hf_EURCNY="";\n'
+)
+
+
+def _resp(text, status=200):
+    resp = MagicMock()
+    resp.status_code = status
+    resp.text = text
+    return resp
+
+
+class TestForexService(TempDatabaseTestCase):
+    def setUp(self):
+        super().setUp()
+        self.service = self._make()
+
+    def _make(self):
+        return ForexService(currencies=["USD", "HKD", "EUR"], ttl=300, database=self.database)
+
+    def test_single_batched_request_and_ttl_cache(self):
+        with patch.object(forex, "monitored_http_get", return_value=_resp(SINA_BODY)) as mock_get:
+            first = self.service.rates()
+            second = self.service.rates()
+
+        self.assertEqual(mock_get.call_count, 1)
+        self.assertIn("hf_USDCNY,hf_HKDCNY,hf_EURCNY", mock_get.call_args[0][1])
+        self.assertEqual(first["USD"], 7.1234)
+        self.assertEqual(first["HKD"], 0.9123)
+        self.assertEqual(first["CNY"], 1.0)
+        self.assertEqual(second, first)
+        self.assertEqual(self.service.stats()["cache_hits"], 1)
+
+    def test_failure_falls_back_to_last_known_rate(self):
+        with patch.object(forex, "monitored_http_get", return_value=_resp(SINA_BODY)):
+            self.service.rates()
+
+        restarted = self._make()
+        with patch.object(forex, "monitored_http_get", side_effect=RuntimeError("source circuit open")):
+            rates = restarted.rates()
+
+        self.assertEqual(rates["USD"], 7.1234)
+        self.assertEqual(restarted.stats()["failures"], 1)
+
+    def test_history_by_date(self):
+        self.database.save_forex_rates("2026-01-05", {"USD": 7.0, "HKD": 0.9}, 0)
+        self.database.save_forex_rates("2026-01-07", {"USD": 7.2}, 0)
+
+        with patch.object(forex, "monitored_http_get", return_value=_resp(SINA_BODY)):
+            on_6th = self.service.rates_on("2026-01-06")
+            on_8th = self.service.rates_on("2026-01-08")
+
+        self.assertEqual(on_6th["USD"], 7.0)
+        self.assertEqual(on_8th["USD"], 7.2)
+        self.assertEqual(on_8th["HKD"], 0.9)
+
+
+class TestSnapshotRates(unittest.TestCase):
+    def test_stats_use_rates_of_snapshot_date(self):
+        holding = {'code': 'gb_aapl', 'qty': 10, 'price': 100.0, 'curr': 'USD', 'adjustment': 0}
+        with patch.object(snapshot, "db") as mock_db, \
+                patch.object(snapshot, "batch_get_prices", return_value={'gb_aapl': (110.0, 105.0, 5.0, 4.76)}), \
+                patch.object(snapshot, "get_forex_rates_on", return_value={'USD': 7.0, 'CNY': 1.0}) as rates_on:
+            mock_db.get_portfolio.return_value = [holding]
+            for getter in ("get_cash_assets", "get_other_assets", "get_liabilities"):
+                getattr(mock_db, getter).return_value = []
+            mock_db.get_today_realized_pnl.return_value = 0.0
+            stats = snapshot.calculate_portfolio_stats(date="2026-01-06")
+
+        rates_on.assert_called_once_with("2026-01-06")
+        self.assertEqual(stats['total_invest'], 7700.0)
+
+    def test_take_snapshot_values_and_saves_under_one_date(self):
+        with patch.object(snapshot, "db") as mock_db, \
+                patch.object(snapshot, "snapshot_date", return_value="2026-01-06"), \
+                patch.object(snapshot, "calculate_portfolio_stats", return_value={'total_asset': 1.0, 'day_pnl': 0.0}) as calc:
+            mock_db.get_user_ids.return_value = ["u1", "u2"]
+            mock_db.save_daily_snapshot.return_value = True
+            self.assertTrue(snapshot.take_snapshot())
+
+        self.assertEqual([c.args for c in calc.call_args_list], [("u1", "2026-01-06"), ("u2", "2026-01-06")])
+        self.assertEqual([c.args[1:] for c in mock_db.save_daily_snapshot.call_args_list],
+                         [("u1", "2026-01-06"), ("u2", "2026-01-06")])
+
+
+if __name__ == '__main__':
+    unittest.main()
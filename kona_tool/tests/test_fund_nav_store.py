@@ -0,0 +1,96 @@
+import os
+import sys
+from pathlib import Path
+from datetime import datetime
+import unittest
+from unittest.mock import patch
+
+ROOT = Path(__file__).resolve().parents[2]
+KONA_TOOL = ROOT / "kona_tool"
+if str(KONA_TOOL) not in sys.path:
+    sys.path.insert(0, str(KONA_TOOL))
+os.environ.setdefault("JWT_SECRET", "ci_test_jwt_secret")
+
+from core import fund
+from tests import TempDatabaseTestCase
+from core.market import MARKET_SESSIONS, MARKET_FUND
+from core.nav_store import FundNavStore
+
+
+def _cst(day, hour, minute=0):
+    tz = MARKET_SESSIONS[MARKET_FUND][0]
+    return datetime(2026, 10, day, hour, minute, tzinfo=tz).timestamp()
+
+
+class TestFundNavStore(TempDatabaseTestCase):
+    def setUp(self):
+        super().setUp()
+        self.store = self._make()
+
+    def _make(self):
+        return FundNavStore(poll_ttl=600, stale_poll_ttl=3600, database=self.database)
+
+    def _save(self, nav_date, fetched_at):
+        self.store.save_confirmed("000001", nav_date, 1.2, 1.1, 9.09, "eastmoney_fund_f10")
+        self.store._confirmed["000001"]["fetched_at"] = fetched_at
+
+    def test_confirmed_nav_kept_until_next_publication(self):
+        self._save("2026-10-14", _cst(14, 20))
+        # 周四盘中：最近应公布净值的交易日仍是周三
+        self.assertFalse(self.store.needs_poll("000001", _cst(15, 10)))
+        self.assertEqual(self.store.fresh_quote("000001", False, _cst(15, 10))[0], 1.2)
+
+    def test_polls_inside_window_at_poll_ttl(self):
+        self._save("2026-10-14", _cst(15, 18, 5))
+        self.assertFalse(self.store.needs_poll("000001", _cst(15, 18, 10)))
+        self.assertTrue(self.store.needs_poll("000001", _cst(15, 18, 20)))
+
+    def test_stale_nav_polled_slowly_outside_window(self):
+        self._save("2026-10-13", _cst(15, 23, 40))
+        self.assertFalse(self.store.needs_poll("000001", _cst(16, 0, 30)))
+        self.assertTrue(self.store.needs_poll("000001", _cst(16, 0, 41)))
+
+    def test_estimate_preferred_until_todays_nav_confirmed(self):
+        self._save("2026-10-14", _cst(14, 20))
+        self.assertIsNone(self.store.fresh_quote("000001", True, _cst(15, 10)))
+        self.assertIsNone(self.store.fresh_quote("000001", True, _cst(15, 16)))
+
+        self.store.save_estimate("000001", 1.25, 4.2, "2026-10-15 15:00", 1.21, "2026-10-15")
+        self.assertTrue(self.store.estimate_superseded("000001", _cst(15, 21)))
+
+        self._save("2026-10-15", _cst(15, 21))
+        self.assertFalse(self.store.estimate_superseded("000001", _cst(15, 21)))
+        self.assertEqual(self.store.fresh_quote("000001", True, _cst(15, 21))[0], 1.2)
+
+    def test_estimate_kept_separate_from_confirmed(self):
+        self._save("2026-10-14", _cst(14, 20))
+        self.store.save_estimate("000001", 1.25, 4.2, "2026-10-15 11:30", 1.2, "2026-10-14")
+
+        self.assertEqual(self.store.estimate("000001")["gsz"], 1.25)
+        self.assertEqual(self.store.confirmed("000001")["nav"], 1.2)
+
+    def test_confirmed_nav_persisted(self):
+        self.store.save_confirmed("000001", "2026-10-14", 1.2, 1.1, 9.09, "eastmoney_fund_f10")
+        restarted = self._make()
+        self.assertEqual(restarted.confirmed("000001")["nav_date"], "2026-10-14")
+
+
+class TestFundPriceUsesNavStore(unittest.TestCase):
+    def test_fresh_confirmed_nav_skips_network(self):
+        with patch.object(fund.fund_nav_store, "fresh_quote", return_value=(1.2, 1.1, 0.1, 9.09)), \
+                patch.object(fund, "get_fund_eastmoney_f10") as mock_f10:
+            self.assertEqual(fund.get_fund_price("968001"), (1.2, 1.1, 0.1, 9.09))
+        mock_f10.assert_not_called()
+
+    def test_superseded_estimate_skips_tiantian(self):
+        with patch.object(fund.fund_nav_store, "fresh_quote", return_value=None), \
+                patch.object(fund.fund_nav_store, "estimate_superseded", return_value=True), \
+                patch.object(fund.provider_affinity, "enabled", False), \
+                patch.object(fund, "get_fund_tiantian_price") as mock_tiantian, \
+                patch.object(fund, "get_fund_eastmoney_f10", return_value=(1.3, 1.2, 0.1, 8.3)):
+            self.assertEqual(fund.get_fund_price("f_000001")[0], 1.3)
+        mock_tiantian.assert_not_called()
+
+
+if __name__ == '__main__':
+    unittest.main()
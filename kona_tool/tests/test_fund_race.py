@@ -0,0 +1,96 @@
+import os
+import sys
+from pathlib import Path
+import threading
+import time
+import unittest
+from unittest.mock import patch
+
+ROOT = Path(__file__).resolve().parents[2]
+KONA_TOOL = ROOT / "kona_tool"
+if str(KONA_TOOL) not in sys.path:
+    sys.path.insert(0, str(KONA_TOOL))
+os.environ.setdefault("JWT_SECRET", "ci_test_jwt_secret")
+
+from core import fund
+
+
+class TestFundSourceRace(unittest.TestCase):
+    def setUp(self):
+        patcher = patch.object(fund.provider_affinity, "enabled", False)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def test_higher_priority_result_preferred(self):
+        def slow_tiantian():
+            time.sleep(0.1)
+            return (1.2, 1.1, 0.1, 9.1)
+
+        sources = [
+            ("tiantian_fund", slow_tiantian),
+            ("eastmoney_fund_f10", lambda: (1.0, 1.0, 0.0, 0.0)),
+        ]
+        self.assertEqual(fund._race_fund_sources("f_000001", sources, 2.0)[0], 1.2)
+        self.assertEqual(fund.get_fund_race_stats()["last"]["winner"], "tiantian_fund")
+
+    def test_races_when_called_from_saturated_shared_pool(self):
+        from core.executor import FetchExecutor
+        shared = FetchExecutor(max_workers=1, name="test-shared")
+        self.addCleanup(shared.shutdown, True)
+
+        def slow_source():
+            time.sleep(0.3)
+            return (1.2, 1.1, 0.1, 9.1)
+
+        sources = [("tiantian_fund", slow_source), ("eastmoney_fund_f10", slow_source)]
+
+        def nested():
+            start = time.monotonic()
+            fund._race_fund_sources("f_000001", sources, 2.0)
+            return time.monotonic() - start
+
+        # 两个数据源并发请求，耗时约为一次请求而非两次
+        self.assertLess(shared.submit(nested).result(timeout=3), 0.55)
+        self.assertEqual(shared.stats()["inline"], 0)
+
+    def test_failed_priority_source_falls_to_next(self):
+        sources = [
+            ("tiantian_fund", lambda: (0.0, 0.0, 0.0, 0.0)),
+            ("eastmoney_fund_f10", lambda: None),
+            ("eastmoney_fund_mobile", lambda: (1.5, 1.4, 0.1, 7.1)),
+        ]
+        self.assertEqual(fund._race_fund_sources("968001", sources, 2.0)[0], 1.5)
+
+    def test_deadline_takes_best_available(self):
+        release = threading.Event()
+
+        def hung():
+            release.wait(2)
+            return (9.9, 9.9, 0.0, 0.0)
+
+        sources = [
+            ("tiantian_fund", hung),
+            ("eastmoney_fund_f10", lambda: (1.0, 1.0, 0.0, 0.0)),
+        ]
+        start = time.monotonic()
+        quote = fund._race_fund_sources("f_000001", sources, 0.2)
+        elapsed = time.monotonic() - start
+        release.set()
+
+        self.assertEqual(quote[0], 1.0)
+        self.assertLess(elapsed, 1.0)
+        stats = fund.get_fund_race_stats()
+        self.assertEqual(stats["last"]["winner"], "eastmoney_fund_f10")
+        self.assertGreaterEqual(stats["deadline_hits"], 1)
+
+    def test_get_fund_price_uses_race_when_enabled(self):
+        with patch.object(fund.config, "ENABLE_FUND_SOURCE_RACE", True), \
+                patch.object(fund.provider_affinity, "enabled", False), \
+                patch.object(fund, "get_fund_tiantian_price", return_value=(0.0, 0.0, 0.0, 0.0)), \
+                patch.object(fund, "get_fund_eastmoney_f10", return_value=(2.0, 1.9, 0.1, 5.3)), \
+                patch.object(fund, "get_fund_eastmoney_mobile", return_value=(0.0, 0.0, 0.0, 0.0)):
+            self.assertEqual(fund.get_fund_price("f_000001"), (2.0, 1.9, 0.1, 5.3))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,139 @@
+import os
+import sys
+from pathlib import Path
+import threading
+import time
+import unittest
+from unittest.mock import patch
+
+ROOT = Path(__file__).resolve().parents[2]
+KONA_TOOL = ROOT / "kona_tool"
+if str(KONA_TOOL) not in sys.path:
+    sys.path.insert(0, str(KONA_TOOL))
+os.environ.setdefault("JWT_SECRET", "ci_test_jwt_secret")
+
+from core import fund
+from core.executor import FetchExecutor
+from core.hedging import Hedger
+from core.source_health import SourceHealth
+
+
+class TestHedger(unittest.TestCase):
+    def setUp(self):
+        self.executor = FetchExecutor(max_workers=4, name="test-hedge")
+        self.health = SourceHealth()
+        self.hedger = Hedger(
+            executor=self.executor,
+            health=self.health,
+            enabled=True,
+            default_delay_ms=50,
+            min_delay_ms=10,
+            max_delay_ms=500,
+            min_samples=3,
+        )
+
+    def tearDown(self):
+        self.executor.shutdown(wait=True)
+
+    def test_fast_primary_does_not_hedge(self):
+        secondary_called = threading.Event()
+        result = self.hedger.run(
+            ("tencent_stock", lambda: (10.0, 9.0, 1.0, 11.1)),
+            ("sina_stock", lambda: secondary_called.set() or (11.0, 9.0, 2.0, 22.2)),
+        )
+
+        self.assertEqual(result[0], 10.0)
+        self.assertFalse(secondary_called.is_set())
+        stats = self.hedger.stats()["tencent_stock>sina_stock"]
+        self.assertEqual(stats["primary_wins"], 1)
+        self.assertEqual(stats["hedge_rate"], 0.0)
+
+    def test_hedges_when_called_from_saturated_shared_pool(self):
+        shared = FetchExecutor(max_workers=1, name="test-shared")
+        self.addCleanup(shared.shutdown, True)
+        release = threading.Event()
+
+        def slow_primary():
+            release.wait(2)
+            return (10.0, 9.0, 1.0, 11.1)
+
+        def nested():
+            start = time.monotonic()
+            result = self.hedger.run(("tencent_stock", slow_primary), ("sina_stock", lambda: (11.0, 9.0, 2.0, 22.2)))
+            return result, time.monotonic() - start
+
+        result, elapsed = shared.submit(nested).result(timeout=3)
+        release.set()
+        self.assertEqual(result[0], 11.0)
+        self.assertLess(elapsed, 1.0)
+        self.assertEqual(shared.stats()["inline"], 0)
+
+    def test_default_executor_is_separate_pool(self):
+        from core.executor import fetch_executor, race_executor
+        self.assertIs(Hedger()._executor, race_executor)
+        self.assertIsNot(race_executor, fetch_executor)
+
+    def test_slow_primary_loses_to_secondary(self):
+        release = threading.Event()
+
+        def slow_primary():
+            release.wait(2)
+            return (10.0, 9.0, 1.0, 11.1)
+
+        start = time.monotonic()
+        result = self.hedger.run(
+            ("tencent_stock", slow_primary),
+            ("sina_stock", lambda: (11.0, 9.0, 2.0, 22.2)),
+        )
+        elapsed = time.monotonic() - start
+        release.set()
+
+        self.assertEqual(result[0], 11.0)
+        self.assertLess(elapsed, 1.0)
+        stats = self.hedger.stats()["tencent_stock>sina_stock"]
+        self.assertEqual(stats["hedged"], 1)
+        self.assertEqual(stats["secondary_wins"], 1)
+        self.assertEqual(stats["hedge_rate"], 1.0)
+
+    def test_invalid_hedged_result_waits_for_other(self):
+        def slow_primary():
+            time.sleep(0.15)
+            return (10.0, 9.0, 1.0, 11.1)
+
+        result = self.hedger.run(
+            ("tencent_stock", slow_primary),
+            ("sina_stock", lambda: None),
+        )
+
+        self.assertEqual(result[0], 10.0)
+        self.assertEqual(self.hedger.stats()["tencent_stock>sina_stock"]["primary_wins"], 1)
+
+    def test_primary_error_fails_over(self):
+        def broken():
+            raise RuntimeError("boom")
+
+        result = self.hedger.run(("a", broken), ("b", lambda: (1.0, 1.0, 0.0, 0.0)))
+        self.assertEqual(result[0], 1.0)
+        self.assertEqual(self.hedger.stats()["a>b"]["failover"], 1)
+
+    def test_delay_uses_primary_p90(self):
+        for ms in (100, 120, 140, 400):
+            self.health.record("tencent_stock", success=True, duration_ms=ms)
+        self.assertEqual(self.hedger.hedge_delay_ms("tencent_stock"), 400)
+        self.assertEqual(self.hedger.hedge_delay_ms("sina_stock"), 50)
+
+
+class TestFundHedging(unittest.TestCase):
+    def test_fund_price_hedges_first_two_sources(self):
+        with patch.object(fund.hedger, "enabled", True), \
+                patch.object(fund.provider_affinity, "enabled", False), \
+                patch.object(fund.hedger, "run_with_source", return_value=(None, None)) as mock_run, \
+                patch.object(fund, "get_fund_eastmoney_mobile", return_value=(1.5, 1.4, 0.1, 7.1)):
+            self.assertEqual(fund.get_fund_price("f_000001"), (1.5, 1.4, 0.1, 7.1))
+
+        primary, secondary = mock_run.call_args[0][:2]
+        self.assertEqual((primary[0], secondary[0]), ("tiantian_fund", "eastmoney_fund_f10"))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,119 @@
+import os
+import sys
+from pathlib import Path
+import unittest
+from unittest.mock import MagicMock, patch
+
+ROOT = Path(__file__).resolve().parents[2]
+KONA_TOOL = ROOT / "kona_tool"
+if str(KONA_TOOL) not in sys.path:
+    sys.path.insert(0, str(KONA_TOOL))
+os.environ.setdefault("JWT_SECRET", "ci_test_jwt_secret")
+
+from core import fund, stock
+from core.html_extract import (
+    CHUNK_SIZE,
+    extract_ft_quote,
+    extract_overseas_quote,
+    ft_scanner,
+    iter_response_text,
+    overseas_scanner,
+    scan,
+)
+
+FIXTURES = Path(__file__).resolve().parent / "fixtures"
+
+
+def _chunks(text, size=CHUNK_SIZE):
+    return [text[i:i + size] for i in range(0, len(text), size)]
+
+
+def _stream_resp(text, status=200, content_type="text/html"):
+    resp = MagicMock()
+    resp.status_code = status
+    resp.encoding = "ISO-8859-1"
+    resp.headers = {"Content-Type": content_type}
+    data = text.encode("utf-8")
+    resp.iter_content.side_effect = lambda chunk_size, decode_unicode: iter(
+        [data[i:i + chunk_size] for i in range(0, len(data), chunk_size)]
+    )
+    return resp
+
+
+class TestFtExtraction(unittest.TestCase):
+    @classmethod
+    def setUpClass(cls):
+        cls.html = (FIXTURES / "ft_tearsheet.html").read_text(encoding="utf-8")
+
+    def test_fixture_quote_and_early_stop(self):
+        chunks = _chunks(self.html)
+        scanner = scan(iter(chunks), ft_scanner())
+        self.assertLess(scanner.chunks, len(chunks))
+        quote = extract_ft_quote(iter(chunks))
+        self.assertEqual(quote[0], 132.47)
+        self.assertEqual(quote[3], 0.81)
+        self.assertAlmostEqual(quote[1], 132.47 / 1.0081)
+
+    def test_chunk_size_does_not_change_result(self):
+        expected = extract_ft_quote([self.html])
+        for size in (7, 333, 4096):
+            self.assertEqual(extract_ft_quote(_chunks(self.html, size)), expected)
+
+    def test_overview_price_wins_over_earlier_data_list_value(self):
+        html = (
+            '<span class="mod-ui-data-list__value">99.00</span>'
+            '<span class="mod-tearsheet-overview__quote__value big">101.50</span>'
+        )
+        self.assertEqual(extract_ft_quote(_chunks(html, 10))[0], 101.5)
+        self.assertEqual(extract_ft_quote(['<span class="mod-ui-data-list__value">99.00</span>'])[0], 99.0)
+        self.assertIsNone(extract_ft_quote(['<html><body>no quote</body></html>']))
+
+    def test_get_ft_fund_price_streams_and_closes(self):
+        resp = _stream_resp(self.html)
+        with patch.object(stock, "monitored_http_get", return_value=resp) as mock_get:
+            quote = stock.get_ft_fund_price("lu0552385295")
+        self.assertEqual(quote[0], 132.47)
+        self.assertTrue(mock_get.call_args.kwargs["stream"])
+        resp.close.assert_called_once()
+
+
+class TestOverseasExtraction(unittest.TestCase):
+    @classmethod
+    def setUpClass(cls):
+        cls.html = (FIXTURES / "overseas_fund.html").read_text(encoding="utf-8")
+
+    def test_fixture_quote_and_early_stop(self):
+        chunks = _chunks(self.html)
+        self.assertLess(scan(iter(chunks), overseas_scanner()).chunks, len(chunks))
+        curr, yclose, amt, chg = extract_overseas_quote(iter(chunks))
+        self.assertEqual((curr, chg), (1.8532, 0.54))
+        self.assertAlmostEqual(amt, 1.8532 * 0.54 / 100)
+        self.assertAlmostEqual(yclose, curr - amt)
+
+    def test_value_split_across_chunks(self):
+        html = '<span class="fix_dwjz">10.5' + '000</span><span class="fix_zzl">-1.25%</span>'
+        for size in (1, 5, 27):
+            self.assertEqual(extract_overseas_quote(_chunks(html, size))[0], 10.5)
+            self.assertEqual(extract_overseas_quote(_chunks(html, size))[3], -1.25)
+
+    def test_invalid_price_falls_back_to_next_pattern(self):
+        html = '<span class="fix_dwjz">--</span><p>2.5000(0.0100，0.40%)</p>'
+        self.assertEqual(extract_overseas_quote([html]), (2.5, 2.49, 0.01, 0.4))
+
+    def test_get_fund_overseas_html_single_request(self):
+        resp = _stream_resp(self.html)
+        with patch.object(fund, "monitored_http_get", return_value=resp) as mock_get, \
+                patch.object(fund.fund_nav_store, "save_confirmed") as save:
+            quote = fund.get_fund_overseas_html("968050")
+        self.assertEqual(quote[0], 1.8532)
+        self.assertEqual(mock_get.call_count, 1)
+        save.assert_called_once()
+        resp.close.assert_called_once()
+
+    def test_response_without_charset_is_decoded_as_utf8(self):
+        resp = _stream_resp('<span class="sp01">单位净值</span><b>>3.2100</b>')
+        self.assertIn("单位净值", "".join(iter_response_text(resp)))
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -10,11 +10,11 @@ if str(KONA_TOOL) not in sys.path:
     sys.path.insert(0, str(KONA_TOOL))
 os.environ.setdefault("JWT_SECRET", "ci_test_jwt_secret")
 
-from core.utils import http_get
+from core.utils import http_get, HttpSessionPool
 
 
 class TestHttpGet(unittest.TestCase):
-    @patch('core.utils.requests.get')
+    @patch('core.utils.requests.Session.get')
     def test_http_get_retries(self, mock_get):
         mock_get.side_effect = Exception('boom')
         with self.assertRaises(Exception):
@@ -22,5 +22,51 @@ class TestHttpGet(unittest.TestCase):
         self.assertEqual(mock_get.call_count, 2)
 
 
+class TestHttpSessionPool(unittest.TestCase):
+    def test_reuses_session_per_source(self):
+        pool = HttpSessionPool()
+        s1 = pool.get('tencent_stock')
+        self.assertIs(pool.get('tencent_stock'), s1)
+        self.assertIsNot(pool.get('sina_stock'), s1)
+        adapter = s1.get_adapter('http://qt.gtimg.cn')
+        self.assertEqual(adapter._pool_maxsize, HttpSessionPool.pool_config('tencent_stock')['pool_maxsize'])
+        pool.close_all()
+
+    def test_idle_session_is_recycled(self):
+        pool = HttpSessionPool()
+        s1 = pool.get('sina_forex')
+        pool._sessions['sina_forex']['last_used'] -= 10_000
+        s2 = pool.get('sina_forex')
+        self.assertIsNot(s1, s2)
+        stats = pool.stats()['sina_forex']
+        self.assertEqual(stats['pool_recycled'], 1)
+        self.assertIn('pool_hits', stats)
+        self.assertIn('pool_misses', stats)
+        pool.close_all()
+
+    def test_leased_session_is_not_recycled(self):
+        pool = HttpSessionPool()
+        leased_session = pool.get('sina_forex')
+        with patch.object(leased_session, 'close') as close:
+            with pool.lease('sina_forex') as leased:
+                self.assertIs(leased, leased_session)
+                pool._sessions['sina_forex']['last_used'] -= 10_000
+                # 租用中不算空闲，其他线程获取到同一个 Session
+                self.assertIs(pool.get('sina_forex'), leased)
+                close.assert_not_called()
+            self.assertIs(pool.get('sina_forex'), leased_session)
+            close.assert_not_called()
+        pool.close_all()
+
+    def test_close_all_defers_close_until_release(self):
+        pool = HttpSessionPool()
+        leased_session = pool.get('sina_forex')
+        with patch.object(leased_session, 'close') as close:
+            with pool.lease('sina_forex'):
+                pool.close_all()
+                close.assert_not_called()
+            close.assert_called_once()
+
+
 if __name__ == '__main__':
     unittest.main()
@@ -0,0 +1,113 @@
+import os
+import sys
+from pathlib import Path
+import unittest
+from unittest.mock import patch
+
+ROOT = Path(__file__).resolve().parents[2]
+KONA_TOOL = ROOT / "kona_tool"
+if str(KONA_TOOL) not in sys.path:
+    sys.path.insert(0, str(KONA_TOOL))
+os.environ.setdefault("JWT_SECRET", "ci_test_jwt_secret")
+
+import core.price as price
+from core.negative_cache import NegativeCache
+
+
+class TestNegativeCache(unittest.TestCase):
+    def test_backoff_doubles_up_to_max(self):
+        cache = NegativeCache(base_seconds=10, max_seconds=25, min_failures=2)
+        now = 1000.0
+        with patch("core.negative_cache.time.time", return_value=now):
+            cache.record_failure("x")
+            self.assertFalse(cache.blocked("x"))
+            retries = []
+            for _ in range(3):
+                cache.record_failure("x")
+                retries.append(cache.entries()[0]["retry_in_seconds"])
+            self.assertTrue(cache.blocked("x"))
+        self.assertEqual(retries, [10, 20, 25])
+        with patch("core.negative_cache.time.time", return_value=now + 26):
+            self.assertFalse(cache.blocked("x"))
+
+    def test_success_and_clear(self):
+        cache = NegativeCache(base_seconds=10, max_seconds=100, min_failures=1)
+        for code in ("a", "b", "c"):
+            cache.record_failure(code)
+        cache.record_success("a")
+        self.assertEqual(cache.clear("b"), 1)
+        self.assertEqual(cache.clear("missing"), 0)
+        self.assertEqual([e["code"] for e in cache.entries()], ["c"])
+        self.assertEqual(cache.clear(), 1)
+        self.assertEqual(cache.stats()["size"], 0)
+
+    def test_bounded_by_max_entries(self):
+        cache = NegativeCache(base_seconds=10, max_seconds=100, min_failures=1, max_entries=3)
+        for code in ("a", "b", "c"):
+            cache.record_failure(code)
+        cache.record_failure("a")
+        cache.record_failure("d")
+        self.assertEqual(sorted(e["code"] for e in cache.entries()), ["a", "c", "d"])
+        self.assertEqual(cache.stats()["evicted"], 1)
+
+    def test_prunes_entries_long_past_their_backoff(self):
+        cache = NegativeCache(base_seconds=10, max_seconds=100, min_failures=2)
+        with patch("core.negative_cache.time.time", return_value=1000.0):
+            cache.record_failure("once")
+            cache.record_failure("dead")
+            cache.record_failure("dead")
+        # "dead" 暂停到 1010，"once" 最近失败 1000：都在 max_seconds 之后才清理
+        with patch("core.negative_cache.time.time", return_value=1105.0):
+            cache.record_failure("new")
+            self.assertEqual(sorted(e["code"] for e in cache.entries()), ["dead", "new"])
+        with patch("core.negative_cache.time.time", return_value=1115.0):
+            cache.record_failure("new")
+            self.assertEqual([e["code"] for e in cache.entries()], ["new"])
+        self.assertEqual(cache.stats()["pruned"], 2)
+
+    def test_disabled_never_blocks(self):
+        cache = NegativeCache(base_seconds=10, max_seconds=100, min_failures=1, enabled=False)
+        cache.record_failure("x")
+        self.assertFalse(cache.blocked("x"))
+
+
+class TestPriceNegativeCache(unittest.TestCase):
+    def setUp(self):
+        price.price_cache.clear()
+        price.negative_cache.reset()
+        patcher = patch.object(price, "negative_cache", NegativeCache(base_seconds=60, max_seconds=600, min_failures=2))
+        self.cache = patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def test_dead_code_stops_hitting_providers(self):
+        with patch("core.price.get_stock_price", return_value=(0.0, 0.0, 0.0, 0.0)) as mock_get:
+            for _ in range(5):
+                self.assertEqual(price.get_price("sh999999"), (0.0, 0.0, 0.0, 0.0))
+        self.assertEqual(mock_get.call_count, 2)
+        self.assertTrue(self.cache.blocked("sh999999"))
+
+        with patch("core.price.batch_get_stock_prices") as mock_batch, \
+                patch("core.price.get_price") as mock_single:
+            flags = {}
+            res = price.batch_get_prices(["sh999999"], freshness=flags)
+        mock_batch.assert_not_called()
+        mock_single.assert_not_called()
+        self.assertEqual(flags["sh999999"], "missing")
+        self.assertEqual(res["sh999999"][0], 0.0)
+
+        self.cache.clear("sh999999")
+        with patch("core.price.get_stock_price", return_value=(5.0, 4.0, 1.0, 25.0)):
+            self.assertEqual(price.get_price("sh999999")[0], 5.0)
+        self.assertEqual(self.cache.stats()["size"], 0)
+
+    def test_code_with_stale_value_is_not_suppressed(self):
+        price.price_cache.set("sh600000", (11.0, 10.0, 1.0, 10.0))
+        with patch.object(price.config, "ENABLE_PRICE_SWR", False), \
+                patch("core.price.get_stock_price", return_value=(0.0, 0.0, 0.0, 0.0)):
+            for _ in range(3):
+                price.get_price("sh600000", use_cache=False)
+        self.assertEqual(self.cache.stats()["size"], 0)
+
+
+if __name__ == "__main__":
+    unittest.main()
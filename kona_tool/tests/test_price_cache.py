@@ -1,6 +1,8 @@
 import os
 import sys
 from pathlib import Path
+import threading
+import time
 import unittest
 
 ROOT = Path(__file__).resolve().parents[2]
@@ -18,7 +20,8 @@ class TestBatchCache(unittest.TestCase):
         price.price_cache.clear()
         price.price_cache.set('sh600000', (10, 9, 0, 0))
 
-        with patch('core.price.get_price', return_value=(5, 4, 1, 0)) as mock_get:
+        with patch('core.price.batch_get_stock_prices', return_value={}), \
+                patch('core.price.get_price', return_value=(5, 4, 1, 0)) as mock_get:
             res = price.batch_get_prices(['sh600000', 'sh600001'])
 
             self.assertEqual(mock_get.call_count, 1)
@@ -26,5 +29,58 @@ class TestBatchCache(unittest.TestCase):
             self.assertEqual(res['sh600001'][0], 5)
 
 
+class TestBoundedCache(unittest.TestCase):
+    def test_lru_eviction_keeps_recently_used(self):
+        cache = price.PriceCache(ttl=60, stale_ttl=300, max_entries=2)
+        cache.set('a', (1, 1, 0, 0))
+        cache.set('b', (2, 2, 0, 0))
+        self.assertIsNotNone(cache.get('a'))
+        cache.set('c', (3, 3, 0, 0))
+
+        self.assertIsNone(cache.get('b'))
+        self.assertEqual(cache.get('a')[0], 1)
+        self.assertEqual(cache.get('c')[0], 3)
+        stats = cache.stats()
+        self.assertEqual(stats['size'], 2)
+        self.assertEqual(stats['evictions'], 1)
+        self.assertGreater(stats['approx_bytes'], 0)
+
+    def test_sweep_drops_entries_past_stale_window(self):
+        cache = price.PriceCache(ttl=60, stale_ttl=120)
+        cache.set('sh600000', (1, 1, 0, 0))
+        cache.set('sh600001', (2, 2, 0, 0))
+        cache.cache['sh600000'] = ((1, 1, 0, 0), time.time() - 500)
+
+        self.assertEqual(cache.sweep(), 1)
+        self.assertNotIn('sh600000', cache.cache)
+        self.assertIn('sh600001', cache.cache)
+
+    def test_concurrent_set_respects_bound(self):
+        cache = price.PriceCache(ttl=60, stale_ttl=300, max_entries=50)
+
+        def writer(prefix):
+            for i in range(200):
+                cache.set(f'{prefix}{i}', (i, i, 0, 0))
+                cache.get(f'{prefix}{i // 2}')
+
+        threads = [threading.Thread(target=writer, args=(p,)) for p in 'abcd']
+        for t in threads:
+            t.start()
+        for t in threads:
+            t.join()
+
+        self.assertEqual(len(cache.cache), 50)
+        self.assertEqual(cache.stats()['evictions'], 750)
+
+    def test_aliases_share_one_entry(self):
+        cache = price.PriceCache(ttl=60, stale_ttl=300)
+        cache.set('00700.HK', (380, 375, 5, 1.33))
+        self.assertEqual(cache.get('hk00700')[0], 380)
+        self.assertEqual(cache.get('rt_hk00700')[0], 380)
+        cache.set('600519', (1500, 1480, 20, 1.35))
+        self.assertEqual(cache.get('sh600519')[0], 1500)
+        self.assertEqual(sorted(cache.cache), ['00700.HK', 'sh600519'])
+
+
 if __name__ == '__main__':
     unittest.main()
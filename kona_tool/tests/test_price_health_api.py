@@ -15,6 +15,7 @@ if str(KONA_TOOL) not in sys.path:
 _tmp_dir = tempfile.TemporaryDirectory()
 os.environ["KONA_DATABASE_PATH"] = str(Path(_tmp_dir.name) / "test.db")
 os.environ.setdefault("JWT_SECRET", "ci_test_jwt_secret")
+os.environ.setdefault("ENABLE_SYMBOL_REFRESH", "false")
 
 import app as app_module  # noqa: E402
 
@@ -62,6 +63,26 @@ class PriceHealthApiTests(unittest.TestCase):
             self.assertEqual(data["runtime"]["cache_hits"], 1)
             self.assertIn("sina_stock", data["sources"])
 
+    def test_negative_cache_list_and_clear(self):
+        app_module.config.PRICE_HEALTH_TOKEN = "metrics-secret"
+        headers = {"X-Kona-Metrics-Token": "metrics-secret"}
+        self.assertEqual(self.client.get("/api/system/negative_cache").status_code, 401)
+        self.assertEqual(self.client.post("/api/system/negative_cache/clear").status_code, 401)
+
+        with patch.object(app_module.negative_cache, "entries", return_value=[{"code": "sh999999"}]):
+            resp = self.client.get("/api/system/negative_cache", headers=headers)
+        self.assertEqual(resp.status_code, 200)
+        self.assertEqual(resp.get_json()["entries"][0]["code"], "sh999999")
+
+        with patch.object(app_module.negative_cache, "clear", return_value=1) as clear:
+            resp = self.client.post("/api/system/negative_cache/clear", json={"code": "sh999999"}, headers=headers)
+        self.assertEqual(resp.get_json()["cleared"], 1)
+        clear.assert_called_once_with("sh999999")
+
+        app_module.negative_cache.record_failure("00700.HK")
+        resp = self.client.post("/api/system/negative_cache/clear", json={"code": "hk700"}, headers=headers)
+        self.assertEqual(resp.get_json()["cleared"], 1)
+
 
 if __name__ == "__main__":
     unittest.main()
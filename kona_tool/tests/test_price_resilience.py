@@ -1,5 +1,7 @@
 import os
 import sys
+import threading
+import time
 from pathlib import Path
 import unittest
 from unittest.mock import patch
@@ -19,6 +21,10 @@ class TestPriceResilience(unittest.TestCase):
     def setUp(self):
         price.price_cache.clear()
         source_health.reset()
+        # 固定使用 ttl 计算有效期，避免休市时段缓存有效期被延长到下一次开盘
+        patcher = patch.object(price.price_cache, "market_aware", False)
+        patcher.start()
+        self.addCleanup(patcher.stop)
 
     def test_fallback_to_stale_price_when_fetch_fails(self):
         code = "sh600000"
@@ -29,13 +35,46 @@ class TestPriceResilience(unittest.TestCase):
         data, ts = price.price_cache.cache[code]
         price.price_cache.cache[code] = (data, ts - (price.price_cache.ttl + 1))
 
-        with patch("core.price.get_stock_price", return_value=(0.0, 0.0, 0.0, 0.0)):
+        with patch.object(price.config, "ENABLE_PRICE_SWR", False), \
+                patch("core.price.get_stock_price", return_value=(0.0, 0.0, 0.0, 0.0)):
             got = price.get_price(code)
 
         self.assertEqual(got, stale)
         metrics = price.get_price_runtime_metrics()
         self.assertGreaterEqual(metrics.get("stale_hits", 0), 1)
 
+    def test_stale_value_returned_immediately_and_refreshed_once(self):
+        code = "sh600000"
+        stale = (11.0, 10.0, 1.0, 10.0)
+        fresh = (12.0, 11.0, 1.0, 9.09)
+        price.price_cache.set(code, stale)
+        data, ts = price.price_cache.cache[code]
+        price.price_cache.cache[code] = (data, ts - (price.price_cache.ttl + 1))
+
+        release = threading.Event()
+        calls = []
+
+        def slow_fetch(c):
+            calls.append(c)
+            release.wait(2)
+            return fresh
+
+        with patch("core.price.get_stock_price", side_effect=slow_fetch):
+            metas = [{}, {}, {}]
+            got = [price.get_price(code, meta=m) for m in metas]
+            self.assertEqual(got, [stale] * 3)
+            self.assertTrue(all(m["stale"] for m in metas))
+            self.assertGreater(metas[0]["age_ms"], price.price_cache.ttl * 1000)
+            release.set()
+            deadline = time.time() + 2
+            while price.price_cache.get(code) != fresh and time.time() < deadline:
+                time.sleep(0.01)
+
+        self.assertEqual(calls, [code])
+        meta = {}
+        self.assertEqual(price.get_price(code, meta=meta), fresh)
+        self.assertFalse(meta["stale"])
+
     def test_source_health_snapshot_has_expected_fields(self):
         source_health.record("test_source", success=False, timeout=True, error="timeout")
         source_health.record("test_source", success=True, duration_ms=12.5)
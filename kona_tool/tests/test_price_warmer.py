@@ -0,0 +1,115 @@
+import os
+import sys
+from datetime import datetime
+from pathlib import Path
+import unittest
+from unittest.mock import patch
+
+ROOT = Path(__file__).resolve().parents[2]
+KONA_TOOL = ROOT / "kona_tool"
+if str(KONA_TOOL) not in sys.path:
+    sys.path.insert(0, str(KONA_TOOL))
+os.environ.setdefault("JWT_SECRET", "ci_test_jwt_secret")
+
+import core.price as price
+from core import market
+from core.warmer import PriceWarmer
+
+
+def _ts(year, month, day, hour, minute, market_name):
+    tz, _ = market.MARKET_SESSIONS[market_name]
+    return datetime(year, month, day, hour, minute, tzinfo=tz).timestamp()
+
+
+class TestMarketHours(unittest.TestCase):
+    def test_market_of_prefixes(self):
+        self.assertEqual(market.market_of("sh600519"), "a")
+        self.assertEqual(market.market_of("00700.HK"), "hk")
+        self.assertEqual(market.market_of("hk00700"), "hk")
+        self.assertEqual(market.market_of("gb_aapl"), "us")
+        self.assertEqual(market.market_of("AAPL"), "us")
+        self.assertEqual(market.market_of("f_000001"), "fund")
+        self.assertEqual(market.market_of("s_sh000001"), "a")
+
+    def test_sessions(self):
+        # 2026-02-04 为周三
+        self.assertTrue(market.is_market_open("a", _ts(2026, 2, 4, 10, 0, "a")))
+        self.assertFalse(market.is_market_open("a", _ts(2026, 2, 4, 12, 0, "a")))
+        self.assertFalse(market.is_market_open("a", _ts(2026, 2, 7, 10, 0, "a")))
+        self.assertTrue(market.is_market_open("us", _ts(2026, 2, 4, 10, 0, "us")))
+        self.assertFalse(market.is_market_open("us", _ts(2026, 2, 4, 17, 0, "us")))
+
+    def test_cache_expiry_by_market_state(self):
+        ttl = 60
+        # 开市：使用基础 TTL
+        t = _ts(2026, 2, 4, 10, 0, "a")
+        self.assertEqual(market.cache_expiry("sh600519", t, ttl), t + ttl)
+        # 收盘后宽限期内：仍使用基础 TTL
+        t = _ts(2026, 2, 4, 15, 2, "a")
+        self.assertEqual(market.cache_expiry("sh600519", t, ttl), t + ttl)
+        # 夜间休市：缓存到次日开盘
+        t = _ts(2026, 2, 4, 22, 0, "a")
+        self.assertEqual(market.cache_expiry("sh600519", t, ttl), _ts(2026, 2, 5, 9, 30, "a"))
+        # 周五收盘后：缓存到下周一开盘
+        t = _ts(2026, 2, 6, 20, 0, "us")
+        self.assertEqual(market.cache_expiry("gb_aapl", t, ttl), _ts(2026, 2, 9, 9, 30, "us"))
+        # 午间休市：缓存到午后开盘
+        t = _ts(2026, 2, 4, 12, 0, "a")
+        self.assertEqual(market.cache_expiry("sh600519", t, ttl), _ts(2026, 2, 4, 13, 0, "a"))
+
+    def test_fund_expiry_follows_nav_publication(self):
+        ttl = 60
+        # 收盘后、公布窗口前：缓存到窗口开始
+        t = _ts(2026, 2, 4, 16, 0, "fund")
+        self.assertEqual(market.cache_expiry("f_000001", t, ttl), _ts(2026, 2, 4, 18, 0, "fund"))
+        # 公布窗口内：按轮询间隔
+        t = _ts(2026, 2, 4, 19, 0, "fund")
+        self.assertEqual(market.cache_expiry("f_000001", t, ttl), t + market.config.FUND_NAV_POLL_TTL)
+        # 窗口结束后：缓存到次日开盘（估值开始变动）
+        t = _ts(2026, 2, 4, 23, 45, "fund")
+        self.assertEqual(market.cache_expiry("f_000001", t, ttl), _ts(2026, 2, 5, 9, 30, "fund"))
+
+    def test_price_cache_keeps_closed_market_quotes(self):
+        cache = price.PriceCache(ttl=60, stale_ttl=300, market_aware=True)
+        cache.set("sh600519", (1500.0, 1480.0, 20.0, 1.35))
+        data, _ = cache.cache["sh600519"]
+        fetched = _ts(2026, 2, 4, 22, 0, "a")
+        cache.cache["sh600519"] = (data, fetched)
+        with patch("core.price.time.time", return_value=fetched + 3600):
+            self.assertEqual(cache.get("sh600519"), data)
+        with patch("core.price.time.time", return_value=_ts(2026, 2, 5, 9, 31, "a")):
+            self.assertIsNone(cache.get("sh600519"))
+            self.assertEqual(cache.get_stale("sh600519"), data)
+
+
+class TestPriceWarmer(unittest.TestCase):
+    def setUp(self):
+        price.price_cache.clear()
+        patcher = patch.object(price.price_cache, "market_aware", False)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def test_refreshes_due_codes_and_pauses_closed_markets(self):
+        warmer = PriceWarmer(interval=60, lead_seconds=10)
+        price.price_cache.set("sh600001", (1, 1, 0, 0))  # 刚刷新，未到期
+        price.price_cache.set("sh600002", (1, 1, 0, 0))
+        data, ts = price.price_cache.cache["sh600002"]
+        price.price_cache.cache["sh600002"] = (data, ts - price.price_cache.ttl + 5)  # 即将过期
+
+        held = ["sh600000", "sh600001", "sh600002", "gb_aapl"]
+        with patch.object(warmer, "_held_codes", return_value=held), \
+                patch("core.warmer.is_code_trading", side_effect=lambda code, now=None: not code.startswith("gb_")), \
+                patch("core.warmer.batch_get_prices") as mock_batch:
+            refreshed = warmer.run_once()
+
+        self.assertEqual(refreshed, 2)
+        mock_batch.assert_called_once_with(["sh600000", "sh600002"], use_cache=False)
+        stats = warmer.stats()
+        self.assertEqual(stats["last_paused"], 1)
+        self.assertEqual(stats["last_due"], 2)
+        self.assertEqual(stats["lag_last_max_ms"], 0.0)
+        self.assertFalse(stats["running"])
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,85 @@
+import os
+import sys
+from pathlib import Path
+import time
+import unittest
+from unittest.mock import patch
+
+ROOT = Path(__file__).resolve().parents[2]
+KONA_TOOL = ROOT / "kona_tool"
+if str(KONA_TOOL) not in sys.path:
+    sys.path.insert(0, str(KONA_TOOL))
+os.environ.setdefault("JWT_SECRET", "ci_test_jwt_secret")
+
+from core import fund, stock
+from core.affinity import ProviderAffinity
+from tests import TempDatabaseTestCase
+
+
+class TestProviderAffinity(TempDatabaseTestCase):
+    def setUp(self):
+        super().setUp()
+        self.affinity = self._make()
+
+    def _make(self, ttl_seconds=86400):
+        return ProviderAffinity(ttl_seconds=ttl_seconds, database=self.database)
+
+    def test_prefer_moves_last_good_provider_first(self):
+        self.affinity.record("gb_qqq", "nasdaq_quote")
+        order = ["sina_us_stock", "eastmoney_us_stock", "nasdaq_quote"]
+        self.assertEqual(
+            self.affinity.prefer("gb_qqq", order),
+            ["nasdaq_quote", "sina_us_stock", "eastmoney_us_stock"],
+        )
+        self.assertEqual(self.affinity.prefer("gb_aapl", order), order)
+
+    def test_persisted_across_instances(self):
+        self.affinity.record("f_968001", "overseas_fund_html")
+        self.affinity.record("f_968001", "overseas_fund_html")
+        self.assertEqual(self.affinity.stats()["writes"], 1)
+
+        restarted = self._make()
+        self.assertEqual(restarted.get("f_968001"), "overseas_fund_html")
+
+    def test_stale_affinity_ages_out(self):
+        self.database.save_provider_affinity("gb_qqq", "nasdaq_quote", time.time() - 2 * 86400)
+        self.assertIsNone(self.affinity.get("gb_qqq"))
+        self.assertEqual(self.database.get_provider_affinities(), {})
+
+
+class TestAffinityRouting(unittest.TestCase):
+    def test_us_quote_tries_affinity_provider_first(self):
+        calls = []
+
+        def provider(name, result):
+            def fn(symbol):
+                calls.append(name)
+                return result
+            return fn
+
+        providers = {
+            "sina_us_stock": provider("sina_us_stock", None),
+            "eastmoney_us_stock": provider("eastmoney_us_stock", None),
+            "nasdaq_quote": provider("nasdaq_quote", (500.0, 495.0, 5.0, 1.01)),
+        }
+        with patch.dict(stock._US_STOCK_PROVIDERS, providers), \
+                patch.object(stock.provider_affinity, "get", return_value="nasdaq_quote"), \
+                patch.object(stock.provider_affinity, "record") as mock_record:
+            self.assertEqual(stock.get_us_stock_price("gb_qqq")[0], 500.0)
+
+        self.assertEqual(calls, ["nasdaq_quote"])
+        mock_record.assert_called_once_with("gb_qqq", "nasdaq_quote")
+
+    def test_fund_records_winning_source(self):
+        with patch.object(fund.provider_affinity, "get", return_value="overseas_fund_html"), \
+                patch.object(fund.provider_affinity, "record") as mock_record, \
+                patch.object(fund, "get_fund_overseas_html", return_value=(1.1, 1.0, 0.1, 10.0)), \
+                patch.object(fund, "get_fund_eastmoney_f10") as mock_f10:
+            self.assertEqual(fund.get_fund_price("968001")[0], 1.1)
+
+        mock_f10.assert_not_called()
+        mock_record.assert_called_once_with("968001", "overseas_fund_html")
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,119 @@
+import os
+import sys
+from pathlib import Path
+import time
+import unittest
+from unittest.mock import patch
+
+ROOT = Path(__file__).resolve().parents[2]
+KONA_TOOL = ROOT / "kona_tool"
+if str(KONA_TOOL) not in sys.path:
+    sys.path.insert(0, str(KONA_TOOL))
+os.environ.setdefault("JWT_SECRET", "ci_test_jwt_secret")
+
+from core import stock
+from core.routing import ProviderRouter
+from core.source_health import SourceHealth
+
+
+class TestProviderRouter(unittest.TestCase):
+    def setUp(self):
+        self.health = SourceHealth(fail_threshold=3, cooldown_seconds=30)
+        self.router = ProviderRouter(health=self.health, min_samples=3, fail_penalty_ms=3000)
+
+    def _record(self, source, n, success=True, duration_ms=100.0):
+        for _ in range(n):
+            self.health.record(source, success=success, duration_ms=duration_ms)
+
+    def test_cold_start_keeps_default_order(self):
+        self.assertEqual(self.router.order("us_stock", ["a", "b", "c"]), ["a", "b", "c"])
+
+    def test_faster_provider_moves_first(self):
+        self._record("a", 5, duration_ms=800)
+        self._record("b", 5, duration_ms=120)
+        self.assertEqual(self.router.order("us_stock", ["a", "b", "c"]), ["b", "a", "c"])
+
+    def test_flaky_provider_demoted(self):
+        self._record("a", 5, duration_ms=100)
+        self._record("a", 2, success=False)
+        self._record("b", 5, duration_ms=300)
+        self.assertEqual(self.router.order("cn_stock", ["a", "b"]), ["b", "a"])
+
+    def test_open_circuit_skipped_and_recorded(self):
+        self._record("a", 3, success=False)
+        order = self.router.order("cn_stock", ["a", "b"])
+
+        self.assertEqual(order, ["b"])
+        stats = self.router.stats()["cn_stock"]
+        self.assertEqual(stats["skipped"], ["a"])
+        self.assertEqual(stats["first_choice"], {"b": 1})
+
+    def test_ranked_order_cached_until_health_changes(self):
+        self._record("a", 5, duration_ms=800)
+        self._record("b", 5, duration_ms=120)
+        with patch.object(self.health, "snapshot", wraps=self.health.snapshot) as snapshot:
+            for _ in range(5):
+                self.assertEqual(self.router.order("us_stock", ["a", "b"]), ["b", "a"])
+            self.assertEqual(snapshot.call_count, 1)
+
+            # 统计有变化：cache_seconds 内仍复用，过期后重算
+            self._record("a", 20, duration_ms=10)
+            self.assertEqual(self.router.order("us_stock", ["a", "b"]), ["b", "a"])
+            self.assertEqual(snapshot.call_count, 1)
+            with patch("core.routing.time.time", return_value=time.time() + 2):
+                self.assertEqual(self.router.order("us_stock", ["a", "b"]), ["a", "b"])
+            self.assertEqual(snapshot.call_count, 2)
+        self.assertEqual(self.router.stats()["us_stock"]["first_choice"], {"b": 6, "a": 1})
+
+    def test_cached_order_expires_with_open_circuit(self):
+        self._record("a", 3, success=False)
+        self.assertEqual(self.router.order("cn_stock", ["a", "b"]), ["b"])
+        with patch("core.routing.time.time", return_value=time.time() + 31), \
+                patch("core.source_health.time.time", return_value=time.time() + 31):
+            # 熔断到期即重算，a 重新参与排序
+            self.assertEqual(sorted(self.router.order("cn_stock", ["a", "b"])), ["a", "b"])
+            self.assertEqual(self.router.stats()["cn_stock"]["skipped"], [])
+
+    def test_disabled_router_only_skips_open_circuits(self):
+        router = ProviderRouter(health=self.health, min_samples=1, enabled=False)
+        self._record("a", 2, duration_ms=900)
+        self._record("b", 2, duration_ms=10)
+        self.assertEqual(router.order("cn_stock", ["a", "b"]), ["a", "b"])
+
+
+class TestRoutedQuotes(unittest.TestCase):
+    def setUp(self):
+        patcher = patch.object(stock.provider_affinity, "enabled", False)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def test_us_quote_follows_router_order(self):
+        calls = []
+
+        def provider(name, result):
+            def fn(symbol):
+                calls.append(name)
+                return result
+            return fn
+
+        providers = {
+            "sina_us_stock": provider("sina_us_stock", None),
+            "eastmoney_us_stock": provider("eastmoney_us_stock", (10.0, 9.0, 1.0, 11.1)),
+            "nasdaq_quote": provider("nasdaq_quote", (11.0, 9.0, 2.0, 22.2)),
+        }
+        with patch.dict(stock._US_STOCK_PROVIDERS, providers), \
+                patch.object(stock.provider_router, "order", return_value=["nasdaq_quote", "eastmoney_us_stock"]):
+            self.assertEqual(stock.get_us_stock_price("gb_aapl")[0], 11.0)
+        self.assertEqual(calls, ["nasdaq_quote"])
+
+    def test_provider_errors_fall_through(self):
+        def broken(symbol):
+            raise RuntimeError("boom")
+
+        with patch.dict(stock._CN_STOCK_PROVIDERS, {"tencent_stock": broken, "sina_stock": lambda s: (5.0, 4.0, 1.0, 25.0)}), \
+                patch.object(stock.provider_router, "order", return_value=["tencent_stock", "sina_stock"]):
+            self.assertEqual(stock.get_sina_stock_price("600000"), (5.0, 4.0, 1.0, 25.0))
+
+
+if __name__ == '__main__':
+    unittest.main()
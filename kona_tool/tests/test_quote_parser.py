@@ -0,0 +1,146 @@
+import os
+import sys
+from pathlib import Path
+import unittest
+from unittest.mock import MagicMock, patch
+
+ROOT = Path(__file__).resolve().parents[2]
+KONA_TOOL = ROOT / "kona_tool"
+if str(KONA_TOOL) not in sys.path:
+    sys.path.insert(0, str(KONA_TOOL))
+os.environ.setdefault("JWT_SECRET", "ci_test_jwt_secret")
+
+from core import stock
+from core.quote_parser import (
+    find_payload,
+    iter_sina_payloads,
+    iter_tencent_payloads,
+    parse_sina_cn,
+    parse_sina_us,
+    parse_sina_us_batch,
+    parse_sina_us_index,
+    parse_tencent,
+    parse_tencent_batch,
+    parse_tencent_index,
+    pick_fields,
+)
+from core.utils import safe_float
+
+FIXTURES = Path(__file__).resolve().parent / "fixtures"
+
+
+def _split_tencent(s, data):
+    # 旧实现：整条报文切分后取下标
+    if 's_' in s:
+        if len(data) > 5:
+            curr, change = safe_float(data[3]), safe_float(data[4])
+            if curr > 0:
+                yclose = curr - change
+                return curr, yclose, change, (change / yclose * 100) if yclose > 0 else 0.0
+    elif 'hk' in s or 'sh' in s or 'sz' in s:
+        if len(data) > 4:
+            curr, yclose = safe_float(data[3]), safe_float(data[4])
+            if curr > 0:
+                return curr, yclose, curr - yclose, (curr - yclose) / yclose * 100 if yclose > 0 else 0.0
+    return None
+
+
+def _split_sina_us(data):
+    if len(data) <= 26:
+        return None
+    curr, yclose = safe_float(data[1]), safe_float(data[26])
+    if curr == 0:
+        curr = safe_float(data[21])
+    if curr > 0:
+        if yclose <= 0:
+            yclose = curr
+        return curr, yclose, curr - yclose, (curr - yclose) / yclose * 100
+    return None
+
+
+def _resp(text, status=200):
+    resp = MagicMock()
+    resp.status_code = status
+    resp.text = text
+    return resp
+
+
+class TestPickFields(unittest.TestCase):
+    def test_matches_split(self):
+        text = 'x="a~b~~d~e"'
+        start, end = 3, len(text) - 1
+        self.assertEqual(pick_fields(text, start, end, '~', (4, 0, 2)), ['e', 'a', ''])
+        self.assertEqual(pick_fields(text, start, end, '~', (3, 9)), ['d', None])
+
+    def test_does_not_read_past_payload(self):
+        text = 'v_a="1~2";v_b="3~4~5"'
+        (_, start, end), _ = list(iter_tencent_payloads(text))
+        self.assertEqual(pick_fields(text, start, end, '~', (1, 2)), ['2', None])
+
+
+class TestTencentPayloads(unittest.TestCase):
+    @classmethod
+    def setUpClass(cls):
+        cls.text = (FIXTURES / "tencent_quotes.txt").read_text(encoding="utf-8")
+
+    def test_equivalent_to_split_parser(self):
+        for symbol, start, end in iter_tencent_payloads(self.text):
+            with self.subTest(symbol=symbol):
+                expected = _split_tencent(symbol, self.text[start:end].split('~'))
+                self.assertEqual(parse_tencent(symbol, self.text, start, end), expected)
+
+    def test_batch_single_pass(self):
+        quotes = parse_tencent_batch(self.text)
+        self.assertEqual(set(quotes), {"sh600519", "sz000001", "hk00700", "s_sh000001", "hkHSTECH"})
+        self.assertEqual(quotes["sh600519"][:2], (1502.30, 1480.00))
+        self.assertAlmostEqual(quotes["s_sh000001"][1], 3088.64 + 12.35)
+
+    def test_index_payloads(self):
+        curr, yclose, _, _ = parse_tencent_index(self.text, *find_payload(self.text, "us.IXIC"))
+        self.assertEqual((curr, yclose), (17890.50, 17850.25))
+        self.assertIsNone(parse_tencent_index('v_x="1~2~3"', *find_payload('v_x="1~2~3"')))
+        self.assertIsNone(find_payload(self.text, "sh000000"))
+
+
+class TestSinaPayloads(unittest.TestCase):
+    @classmethod
+    def setUpClass(cls):
+        cls.text = (FIXTURES / "sina_quotes.txt").read_text(encoding="utf-8")
+        cls.spans = {s: (start, end) for s, start, end in iter_sina_payloads(cls.text)}
+
+    def test_us_equivalent_to_split_parser(self):
+        for symbol in ("gb_aapl", "gb_qqq", "gb_none"):
+            start, end = self.spans[symbol]
+            with self.subTest(symbol=symbol):
+                expected = _split_sina_us(self.text[start:end].split(','))
+                self.assertEqual(parse_sina_us(self.text, start, end), expected)
+        # 现价为 0 时使用盘后价
+        self.assertEqual(parse_sina_us(self.text, *self.spans["gb_qqq"])[0], 485.30)
+
+    def test_us_batch(self):
+        quotes = parse_sina_us_batch(self.text)
+        self.assertEqual(quotes["gb_aapl"][:2], (228.52, 226.05))
+        self.assertNotIn("gb_none", quotes)
+
+    def test_cn_and_index(self):
+        self.assertEqual(parse_sina_cn("sh600519", self.text, *self.spans["sh600519"])[:2], (1502.30, 1480.00))
+        self.assertEqual(parse_sina_cn("rt_hk00700", self.text, *self.spans["rt_hk00700"])[:2], (388.6, 382.2))
+        curr, yclose, _, _ = parse_sina_cn("s_sh000001", self.text, *self.spans["s_sh000001"])
+        self.assertAlmostEqual(yclose, curr + 12.35)
+        self.assertEqual(parse_sina_us_index(self.text, *self.spans["gb_ixic"])[:2], (17890.50, 17850.25))
+
+
+class TestStockIntegration(unittest.TestCase):
+    def test_single_quote_helpers_use_parser(self):
+        tencent = (FIXTURES / "tencent_quotes.txt").read_text(encoding="utf-8")
+        sina = (FIXTURES / "sina_quotes.txt").read_text(encoding="utf-8")
+        with patch.object(stock, "monitored_http_get", return_value=_resp(tencent)):
+            self.assertEqual(stock._tencent_stock_quote("hk00700")[0], 388.6)
+            self.assertEqual(stock.get_hstech_price()[0], 3650.12)
+        line = next(l for l in sina.splitlines() if "gb_aapl" in l)
+        with patch.object(stock, "monitored_http_get", return_value=_resp(line)):
+            self.assertEqual(stock._sina_us_quote("AAPL")[0], 228.52)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,160 @@
+import os
+import sys
+import tempfile
+import threading
+from pathlib import Path
+import unittest
+from unittest.mock import patch
+
+ROOT = Path(__file__).resolve().parents[2]
+KONA_TOOL = ROOT / "kona_tool"
+if str(KONA_TOOL) not in sys.path:
+    sys.path.insert(0, str(KONA_TOOL))
+
+_tmp_dir = tempfile.TemporaryDirectory()
+os.environ["KONA_DATABASE_PATH"] = str(Path(_tmp_dir.name) / "test.db")
+os.environ.setdefault("JWT_SECRET", "ci_test_jwt_secret")
+os.environ.setdefault("ENABLE_SYMBOL_REFRESH", "false")
+
+import app as app_module  # noqa: E402
+from core import quote_stream  # noqa: E402
+from core.quote_stream import QuoteHub, Subscription  # noqa: E402
+
+
+def _hub(**kwargs):
+    params = dict(interval=5, max_connections=2, heartbeat_seconds=1, max_seconds=30, max_codes=10)
+    params.update(kwargs)
+    return QuoteHub(**params)
+
+
+class FakePrices:
+    """按代码返回可修改的报价，并记录每次批量请求的代码"""
+
+    def __init__(self, prices):
+        self.prices = dict(prices)
+        self.calls = []
+
+    def __call__(self, codes, use_cache=True, deadline=None, freshness=None):
+        self.calls.append(list(codes))
+        if freshness is not None:
+            freshness.update({c: "fresh" for c in codes if c in self.prices})
+        return {c: self.prices[c] for c in codes if c in self.prices}
+
+
+class TestQuoteHub(unittest.TestCase):
+    def setUp(self):
+        self.prices = FakePrices({"sh600519": (1500.0, 1480.0, 20.0, 1.35), "00700.HK": (380.0, 375.0, 5.0, 1.33)})
+        patcher = patch.object(quote_stream, "batch_get_prices", self.prices)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def test_one_fetch_per_cycle_and_only_changes_pushed(self):
+        hub = _hub()
+        with patch.object(hub._loop, "start"):
+            a = hub.subscribe(["600519", "hk00700"])
+            b = hub.subscribe(["sh600519"])
+        self.assertEqual(set(hub.snapshot(a)), {"600519", "hk00700"})
+        self.assertEqual(set(hub.snapshot(b)), {"sh600519"})
+
+        self.prices.calls.clear()
+        self.assertEqual(hub.run_once(), 0)
+        self.assertEqual(len(self.prices.calls), 1)
+        self.assertEqual(sorted(self.prices.calls[0]), ["00700.HK", "sh600519"])
+
+        self.prices.prices["00700.HK"] = (381.0, 375.0, 6.0, 1.6)
+        self.assertEqual(hub.run_once(), 1)
+        self.assertEqual(a.wait(0), {"hk00700": {"price": 381.0, "yclose": 375.0, "amt": 6.0, "chg": 1.6, "freshness": "fresh"}})
+        self.assertEqual(b.wait(0), {})
+
+    def test_concurrent_diffs_report_each_change_once(self):
+        # 首次全量（连接线程）与刷新循环同时比较同一订阅
+        codes = [f"sh6{i:05d}" for i in range(200)]
+        prices = {code: (10.0 + i, 10.0, float(i), 1.0) for i, code in enumerate(codes)}
+        sub = Subscription({code: [code] for code in codes})
+        barrier = threading.Barrier(4)
+        results = []
+
+        def worker():
+            barrier.wait()
+            results.append(sub.diff(prices, {}))
+
+        threads = [threading.Thread(target=worker) for _ in range(4)]
+        for t in threads:
+            t.start()
+        for t in threads:
+            t.join()
+        self.assertEqual(sum(len(r) for r in results), len(codes))
+        self.assertEqual(sub.sent, {code: prices[code] for code in codes})
+
+    def test_connection_cap_and_unsubscribe(self):
+        hub = _hub(max_connections=1)
+        with patch.object(hub._loop, "start"):
+            sub = hub.subscribe(["sh600519"])
+            self.assertIsNone(hub.subscribe(["sh600519"]))
+            hub.unsubscribe(sub)
+            self.assertIsNotNone(hub.subscribe(["sh600519"]))
+        self.assertEqual(hub.stats()["rejected"], 1)
+        self.assertEqual(hub.stats()["connections"], 1)
+
+    def test_events_heartbeat_update_and_cleanup(self):
+        hub = _hub(heartbeat_seconds=1)
+        with patch.object(hub._loop, "start"):
+            sub = hub.subscribe(["sh600519"])
+        stream = hub.events(sub)
+        self.assertTrue(next(stream).startswith("retry:"))
+        self.assertIn('"sh600519"', next(stream))
+        sub.push({"sh600519": {"price": 1}})
+        self.assertTrue(next(stream).startswith("event: quotes"))
+        self.assertEqual(next(stream), ": heartbeat\n\n")
+        stream.close()
+        self.assertEqual(hub.stats()["connections"], 0)
+
+
+class TestStreamEndpoint(unittest.TestCase):
+    @classmethod
+    def setUpClass(cls):
+        app_module.app.testing = True
+        cls.client = app_module.app.test_client()
+
+    def test_stream_endpoint(self):
+        hub = _hub(max_connections=1)
+        prices = FakePrices({"sh600519": (1500.0, 1480.0, 20.0, 1.35)})
+        with patch.object(app_module, "quote_hub", hub), patch.object(hub._loop, "start"), \
+                patch.object(quote_stream, "batch_get_prices", prices):
+            self.assertEqual(self.client.get("/api/prices/stream").status_code, 400)
+            resp = self.client.get("/api/prices/stream?codes=sh600519", buffered=False)
+            self.assertEqual(resp.status_code, 200)
+            self.assertEqual(resp.mimetype, "text/event-stream")
+            chunks = iter(resp.response)
+            next(chunks)
+            self.assertIn(b'"sh600519"', next(chunks))
+
+            busy = self.client.get("/api/prices/stream?codes=sh600519")
+            self.assertEqual(busy.status_code, 503)
+            self.assertIn("Retry-After", busy.headers)
+            resp.close()
+        self.assertEqual(hub.stats()["connections"], 0)
+
+    def test_unread_responses_release_their_slot(self):
+        hub = _hub(max_connections=2)
+        prices = FakePrices({"sh600519": (1500.0, 1480.0, 20.0, 1.35)})
+        with patch.object(app_module, "quote_hub", hub), patch.object(hub._loop, "start"), \
+                patch.object(quote_stream, "batch_get_prices", prices):
+            # 响应体从未迭代：未启动的生成器关闭时不执行 finally，名额由 call_on_close 释放
+            # （WSGI 服务器发送完响应后总会关闭响应，测试客户端需手动关闭）
+            for _ in range(3):
+                head = self.client.head("/api/prices/stream?codes=sh600519")
+                self.assertEqual(head.status_code, 200)
+                head.close()
+            unread = self.client.get("/api/prices/stream?codes=sh600519", buffered=False)
+            unread.close()
+            self.assertEqual(hub.stats()["connections"], 0)
+            resp = self.client.get("/api/prices/stream?codes=sh600519", buffered=False)
+            self.assertEqual(resp.status_code, 200)
+            resp.close()
+        self.assertEqual(prices.calls, [])
+        self.assertEqual(hub.stats()["connections"], 0)
+
+
+if __name__ == "__main__":
+    unittest.main()
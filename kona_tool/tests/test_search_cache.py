@@ -0,0 +1,122 @@
+import os
+import sys
+from pathlib import Path
+import unittest
+from unittest.mock import patch
+
+ROOT = Path(__file__).resolve().parents[2]
+KONA_TOOL = ROOT / "kona_tool"
+if str(KONA_TOOL) not in sys.path:
+    sys.path.insert(0, str(KONA_TOOL))
+os.environ.setdefault("JWT_SECRET", "ci_test_jwt_secret")
+
+from core import price
+from tests import TempDatabaseTestCase
+from core.price import SearchCache
+from core.symbols import SymbolMaster
+
+MAOTAI = {'code': 'sh600519', 'name': '贵州茅台', 'type_name': 'A股', 'currency': 'CNY'}
+MAOTAI_ETF = {'code': 'sz159999', 'name': '茅台酒业ETF', 'type_name': 'A股', 'currency': 'CNY'}
+
+
+class TestSearchCache(unittest.TestCase):
+    def test_ttl_and_lru(self):
+        cache = SearchCache(ttl=60, max_entries=2)
+        cache.put('A', [{'code': 'a', 'name': 'A'}], complete=True)
+        cache.put('b', [], complete=True)
+        self.assertEqual(cache.get(' a '), [{'code': 'a', 'name': 'A'}])
+        cache.put('c', [], complete=True)
+        self.assertIsNone(cache.get('b'))
+        self.assertIsNotNone(cache.get('a'))
+
+        cache._entries['a'] = (cache._entries['a'][0], True, 0.0)
+        self.assertIsNone(cache.get('a'))
+
+    def test_returns_copies(self):
+        cache = SearchCache()
+        cache.put('x', [{'code': 'x', 'name': 'X'}], complete=True)
+        cache.get('x')[0]['name'] = 'changed'
+        self.assertEqual(cache.get('x')[0]['name'], 'X')
+
+    def test_complete_prefix_only(self):
+        cache = SearchCache()
+        cache.put('茅', [MAOTAI], complete=False)
+        self.assertIsNone(cache.complete_prefix('茅台'))
+        cache.put('茅', [MAOTAI], complete=True)
+        self.assertEqual(cache.complete_prefix('茅台')[0], '茅')
+
+    def test_letter_queries_never_reuse_prefix(self):
+        # 上游按全拼 / 英文名匹配，"mao" 的结果过滤不出 "maot" 的结果
+        cache = SearchCache()
+        cache.put('mao', [MAOTAI], complete=True)
+        self.assertIsNone(cache.complete_prefix('maot'))
+        cache.put('60', [MAOTAI], complete=True)
+        self.assertEqual(cache.complete_prefix('600')[0], '60')
+        self.assertIsNone(cache.complete_prefix('60a'))
+
+
+class TestSearchStocksCache(TempDatabaseTestCase):
+    def setUp(self):
+        super().setUp()
+        self.master = SymbolMaster(database=self.database)
+        self.cache = SearchCache()
+        for name, value in (('symbol_master', self.master), ('search_cache', self.cache)):
+            patcher = patch.object(price, name, value)
+            patcher.start()
+            self.addCleanup(patcher.stop)
+
+    def _search(self, query, sina_items, fund_items=()):
+        def fake_sina(q, type_code):
+            return [dict(item) for item in sina_items] if type_code == '11' else []
+
+        with patch.object(price, '_search_sina', side_effect=fake_sina) as sina, \
+                patch.object(price, '_search_fund', return_value=list(fund_items)), \
+                patch.object(price, 'infer_asset_type', return_value='a') as infer:
+            results = price.search_stocks(query)
+        return results, sina, infer
+
+    def test_repeat_query_hits_cache(self):
+        first, sina, infer = self._search('茅', [MAOTAI])
+        self.assertEqual(infer.call_count, 1)
+        second, sina, infer = self._search('茅', [MAOTAI])
+        self.assertEqual(second, first)
+        sina.assert_not_called()
+        infer.assert_not_called()
+        self.assertEqual(second[0]['asset_type'], 'a')
+
+    def test_longer_query_filters_complete_prefix(self):
+        self._search('茅', [MAOTAI, MAOTAI_ETF])
+        results, sina, infer = self._search('茅台酒', [])
+        sina.assert_not_called()
+        infer.assert_not_called()
+        self.assertEqual([item['code'] for item in results], ['sz159999'])
+        self.assertEqual(results[0]['asset_type'], 'a')
+
+        stats = self.cache.stats()
+        self.assertEqual((stats['hits'], stats['prefix_hits'], stats['misses']), (0, 1, 1))
+        self.assertEqual(stats['hit_ratio'], 0.5)
+
+    def test_truncated_prefix_is_not_reused(self):
+        many = [{'code': f'sh60{i:04d}', 'name': f'茅台{i}号', 'type_name': 'A股', 'currency': 'CNY'}
+                for i in range(price.SINA_SEARCH_PAGE)]
+        self._search('茅', many)
+        results, sina, _ = self._search('茅台9', [many[9]])
+        self.assertTrue(sina.called)
+        self.assertEqual([item['code'] for item in results], ['sh600009'])
+
+    def test_local_results_are_not_reused_as_prefix(self):
+        self.master.add([MAOTAI])
+        self.master.add([dict(MAOTAI, code='sh600520', name='茅台集团')])
+        with patch.object(price.config, 'SYMBOL_SEARCH_MIN_HITS', 1):
+            self._search('茅', [])
+        self.assertIsNone(self.cache.complete_prefix('茅台'))
+
+    def test_empty_filter_falls_back_to_search(self):
+        self._search('茅', [MAOTAI])
+        results, sina, _ = self._search('茅x', [])
+        self.assertTrue(sina.called)
+        self.assertEqual(results, [])
+
+
+if __name__ == '__main__':
+    unittest.main()
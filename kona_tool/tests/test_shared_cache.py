@@ -0,0 +1,169 @@
+import os
+import sys
+from pathlib import Path
+import time
+import unittest
+from unittest.mock import patch
+
+ROOT = Path(__file__).resolve().parents[2]
+KONA_TOOL = ROOT / "kona_tool"
+if str(KONA_TOOL) not in sys.path:
+    sys.path.insert(0, str(KONA_TOOL))
+os.environ.setdefault("JWT_SECRET", "ci_test_jwt_secret")
+
+from core import shared_cache
+from core.price import PriceCache
+from core.source_health import source_health
+
+
+class TestEntryEncoding(unittest.TestCase):
+    def test_roundtrip_is_compact(self):
+        raw = shared_cache.encode_entry((10.5, 10.0, 0.5, 5.0), 1700000000.25)
+        self.assertEqual(len(raw), 40)
+        self.assertEqual(shared_cache.decode_entry(raw), ((10.5, 10.0, 0.5, 5.0), 1700000000.25))
+        self.assertIsNone(shared_cache.decode_entry(b"bad"))
+        self.assertIsNone(shared_cache.decode_entry(None))
+
+
+class TestTwoLevelCache(unittest.TestCase):
+    def setUp(self):
+        self.store = shared_cache.InMemoryQuoteStore()
+        self.worker_a = PriceCache(ttl=60, stale_ttl=300, l2=self.store)
+        self.worker_b = PriceCache(ttl=60, stale_ttl=300, l2=self.store)
+
+    def test_other_worker_reads_with_original_timestamp(self):
+        self.worker_a.set('sh600000', (10, 9, 1, 11.1))
+        fetched_at = self.worker_a.cache['sh600000'][1]
+
+        self.assertEqual(self.worker_b.get('sh600000'), (10, 9, 1, 11.1))
+        self.assertEqual(self.worker_b.cache['sh600000'][1], fetched_at)
+        self.assertEqual(self.worker_b.stats()['l2_hits'], 1)
+
+    def test_stale_entry_shared_for_fallback(self):
+        self.store.set('sh600000', (10, 9, 1, 11.1), time.time() - 120, 180)
+
+        self.assertIsNone(self.worker_b.get('sh600000'))
+        self.assertEqual(self.worker_b.get_stale('sh600000'), (10, 9, 1, 11.1))
+
+    def test_lookup_reads_l2_once(self):
+        self.store.set('sh600000', (10, 9, 1, 11.1), time.time() - 120, 180)
+
+        with patch.object(self.store, 'get_many', wraps=self.store.get_many) as get_many:
+            self.assertEqual(self.worker_b.lookup('sh600000'), ((10, 9, 1, 11.1), False))
+        self.assertEqual(get_many.call_count, 1)
+        self.assertEqual(self.worker_b.lookup('missing'), (None, False))
+
+    def test_newer_l1_entry_not_overwritten(self):
+        self.store.set('sh600000', (8, 9, -1, -11.1), time.time() - 120, 180)
+        self.worker_b.set('sh600000', (10, 9, 1, 11.1))
+        self.worker_b.cache['sh600000'] = ((10, 9, 1, 11.1), time.time() - 90)
+
+        self.worker_b.prefetch(['sh600000'])
+        self.assertEqual(self.worker_b.get_stale('sh600000')[0], 10)
+
+    def test_prefetch_batches_missing_codes(self):
+        self.worker_a.set('a', (1, 1, 0, 0))
+        self.worker_a.set('b', (2, 2, 0, 0))
+
+        self.assertEqual(self.worker_b.prefetch(['a', 'b', 'c']), 2)
+        self.assertEqual(self.worker_b.get('b', shared=False)[0], 2)
+        self.assertEqual(self.worker_b.stats()['l2_misses'], 1)
+
+
+class _BrokenRedis:
+    def mget(self, keys):
+        raise ConnectionError("connection refused")
+
+    def set(self, *args, **kwargs):
+        raise ConnectionError("connection refused")
+
+
+class _RecordingRedis:
+    """记录 SET 与 pipeline 往返的 Redis 替身"""
+
+    def __init__(self):
+        self.round_trips = 0
+        self.sets = []
+
+    def set(self, key, value, px=None):
+        self.round_trips += 1
+        self.sets.append((key, px))
+
+    def pipeline(self, transaction=True):
+        client = self
+
+        class _Pipe:
+            def set(self, key, value, px=None):
+                client.sets.append((key, px))
+
+            def execute(self):
+                client.round_trips += 1
+                return [True] * len(client.sets)
+
+        return _Pipe()
+
+
+class TestRedisStoreBatchWrites(unittest.TestCase):
+    def setUp(self):
+        source_health.reset()
+        self.addCleanup(source_health.reset)
+        self.client = _RecordingRedis()
+        self.store = shared_cache.RedisQuoteStore("redis://127.0.0.1:1/0", prefix="p:")
+        self.store._client = self.client
+
+    def test_set_many_is_one_pipeline_round_trip(self):
+        cache = PriceCache(ttl=60, stale_ttl=300, l2=self.store)
+        cache.set_many({'sh600000': (10, 9, 1, 11.1), '600001': (5, 5, 0, 0), 'hk00700': (380, 375, 5, 1.3)})
+
+        self.assertEqual(self.client.round_trips, 1)
+        self.assertEqual(sorted(key for key, _ in self.client.sets), ['p:00700.HK', 'p:sh600000', 'p:sh600001'])
+        self.assertTrue(all(px > 0 for _, px in self.client.sets))
+        self.assertEqual(cache.get('sh600001', shared=False), (5, 5, 0, 0))
+
+    def test_batch_fetch_writes_chunk_in_one_round_trip(self):
+        import core.price as price
+
+        cache = PriceCache(ttl=60, stale_ttl=300, l2=self.store)
+        quotes = {f'sh60000{i}': (10.0 + i, 10.0, float(i), 1.0) for i in range(5)}
+        with patch.object(price, 'price_cache', cache), \
+                patch.object(price, 'batch_get_stock_prices', side_effect=lambda codes: {c: quotes[c] for c in codes}):
+            self.client.round_trips = 0
+            results = price.batch_get_prices(list(quotes), use_cache=False)
+
+        self.assertEqual(results, quotes)
+        self.assertEqual(len(self.client.sets), 5)
+        self.assertEqual(self.client.round_trips, 1)
+
+
+class TestRedisStoreFailures(unittest.TestCase):
+    def setUp(self):
+        source_health.reset()
+
+    def tearDown(self):
+        source_health.reset()
+
+    def test_errors_degrade_to_l1_and_open_circuit(self):
+        store = shared_cache.RedisQuoteStore("redis://127.0.0.1:1/0")
+        store._client = _BrokenRedis()
+        cache = PriceCache(ttl=60, stale_ttl=300, l2=store)
+
+        cache.set('sh600000', (10, 9, 1, 11.1))
+        self.assertEqual(cache.get('sh600000'), (10, 9, 1, 11.1))
+        self.assertEqual(store.get_many(['x']), {})
+        store.get_many(['y'])
+
+        info = source_health.snapshot()[shared_cache.REDIS_SOURCE]
+        self.assertTrue(info['circuit_open'])
+        self.assertEqual(store.get_many(['z']), {})
+
+
+@unittest.skipUnless(os.getenv("KONA_TEST_REDIS_URL"), "KONA_TEST_REDIS_URL not set")
+class TestRedisStoreLive(unittest.TestCase):
+    def test_roundtrip_against_local_redis(self):
+        store = shared_cache.RedisQuoteStore(os.environ["KONA_TEST_REDIS_URL"], prefix="kona:test:quote:")
+        store.set('sh600000', (10, 9, 1, 11.1), 1700000000.0, 5)
+        self.assertEqual(store.get_many(['sh600000', 'missing']), {'sh600000': ((10, 9, 1, 11.1), 1700000000.0)})
+
+
+if __name__ == '__main__':
+    unittest.main()
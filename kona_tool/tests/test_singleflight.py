@@ -0,0 +1,83 @@
+import os
+import sys
+import threading
+import time
+from pathlib import Path
+import unittest
+from unittest.mock import patch
+
+ROOT = Path(__file__).resolve().parents[2]
+KONA_TOOL = ROOT / "kona_tool"
+if str(KONA_TOOL) not in sys.path:
+    sys.path.insert(0, str(KONA_TOOL))
+os.environ.setdefault("JWT_SECRET", "ci_test_jwt_secret")
+
+import core.price as price
+from core.singleflight import SingleFlight
+
+
+class TestSingleFlight(unittest.TestCase):
+    def test_release_lets_waiters_retry(self):
+        flights = SingleFlight()
+        flight, leader = flights.claim("k")
+        self.assertTrue(leader)
+
+        out = []
+        t = threading.Thread(target=lambda: out.append(flights.do("k", lambda: "retried")))
+        t.start()
+        time.sleep(0.05)
+        flights.release("k", flight)
+        t.join(timeout=5)
+        self.assertEqual(out, ["retried"])
+
+
+class TestPriceCoalescing(unittest.TestCase):
+    def setUp(self):
+        price.price_cache.clear()
+        price._price_flights.reset()
+
+    def test_concurrent_misses_share_one_fetch(self):
+        calls = []
+
+        def slow_fetch(code):
+            calls.append(code)
+            time.sleep(0.2)
+            return (4.0, 3.9, 0.1, 2.56)
+
+        results = []
+        with patch("core.price.get_stock_price", side_effect=slow_fetch):
+            threads = [
+                threading.Thread(target=lambda: results.append(price.get_price("sh510300")))
+                for _ in range(5)
+            ]
+            for t in threads:
+                t.start()
+            for t in threads:
+                t.join(timeout=5)
+
+        self.assertEqual(len(calls), 1)
+        self.assertEqual(results, [(4.0, 3.9, 0.1, 2.56)] * 5)
+        metrics = price.get_price_runtime_metrics()
+        self.assertEqual(metrics["singleflight"]["shared"], 4)
+        self.assertEqual(metrics["singleflight"]["top_shared"].get("sh510300"), 4)
+
+    def test_batch_joins_in_flight_fetch(self):
+        flight, _ = price._price_flights.claim("sh510300")
+        quote = (4.0, 3.9, 0.1, 2.56)
+
+        def finish():
+            time.sleep(0.1)
+            price._price_flights.resolve("sh510300", flight, result=quote)
+
+        threading.Thread(target=finish).start()
+        with patch("core.price.batch_get_stock_prices", return_value={}) as mock_batch, \
+                patch("core.price.get_price") as mock_get:
+            res = price.batch_get_prices(["sh510300"])
+
+        self.assertEqual(res["sh510300"], quote)
+        mock_batch.assert_not_called()
+        mock_get.assert_not_called()
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,186 @@
+import os
+import sys
+from pathlib import Path
+import unittest
+from unittest.mock import MagicMock, patch
+
+ROOT = Path(__file__).resolve().parents[2]
+KONA_TOOL = ROOT / "kona_tool"
+if str(KONA_TOOL) not in sys.path:
+    sys.path.insert(0, str(KONA_TOOL))
+os.environ.setdefault("JWT_SECRET", "ci_test_jwt_secret")
+
+from core import price, symbols
+from core.asset_type import AssetClassifier
+from tests import TempDatabaseTestCase
+from core.symbols import SOURCE_BULK_A, SOURCE_BULK_FUND, SymbolMaster, pinyin_initials
+
+FUND_LIST_BODY = (
+    'var r = [["000001","HXCZHH","华夏成长混合","混合型-偏股","HUAXIACHENGZHANGHUNHE"],'
+    '["110011","YFDZXCZHH","易方达中小盘混合","混合型-偏股","YIFANGDA"]];'
+)
+
+
+def _resp(text="", status=200, payload=None):
+    resp = MagicMock()
+    resp.status_code = status
+    resp.text = text
+    resp.json.return_value = payload
+    return resp
+
+
+class TestSymbolMaster(TempDatabaseTestCase):
+    def setUp(self):
+        super().setUp()
+        classifier = AssetClassifier(ttl_seconds=86400, database=self.database)
+        patcher = patch.object(symbols, 'asset_classifier', classifier)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        self.master = self._make()
+        self.master.add([
+            {'code': 'sh600519', 'name': '贵州茅台', 'pinyin': 'gzmt'},
+            {'code': 'sz000858', 'name': '五粮液', 'pinyin': 'wly'},
+            {'code': '00700.HK', 'name': '腾讯控股'},
+            {'code': 'gb_aapl', 'name': '苹果', 'asset_type': 'us'},
+            {'code': 'f_000001', 'name': '华夏成长混合', 'pinyin': 'HXCZHH', 'asset_type': 'fund'},
+        ])
+
+    def _make(self):
+        return SymbolMaster(refresh_interval=3600, database=self.database)
+
+    def test_prefix_search_by_code_name_and_pinyin(self):
+        self.assertEqual(self.master.search('600519')[0]['code'], 'sh600519')
+        self.assertEqual(self.master.search('贵州')[0]['code'], 'sh600519')
+        self.assertEqual(self.master.search('GZ')[0]['code'], 'sh600519')
+        self.assertEqual(self.master.search('aapl')[0]['code'], 'gb_aapl')
+
+        fund = self.master.search('hxcz')[0]
+        self.assertEqual(fund['code'], 'f_000001')
+        self.assertEqual(fund['asset_type'], 'fund')
+        self.assertEqual(fund['type_name'], '基金')
+
+        hk = self.master.search('00700')[0]
+        self.assertEqual((hk['asset_type'], hk['currency']), ('hk', 'HKD'))
+
+    def test_exact_match_ranks_first_and_substring_fills_up(self):
+        self.master.add([{'code': 'f_000011', 'name': '华夏大盘精选混合'}])
+        self.assertEqual(self.master.search('000001')[0]['code'], 'f_000001')
+        codes = [item['code'] for item in self.master.search('成长')]
+        self.assertEqual(codes, ['f_000001'])
+        self.assertEqual(self.master.search('不存在'), [])
+
+    def test_substring_uses_gram_index(self):
+        self.master.add([{'code': f'f_1{i:05d}', 'name': f'测试{i}号混合'} for i in range(200)])
+        self.assertEqual(self.master.search('5号混', limit=50)[0]['code'], 'f_100005')
+        self.assertEqual(len(self.master.search('号混合', limit=15)), 15)
+        self.assertEqual(self.master.search('混合X'), [])
+        # 全量重建后旧名称不再命中
+        self.master.add([{'code': 'f_100005', 'name': '改名基金'}] + [{'code': f'f_2{i:05d}', 'name': '占位'} for i in range(150)])
+        self.assertNotIn('f_100005', [item['code'] for item in self.master.search('5号混', limit=50)])
+
+    def test_re_adding_record_does_not_duplicate_postings(self):
+        record = {'code': 'f_300001', 'name': '稳健增长混合'}
+        for _ in range(3):
+            self.master.add([dict(record)])
+        self.assertEqual(list(self.master._grams['混合']).count('f_300001'), 1)
+        self.assertEqual(list(self.master._grams['稳健']), ['f_300001'])
+        # 小批量改名：旧名称的二元组不再指向该代码
+        self.master.add([{'code': 'f_300001', 'name': '稳健债券'}])
+        self.assertNotIn('f_300001', self.master._grams.get('混合', {}))
+        self.assertEqual(self.master.search('健债')[0]['code'], 'f_300001')
+
+    def test_a_share_names_get_pinyin_initials(self):
+        self.assertEqual(pinyin_initials('贵州茅台'), 'gzmt')
+        self.assertEqual(pinyin_initials('平安银行'), 'payh')
+        self.assertEqual(pinyin_initials('*ST 万科Ａ'), 'stwka')
+        self.master.add([{'code': 'sh601318', 'name': '中国平安'}, {'code': '00700.HK', 'name': '腾讯控股'}])
+        self.assertEqual(self.master.search('zgpa')[0]['code'], 'sh601318')
+        self.assertEqual(self.master.get('00700.HK')['pinyin'], '')
+
+    def test_update_replaces_index_keys_and_keeps_pinyin(self):
+        self.master.add([{'code': 'sz000858', 'name': '五 粮 液'}])
+        self.assertEqual(self.master.search('五粮液'), [])
+        self.assertEqual(self.master.search('wly')[0]['name'], '五 粮 液')
+
+    def test_persisted_entries_reload(self):
+        master = self._make()
+        self.assertEqual(master.search('gzmt')[0]['code'], 'sh600519')
+        self.assertEqual(master.stats()['size'], 5)
+
+    def test_refresh_bulk_sources(self):
+        stock_page = {'data': {'total': 2, 'diff': [
+            {'f12': '600036', 'f13': 1, 'f14': '招商银行'},
+            {'f12': '000001', 'f13': 0, 'f14': '平安银行'},
+        ]}}
+
+        def fake_get(source, url, **kwargs):
+            if 'fundcode_search' in url:
+                return _resp(FUND_LIST_BODY)
+            return _resp(payload=stock_page)
+
+        with patch('core.symbols.monitored_http_get', side_effect=fake_get):
+            self.assertEqual(self.master.refresh_if_due(), 4)
+            # 间隔内不重复拉取
+            self.assertEqual(self.master.refresh_if_due(), 0)
+
+        self.assertEqual(self.master.search('600036')[0]['code'], 'sh600036')
+        self.assertEqual(self.master.search('平安')[0]['code'], 'sz000001')
+        self.assertEqual(self.master.search('yfd')[0]['code'], 'f_110011')
+        self.assertGreater(self.database.get_symbol_refresh_time(SOURCE_BULK_A), 0)
+        self.assertGreater(self.database.get_symbol_refresh_time(SOURCE_BULK_FUND), 0)
+
+    def test_refresh_failure_keeps_other_source(self):
+        def fake_get(source, url, **kwargs):
+            if 'fundcode_search' in url:
+                raise TimeoutError("timeout")
+            return _resp(payload={'data': {'total': 1, 'diff': [{'f12': '600036', 'f13': 1, 'f14': '招商银行'}]}})
+
+        with patch('core.symbols.monitored_http_get', side_effect=fake_get):
+            self.assertEqual(self.master.refresh(), 1)
+        self.assertEqual(self.master.stats()['refresh_errors'], 1)
+
+
+class TestSearchStocks(TempDatabaseTestCase):
+    def setUp(self):
+        super().setUp()
+        self.master = SymbolMaster(database=self.database)
+        for name, value in (('symbol_master', self.master), ('search_cache', price.SearchCache())):
+            patcher = patch.object(price, name, value)
+            patcher.start()
+            self.addCleanup(patcher.stop)
+
+    def test_local_hits_skip_network(self):
+        self.master.add([{'code': f'f_00000{i}', 'name': f'测试基金{i}'} for i in range(6)])
+        with patch.object(price, '_search_sina') as sina, patch.object(price, '_search_fund') as fund:
+            results = price.search_stocks('测试基金')
+        self.assertEqual(len(results), 6)
+        sina.assert_not_called()
+        fund.assert_not_called()
+
+    def test_exact_match_skips_network(self):
+        self.master.add([{'code': 'sh600519', 'name': '贵州茅台'}])
+        with patch.object(price, '_search_sina') as sina, patch.object(price, '_search_fund') as fund:
+            self.assertEqual([item['code'] for item in price.search_stocks('600519')], ['sh600519'])
+            self.assertEqual([item['code'] for item in price.search_stocks('贵州茅台')], ['sh600519'])
+        sina.assert_not_called()
+        fund.assert_not_called()
+
+    def test_network_results_are_learned(self):
+        def fake_sina(query, type_code):
+            if type_code == '11':
+                return [{'code': 'sh600519', 'name': '贵州茅台', 'type_name': 'A股', 'currency': 'CNY'}]
+            return []
+
+        fund_item = {'code': 'f_000001', 'name': '华夏成长混合', 'type_name': '基金', 'currency': 'CNY', 'pinyin': 'HXCZHH'}
+        with patch.object(price, '_search_sina', side_effect=fake_sina), \
+                patch.object(price, '_search_fund', return_value=[fund_item]):
+            results = price.search_stocks('茅台')
+
+        self.assertEqual({item['code'] for item in results}, {'sh600519', 'f_000001'})
+        self.assertTrue(all('pinyin' not in item for item in results))
+        self.assertEqual(self.master.search('hxcz')[0]['code'], 'f_000001')
+        self.assertEqual(self.master.get('sh600519')['asset_type'], 'a')
+
+
+if __name__ == '__main__':
+    unittest.main()